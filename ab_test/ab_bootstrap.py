@@ -0,0 +1,220 @@
+"""
+A/B Test Bootstrap & Permutation Engine
+
+Uncertainty for the score gains of the A/B test: for each criterion
+(emotional, narrative, keepability), the gain is the mean score when VibeReco
+wins minus the mean score when YouTube wins (the user rates the playlist they
+chose). This module gives, globally and per seed:
+- a percentile bootstrap confidence interval of the gain (votes resampled
+  within each winner group)
+- a two-sided permutation test p-value (H0: the score does not depend on the
+  winner)
+
+All resamples of a chunk are drawn as one index matrix (bootstrap, turned
+into per-resample vote counts by one bincount) or one label matrix
+(permutations); the resampled means of every criterion are then one matrix
+product, so a chunk is a handful of numpy operations.
+Chunks are sized to bound memory (CHUNK_ELEMENTS) and spread over a process
+pool. Results are reproducible for a given random_state.
+
+Usage:
+    python ab_bootstrap.py [--resamples 10000] [--workers 4]   # local votes, see ab_significance.py
+"""
+
+import argparse
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ab_significance import SCORE_CRITERIA, _votes_frame, load_vote_list_from_local
+
+DEFAULT_RESAMPLES = 10_000
+
+# Resample x vote cells materialized per chunk (~100 MB of index, key and weight matrices)
+CHUNK_ELEMENTS = 4_000_000
+
+# Below this many resample-votes in total, the pool start-up costs more than it saves
+MIN_PARALLEL_WORK = 20_000_000
+
+# Data of the running analysis, set once per worker process
+_DATA = {}
+
+
+def _init_worker(values, valid, is_vibe, codes):
+    # Scores and their validity side by side, so one matrix product gives sums and counts
+    _DATA.update(stacked=np.hstack([values, valid]), criteria=values.shape[1], is_vibe=is_vibe, codes=codes)
+
+
+def _rows(group):
+    """Row indexes of a group (-1 = all votes), split by winner."""
+    in_group = np.ones(len(_DATA['codes']), dtype=bool) if group < 0 else _DATA['codes'] == group
+    return np.flatnonzero(in_group & _DATA['is_vibe']), np.flatnonzero(in_group & ~_DATA['is_vibe'])
+
+
+def _weighted_sums(rows, weights):
+    """Weighted score sums and rated-vote counts per resample and criterion over values[rows]."""
+    sums = weights @ _DATA['stacked'][rows]
+    return sums[:, :_DATA['criteria']], sums[:, _DATA['criteria']:]
+
+
+def _weighted_means(rows, weights):
+    """Means per resample and criterion of values[rows], each vote weighted per resample, NaN scores excluded."""
+    totals, counts = _weighted_sums(rows, weights)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return totals / counts
+
+
+def _resample_counts(rng, n, resamples):
+    """
+    Bootstrap draws as one index matrix (resamples, n), turned into how many
+    times each vote is drawn per resample (one bincount over the whole matrix).
+    """
+    index = rng.integers(0, n, size=(resamples, n), dtype=np.int32)
+    index += np.arange(resamples, dtype=np.int32)[:, None] * n
+    return np.bincount(index.ravel(), minlength=resamples * n).reshape(resamples, n).astype(np.float32)
+
+
+def _run_chunk(task):
+    """
+    Computes one chunk of resampled gains.
+
+    Args:
+        task: (group, kind, resamples, seed), kind being "bootstrap" or "permutation"
+
+    Returns:
+        Array (resamples, criteria) of gains
+    """
+    group, kind, resamples, seed = task
+    rng = np.random.default_rng(seed)
+    vibe_rows, youtube_rows = _rows(group)
+
+    if kind == 'bootstrap':
+        return (_weighted_means(vibe_rows, _resample_counts(rng, len(vibe_rows), resamples))
+                - _weighted_means(youtube_rows, _resample_counts(rng, len(youtube_rows), resamples)))
+
+    # Permutations: per resample, the n_vibe votes with the smallest random keys get the vibe label
+    rows = np.concatenate([vibe_rows, youtube_rows])
+    keys = rng.random((resamples, len(rows)))
+    threshold = np.partition(keys, len(vibe_rows) - 1, axis=1)[:, len(vibe_rows) - 1:len(vibe_rows)]
+    labels = (keys <= threshold).astype(np.float32)
+    vibe_totals, vibe_counts = _weighted_sums(rows, labels)
+    all_totals, all_counts = _weighted_sums(rows, np.ones((1, len(rows)), dtype=np.float32))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return vibe_totals / vibe_counts - (all_totals - vibe_totals) / (all_counts - vibe_counts)
+
+
+def _observed(group):
+    """Gain per criterion on the actual votes of a group."""
+    vibe_rows, youtube_rows = _rows(group)
+    return (_weighted_means(vibe_rows, np.ones((1, len(vibe_rows)), dtype=np.float32))[0]
+            - _weighted_means(youtube_rows, np.ones((1, len(youtube_rows)), dtype=np.float32))[0])
+
+
+def criterion_gains(votes, by="seedId", criteria=SCORE_CRITERIA, resamples=DEFAULT_RESAMPLES,
+                    confidence=0.95, workers=None, random_state=0) -> pd.DataFrame:
+    """
+    Bootstrap CIs and permutation p-values of the score gain of each criterion.
+
+    Args:
+        votes: DataFrame (e.g. from src/vote_sync.py) or list of vote dicts
+        by: Grouping column for the per-group rows (None: global only)
+        criteria: Score columns
+        resamples: Bootstrap resamples, and permutations, per group
+        confidence: Level of the percentile intervals
+        workers: Worker processes (default: CPU count; 1 runs in-process)
+        random_state: Seed of the resampling
+
+    Returns:
+        DataFrame with one row per (group, value, criterion): n_vibe,
+        n_youtube, gain, ci_lower, ci_upper, p_value
+    """
+    df = _votes_frame(votes)
+    df = df[df['winnerSource'].isin(('vibe', 'youtube'))]
+    criteria = [criterion for criterion in criteria if criterion in df.columns]
+    scores = np.column_stack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=float) for c in criteria]) \
+        if criteria else np.zeros((len(df), 0))
+    valid = (~np.isnan(scores)).astype(np.float32)
+    values = np.where(valid > 0, scores, 0.0).astype(np.float32)
+    is_vibe = df['winnerSource'].eq('vibe').to_numpy()
+
+    groups = [('all', 'all', -1)]
+    codes = np.full(len(df), -1, dtype=np.int64)
+    if by and by in df.columns:
+        codes, uniques = pd.factorize(df[by].astype(str))
+        groups += [(by, value, code) for code, value in enumerate(uniques)]
+
+    # Chunks of at most CHUNK_ELEMENTS elements, each with its own random stream
+    tasks, sizes = [], []
+    for _, _, code in groups:
+        in_group = np.ones(len(df), dtype=bool) if code < 0 else codes == code
+        n_vibe, n = int((in_group & is_vibe).sum()), int(in_group.sum())
+        if n_vibe == 0 or n_vibe == n:
+            continue  # No gain to estimate without votes on both sides
+        chunk = max(1, CHUNK_ELEMENTS // n)
+        for kind in ('bootstrap', 'permutation'):
+            for start in range(0, resamples, chunk):
+                tasks.append((code, kind, min(chunk, resamples - start)))
+                sizes.append(n * min(chunk, resamples - start))
+    seeds = np.random.SeedSequence(random_state).spawn(len(tasks))
+    tasks = [task + (seed,) for task, seed in zip(tasks, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1 and sum(sizes) >= MIN_PARALLEL_WORK:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(values, valid, is_vibe, codes)) as pool:
+            results = list(pool.map(_run_chunk, tasks))
+    else:
+        _init_worker(values, valid, is_vibe, codes)
+        results = [_run_chunk(task) for task in tasks]
+
+    draws = {}
+    for (code, kind, _, _), result in zip(tasks, results):
+        draws.setdefault((code, kind), []).append(result)
+
+    _init_worker(values, valid, is_vibe, codes)
+    tail = (1 - confidence) / 2 * 100
+    rows = []
+    for group, value, code in groups:
+        vibe_rows, youtube_rows = _rows(code)
+        observed = _observed(code) if len(vibe_rows) and len(youtube_rows) else np.full(len(criteria), np.nan)
+        lower = upper = np.full(len(criteria), np.nan)
+        p_values = np.ones(len(criteria))
+        if (code, 'bootstrap') in draws:
+            boot = np.concatenate(draws[(code, 'bootstrap')])
+            perm = np.concatenate(draws[(code, 'permutation')])
+            with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+                warnings.simplefilter('ignore', RuntimeWarning)  # Criteria never rated in this group
+                lower, upper = np.nanpercentile(boot, [tail, 100 - tail], axis=0)
+                extreme = (np.abs(perm) >= np.abs(observed) - 1e-12).sum(axis=0)
+            tested = (~np.isnan(perm)).sum(axis=0)
+            p_values = np.where((tested > 0) & ~np.isnan(observed), (1 + extreme) / (1 + tested), 1.0)
+        for i, criterion in enumerate(criteria):
+            rows.append({
+                'group': group, 'value': value, 'criterion': criterion,
+                'n_vibe': len(vibe_rows), 'n_youtube': len(youtube_rows),
+                'gain': observed[i], 'ci_lower': lower[i], 'ci_upper': upper[i], 'p_value': p_values[i],
+            })
+    return pd.DataFrame(rows, columns=['group', 'value', 'criterion', 'n_vibe', 'n_youtube',
+                                       'gain', 'ci_lower', 'ci_upper', 'p_value'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and permutation tests of the A/B score gains")
+    parser.add_argument("--votes", default=None, help="Local votes JSON file (default: see ab_significance.py)")
+    parser.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    report = criterion_gains(load_vote_list_from_local(args.votes), resamples=args.resamples, workers=args.workers)
+    print("\n🎲 GAIN DE SCORE PAR CRITÈRE (VibeReco - YouTube), bootstrap IC 95% et test de permutation")
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
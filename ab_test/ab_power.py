@@ -0,0 +1,382 @@
+"""
+A/B Test Power & Sample-Size Simulator
+
+Monte-Carlo planning tool for the A/B test: for a range of true VibeReco win
+rates and vote budgets, it estimates how often each decision rule of
+ab_significance.py concludes, and in which direction:
+- fixed horizon: the exact binomial test of analyze_significance, run once
+  after max_votes votes
+- sequential: the mSPRT of SequentialMonitor, checked after every vote and
+  stopped at the first conclusion (or when max_votes is reached)
+
+Rows at win rate 50% give the false-positive rate of each rule. The
+sequential rule also reports the expected number of votes it uses.
+seed_power() does the same for per-seed tests, given how the votes are split
+between seeds.
+
+Both rules only depend on the vote counts, so their rejection boundaries are
+computed once per (n, k). The fixed horizon then takes one binomial draw per
+simulation and budget. Sequential vote sequences are simulated as blocks of
+cumulative sums, and a sequence is dropped as soon as it crosses a boundary.
+Simulations are split into chunks over a process pool. Results are
+reproducible for a given random_state.
+
+Usage:
+    python ab_power.py [--win-rates 0.5,0.55,0.6] [--max-votes 5000] [--simulations 20000]
+    python ab_power.py --seeds 10             # + power of each seed, 10 seeds sharing the votes
+    python ab_power.py --observed             # + plan from the current local votes
+"""
+
+import argparse
+import functools
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ab_significance import (DEFAULT_PRIOR_STRENGTH, _log_beta, exact_binomial_pvalues,
+                             load_vote_list_from_local, load_votes_from_local)
+
+DEFAULT_WIN_RATES = (0.5, 0.52, 0.55, 0.6, 0.65, 0.7)
+DEFAULT_MAX_VOTES = 5000
+DEFAULT_SIMULATIONS = 20_000
+DEFAULT_TARGET_POWER = 0.8
+
+# Simulated vote sequences per task sent to the pool
+SIMULATION_CHUNK = 5000
+
+# Votes x sequences simulated per block (~50 MB of draws and cumulative sums)
+CHUNK_ELEMENTS = 4_000_000
+
+# Below this many simulated votes in total, the pool start-up costs more than it saves
+MIN_PARALLEL_WORK = 20_000_000
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+
+# Boundaries of the running simulation, set once per worker process
+_DATA = {}
+
+
+def default_horizons(max_votes: int = DEFAULT_MAX_VOTES, points: int = 24) -> np.ndarray:
+    """Geometric grid of vote budgets from 20 to max_votes."""
+    return np.unique(np.round(np.geomspace(min(20, max_votes), max_votes, points)).astype(int))
+
+
+@functools.lru_cache(maxsize=8)
+def sequential_boundaries(max_votes: int, alpha: float = 0.05,
+                          prior_strength: float = DEFAULT_PRIOR_STRENGTH) -> np.ndarray:
+    """
+    Stopping boundaries of SequentialMonitor.
+
+    The mSPRT stops as soon as its log Bayes factor reaches log(1/alpha).
+    The Beta(a, a) mixture is symmetric and the log Bayes factor increases
+    with |k - n/2|, so it stops at n votes once k >= upper[n] (VibeReco) or
+    k <= n - upper[n] (YouTube).
+
+    Returns:
+        Array upper[0..max_votes] (n + 1 where no count can stop the test)
+    """
+    a = prior_strength
+    n = np.arange(max_votes + 1)
+    log_gamma = _lgamma(a + n).astype(float)           # log Γ(a + j)
+    log_gamma_total = _lgamma(2 * a + n).astype(float)  # log Γ(2a + n)
+    threshold = math.log(1 / alpha)
+
+    def crosses(k):
+        log_bf = log_gamma[k] + log_gamma[n - k] - log_gamma_total - _log_beta(a, a) + n * math.log(2)
+        return log_bf >= threshold
+
+    # Bisection over k, for every n at once: the answer is in [ceil(n/2), n + 1]
+    low, high = (n + 1) // 2, n + 1
+    while np.any(low < high):
+        middle = (low + high) // 2
+        ok = crosses(np.minimum(middle, n)) & (middle <= n)
+        searching = low < high
+        high = np.where(searching & ok, middle, high)
+        low = np.where(searching & ~ok, middle + 1, low)
+    return high
+
+
+def fixed_critical_values(horizons, alpha: float = 0.05) -> np.ndarray:
+    """
+    Smallest VibeReco win count significant at each horizon, with the exact
+    binomial test of analyze_significance (n + 1 if none). By symmetry YouTube
+    wins significantly at n votes when k <= n - critical.
+    """
+    n = np.asarray(horizons, dtype=np.int64)
+    low, high = (n + 1) // 2, n + 1
+    while np.any(low < high):
+        middle = (low + high) // 2
+        ok = (exact_binomial_pvalues(np.minimum(middle, n), n) < alpha) & (middle <= n)
+        searching = low < high
+        high = np.where(searching & ok, middle, high)
+        low = np.where(searching & ~ok, middle + 1, low)
+    return high
+
+
+def _init_worker(upper, horizons, critical):
+    _DATA.update(upper=upper, horizons=horizons, critical=critical)
+
+
+def _stopping_times(rng, win_rate, simulations):
+    """
+    Simulates vote sequences under the sequential rule.
+
+    Returns:
+        (stop, vibe): vote at which each sequence stops (max_votes + 1 if it
+        never does) and whether it stops in favour of VibeReco
+    """
+    upper = _DATA['upper']
+    max_votes = len(upper) - 1
+    stop = np.full(simulations, max_votes + 1, dtype=np.int64)
+    vibe = np.zeros(simulations, dtype=bool)
+    active = np.arange(simulations)
+    k = np.zeros(simulations, dtype=np.int32)
+
+    start = 0
+    while start < max_votes and active.size:
+        end = min(max_votes, start + max(64, CHUNK_ELEMENTS // active.size))
+        # Vibe wins after each vote of the block, for every sequence still running
+        path = k[:, None] + np.cumsum(rng.random((active.size, end - start), dtype=np.float32) < win_rate,
+                                      axis=1, dtype=np.int32)
+        high = upper[start + 1:end + 1]
+        low = np.arange(start + 1, end + 1) - high
+        crossed = (path >= high) | (path <= low)
+        hit = crossed.any(axis=1)
+        first = crossed[hit].argmax(axis=1)
+        stop[active[hit]] = start + 1 + first
+        vibe[active[hit]] = path[hit, first] >= high[first]
+        k, active = path[~hit, -1], active[~hit]
+        start = end
+    return stop, vibe
+
+
+def _run_chunk(task):
+    """
+    Simulates one chunk of vote sequences at one true win rate.
+
+    Args:
+        task: (win_rate, simulations, seed)
+
+    Returns:
+        (stop, vibe, fixed_vibe, fixed_youtube): sequential stopping times and
+        sides, and per horizon the fixed-horizon conclusions for each side
+    """
+    win_rate, simulations, seed = task
+    rng = np.random.default_rng(seed)
+    stop, vibe = _stopping_times(rng, win_rate, simulations)
+
+    horizons, critical = _DATA['horizons'], _DATA['critical']
+    k = rng.binomial(horizons[None, :], win_rate, size=(simulations, len(horizons)))
+    return stop, vibe, (k >= critical).sum(axis=0), (k <= horizons - critical).sum(axis=0)
+
+
+def _power_row(rule, win_rate, max_votes, simulations, vibe_count, youtube_count, expected_votes):
+    if win_rate > 0.5:
+        power, wrong = vibe_count / simulations, youtube_count / simulations
+    elif win_rate < 0.5:
+        power, wrong = youtube_count / simulations, vibe_count / simulations
+    else:
+        power, wrong = np.nan, np.nan
+    return {
+        'rule': rule, 'win_rate': win_rate, 'max_votes': int(max_votes),
+        'reject_rate': (vibe_count + youtube_count) / simulations,
+        'power': power, 'wrong_direction': wrong, 'expected_votes': expected_votes,
+    }
+
+
+def simulate_power(win_rates=DEFAULT_WIN_RATES, horizons=None, alpha: float = 0.05,
+                   prior_strength: float = DEFAULT_PRIOR_STRENGTH, simulations: int = DEFAULT_SIMULATIONS,
+                   workers=None, random_state: int = 0) -> pd.DataFrame:
+    """
+    Power, false-positive rate and expected sample size of both decision rules.
+
+    Args:
+        win_rates: True VibeReco win rates to simulate
+        horizons: Vote budgets (default: default_horizons())
+        alpha: Significance level of both rules
+        prior_strength: Mixture prior of the sequential rule
+        simulations: Simulated vote sequences per win rate
+        workers: Worker processes (default: CPU count; 1 runs in-process)
+        random_state: Seed of the simulation
+
+    Returns:
+        DataFrame with one row per (rule, win_rate, max_votes):
+        reject_rate (probability to conclude; the false-positive rate at
+        win rate 0.5), power (probability to conclude in favour of the truly
+        better source, NaN at 0.5), wrong_direction, expected_votes
+    """
+    horizons = default_horizons() if horizons is None else np.unique(np.asarray(horizons, dtype=np.int64))
+    horizons = horizons[horizons > 0]
+    if horizons.size == 0:
+        raise ValueError("At least one positive vote budget is required")
+    upper = sequential_boundaries(int(horizons.max()), alpha, prior_strength)
+    critical = fixed_critical_values(horizons, alpha)
+
+    tasks = [(float(win_rate), min(SIMULATION_CHUNK, simulations - start))
+             for win_rate in win_rates for start in range(0, simulations, SIMULATION_CHUNK)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(tasks))
+    tasks = [task + (seed,) for task, seed in zip(tasks, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1 and len(win_rates) * simulations * horizons.max() >= MIN_PARALLEL_WORK:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(upper, horizons, critical)) as pool:
+            results = list(pool.map(_run_chunk, tasks))
+    else:
+        _init_worker(upper, horizons, critical)
+        results = [_run_chunk(task) for task in tasks]
+
+    rows = []
+    for win_rate in win_rates:
+        chunks = [result for task, result in zip(tasks, results) if task[0] == float(win_rate)]
+        stop = np.concatenate([chunk[0] for chunk in chunks])
+        vibe = np.concatenate([chunk[1] for chunk in chunks])
+        fixed_vibe = sum(chunk[2] for chunk in chunks)
+        fixed_youtube = sum(chunk[3] for chunk in chunks)
+        for i, horizon in enumerate(horizons):
+            rows.append(_power_row('fixed', win_rate, horizon, simulations,
+                                   fixed_vibe[i], fixed_youtube[i], float(horizon)))
+            stopped = stop <= horizon
+            rows.append(_power_row('sequential', win_rate, horizon, simulations,
+                                   int((stopped & vibe).sum()), int((stopped & ~vibe).sum()),
+                                   float(np.minimum(stop, horizon).mean())))
+    return pd.DataFrame(rows).sort_values(['rule', 'win_rate', 'max_votes'], ignore_index=True)
+
+
+def votes_needed(power_table: pd.DataFrame, target_power: float = DEFAULT_TARGET_POWER) -> pd.DataFrame:
+    """
+    Smallest simulated vote budget reaching the target power, per rule and win rate.
+
+    Args:
+        power_table: Output of simulate_power
+        target_power: Required probability to conclude in the right direction
+
+    Returns:
+        DataFrame: rule, win_rate, max_votes (NaN if not reached within the
+        simulated budgets), expected_votes at that budget
+    """
+    rows = []
+    for (rule, win_rate), group in power_table[power_table['win_rate'] != 0.5].groupby(['rule', 'win_rate']):
+        reached = group[group['power'] >= target_power]
+        first = reached.iloc[0] if len(reached) else None
+        rows.append({
+            'rule': rule, 'win_rate': win_rate,
+            'max_votes': first['max_votes'] if first is not None else np.nan,
+            'expected_votes': first['expected_votes'] if first is not None else np.nan,
+        })
+    return pd.DataFrame(rows, columns=['rule', 'win_rate', 'max_votes', 'expected_votes'])
+
+
+def seed_power(allocation, total_votes, win_rates=DEFAULT_WIN_RATES, alpha: float = 0.05,
+               seed_alpha=None, **kwargs) -> pd.DataFrame:
+    """
+    Power of the per-seed tests, for a given split of the votes between seeds.
+
+    Each seed is tested on its own votes, at seed_alpha (default
+    alpha / number of seeds, the Bonferroni level: SequentialAnalyzer's
+    seed_alpha, and a lower bound on the power of the Holm correction of
+    batch_significance).
+
+    Args:
+        allocation: Number of seeds sharing the votes equally, or {seedId: share}
+        total_votes: Total vote budgets (all seeds together)
+        win_rates: True win rates, assumed the same for every seed
+        alpha: Error rate over all seeds
+        seed_alpha: Level of each seed's test
+        **kwargs: Passed to simulate_power (simulations, workers, random_state, ...)
+
+    Returns:
+        DataFrame with one row per (rule, win_rate, total_votes, seedId):
+        votes (the seed's share of the budget), power, expected_votes
+    """
+    if isinstance(allocation, int):
+        allocation = {str(seed + 1): 1 for seed in range(allocation)}
+    total_share = sum(allocation.values())
+    shares = {str(seed): share / total_share for seed, share in allocation.items()}
+    seed_alpha = seed_alpha if seed_alpha is not None else alpha / len(shares)
+
+    seed_votes = [(seed, int(total), int(share * total)) for total in total_votes for seed, share in shares.items()]
+    horizons = sorted({votes for _, _, votes in seed_votes if votes > 0})
+    table = simulate_power(win_rates, horizons, alpha=seed_alpha, **kwargs) if horizons else pd.DataFrame(
+        columns=['rule', 'win_rate', 'max_votes', 'power', 'expected_votes'])
+    table = table.set_index(['rule', 'win_rate', 'max_votes'])
+
+    rows = []
+    for rule in ('fixed', 'sequential'):
+        for win_rate in win_rates:
+            for seed, total, votes in seed_votes:
+                simulated = (rule, win_rate, votes) in table.index
+                rows.append({
+                    'rule': rule, 'win_rate': win_rate, 'total_votes': total, 'seedId': seed, 'votes': votes,
+                    'power': table.loc[(rule, win_rate, votes), 'power'] if simulated else 0.0,
+                    'expected_votes': table.loc[(rule, win_rate, votes), 'expected_votes'] if simulated else 0.0,
+                })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte-Carlo power and sample size of the A/B test decision rules")
+    parser.add_argument("--win-rates", default=",".join(str(rate) for rate in DEFAULT_WIN_RATES),
+                        help="True VibeReco win rates, comma-separated")
+    parser.add_argument("--max-votes", type=int, default=DEFAULT_MAX_VOTES)
+    parser.add_argument("--simulations", type=int, default=DEFAULT_SIMULATIONS)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--power", type=float, default=DEFAULT_TARGET_POWER, help="Target power")
+    parser.add_argument("--seeds", type=int, default=None, help="Also simulate per-seed tests, votes split equally")
+    parser.add_argument("--local-allocation", action="store_true",
+                        help="Also simulate per-seed tests, votes split like the local votes")
+    parser.add_argument("--observed", action="store_true", help="Add the win rate observed in the local votes")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    win_rates = [float(rate) for rate in args.win_rates.split(",")]
+    observed = None
+    if args.observed:
+        vibe_wins, youtube_wins = load_votes_from_local()
+        if vibe_wins + youtube_wins:
+            observed = (round(vibe_wins / (vibe_wins + youtube_wins), 3), vibe_wins + youtube_wins)
+            win_rates = sorted(set(win_rates) | {observed[0]})
+
+    options = dict(alpha=args.alpha, simulations=args.simulations, workers=args.workers)
+    table = simulate_power(win_rates, default_horizons(args.max_votes), **options)
+    pd.set_option('display.width', 200)
+    for rule, label in (('fixed', 'HORIZON FIXE (test binomial exact)'), ('sequential', 'SÉQUENTIEL (mSPRT)')):
+        rates = table[table['rule'] == rule].assign(
+            rate=lambda df: np.where(df['win_rate'] == 0.5, df['reject_rate'], df['power']))
+        print(f"\n⚡ PUISSANCE - {label} (colonne 0.5 = taux de faux positifs)")
+        print(rates.pivot(index='max_votes', columns='win_rate', values='rate').to_string(float_format=lambda x: f"{x:.3f}"))
+
+    needed = votes_needed(table, args.power)
+    print(f"\n🎯 VOTES NÉCESSAIRES POUR {args.power:.0%} DE PUISSANCE (NaN = au-delà de {args.max_votes})")
+    print(needed.to_string(index=False, float_format=lambda x: f"{x:.0f}" if x >= 1 else f"{x:.3f}"))
+
+    if observed is not None:
+        rate, n = observed
+        for row in needed[needed['win_rate'] == rate].itertuples():
+            if np.isnan(row.max_votes):
+                print(f"   • {row.rule}: au taux observé ({rate:.1%}), plus de {args.max_votes} votes nécessaires")
+            else:
+                print(f"   • {row.rule}: au taux observé ({rate:.1%}), ~{row.max_votes:.0f} votes "
+                      f"(encore {max(0, row.max_votes - n):.0f} après les {n} actuels)")
+
+    allocation = args.seeds
+    if args.local_allocation:
+        allocation = pd.Series([vote.get('seedId') for vote in load_vote_list_from_local()]).astype(str).value_counts().to_dict()
+    if allocation:
+        seeds = seed_power(allocation, default_horizons(args.max_votes), [rate for rate in win_rates if rate != 0.5], **options)
+        mean = seeds.groupby(['rule', 'win_rate', 'total_votes'])['power'].mean().reset_index()
+        print(f"\n🌱 PUISSANCE MOYENNE PAR SEED ({seeds['seedId'].nunique()} seeds, α par seed = "
+              f"{args.alpha / seeds['seedId'].nunique():.4f})")
+        print(mean.pivot(index='total_votes', columns=['rule', 'win_rate'], values='power')
+              .to_string(float_format=lambda x: f"{x:.3f}"))
+    return table
+
+
+if __name__ == "__main__":
+    main()
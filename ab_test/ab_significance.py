@@ -3,20 +3,33 @@ A/B Test Statistical Significance Analysis
 
 This module provides statistical analysis for the VibeReco A/B test results:
 - Win rate with confidence intervals (Wilson 95% CI)
-- Binomial test for significance (H0: p = 0.5)
+- Exact binomial test for significance (H0: p = 0.5), in log space
+- Batch report over every seed, vibe category and score criterion at once,
+  with Holm / Benjamini-Hochberg multiple-testing correction
 - Summary statistics for scientific reporting
+- Sequential monitoring (mixture SPRT and confidence sequences), valid however
+  often the results are checked, globally and per seed, with a stop/continue
+  decision
 
 Usage:
     python ab_significance.py              # Fetch from Redis and analyze
     python ab_significance.py --local      # Use local votes from JSON
+    python ab_significance.py --sequential [--local]   # Always-valid monitoring
+    python ab_significance.py --batch [--fdr]          # Seed / vibe / criterion grid (local votes)
+    python ab_significance.py --archive [--since 2026-10-01] [--until 2026-10-31] [--sequential | --batch]
+                                           # Votes of the columnar archive (src/vote_archive.py)
 """
 
 import json
 import os
 import math
+import sys
 from typing import Optional
 from dataclasses import dataclass
 
+import numpy as np
+import pandas as pd
+
 # For fetching from Redis (optional)
 try:
     import requests
@@ -55,19 +68,8 @@ def wilson_confidence_interval(successes: int, n: int, z: float = 1.96) -> tuple
     Returns:
         Tuple of (lower_bound, upper_bound) for the confidence interval
     """
-    if n == 0:
-        return (0.0, 0.0)
-    
-    p_hat = successes / n
-    
-    denominator = 1 + z**2 / n
-    center = (p_hat + z**2 / (2 * n)) / denominator
-    margin = z * math.sqrt((p_hat * (1 - p_hat) + z**2 / (4 * n)) / n) / denominator
-    
-    lower = max(0.0, center - margin)
-    upper = min(1.0, center + margin)
-    
-    return (lower, upper)
+    lower, upper = wilson_intervals(successes, n, z)
+    return (float(lower), float(upper))
 
 
 def binomial_test_pvalue(successes: int, n: int, p0: float = 0.5) -> float:
@@ -75,7 +77,7 @@ def binomial_test_pvalue(successes: int, n: int, p0: float = 0.5) -> float:
     Calculate p-value for a two-sided binomial test.
     
     Tests H0: p = p0 vs H1: p ≠ p0
-    Uses normal approximation for n >= 30, exact binomial for smaller samples.
+    Exact at every sample size (see exact_binomial_pvalues).
     
     Args:
         successes: Number of observed successes
@@ -87,22 +89,7 @@ def binomial_test_pvalue(successes: int, n: int, p0: float = 0.5) -> float:
     """
     if n == 0:
         return 1.0
-    
-    p_hat = successes / n
-    
-    # For larger samples, use normal approximation
-    if n >= 30:
-        # z-test for proportion
-        se = math.sqrt(p0 * (1 - p0) / n)
-        z = abs(p_hat - p0) / se
-        
-        # Two-sided p-value using normal approximation
-        # P(Z > |z|) * 2
-        p_value = 2 * (1 - normal_cdf(z))
-        return p_value
-    else:
-        # For small samples, use exact binomial test
-        return exact_binomial_test(successes, n, p0)
+    return exact_binomial_test(successes, n, p0)
 
 
 def normal_cdf(x: float) -> float:
@@ -118,24 +105,239 @@ def exact_binomial_test(k: int, n: int, p: float = 0.5) -> float:
     Exact two-sided binomial test p-value.
     
     Calculates P(X <= k) if k < n*p, else P(X >= k), then doubles for two-sided.
+    Computed in log space, so it is stable at any n.
     """
-    def binomial_pmf(x, n, p):
-        """Probability mass function for binomial distribution."""
-        from math import comb
-        return comb(n, x) * (p ** x) * ((1 - p) ** (n - x))
-    
-    # Calculate probability of observed or more extreme
-    expected = n * p
-    
-    if k <= expected:
-        # Sum P(X <= k)
-        p_value = sum(binomial_pmf(i, n, p) for i in range(k + 1))
+    return float(exact_binomial_pvalues([k], [n], p)[0])
+
+
+# ---------------------------------------------------------------------------
+# Vectorized exact tests and batch significance
+# ---------------------------------------------------------------------------
+
+# log(x!) is read from this table below LOG_FACTORIAL_TABLE_SIZE, and computed
+# with the Stirling series above (accurate to ~1e-15 there)
+LOG_FACTORIAL_TABLE_SIZE = 32
+_LOG_FACTORIALS = np.array([math.lgamma(x + 1) for x in range(LOG_FACTORIAL_TABLE_SIZE)])
+
+# Binomial tails are summed over this many standard deviations past the
+# observed count; the terms left out are below double precision
+TAIL_WINDOW_SD = 12
+
+SCORE_CRITERIA = ("emotional", "narrative", "keepability")
+
+# Ratings needed on each side (VibeReco wins, YouTube wins) before a criterion is tested
+MIN_CELL_RATINGS = 2
+
+
+def log_factorial(x) -> np.ndarray:
+    """Vectorized log(x!) for nonnegative integers."""
+    x = np.asarray(x, dtype=float)
+    out = np.empty_like(x)
+    small = x < LOG_FACTORIAL_TABLE_SIZE
+    out[small] = _LOG_FACTORIALS[x[small].astype(int)]
+    y = x[~small] + 1.0
+    out[~small] = ((y - 0.5) * np.log(y) - y + 0.5 * math.log(2 * math.pi)
+                   + 1 / (12 * y) - 1 / (360 * y**3) + 1 / (1260 * y**5) - 1 / (1680 * y**7))
+    return out
+
+
+def binomial_log_pmf(k, n, p: float = 0.5) -> np.ndarray:
+    """Vectorized log P(X = k) for X ~ Binomial(n, p), 0 < p < 1."""
+    k = np.asarray(k, dtype=float)
+    n = np.asarray(n, dtype=float)
+    return log_factorial(n) - log_factorial(k) - log_factorial(n - k) + k * math.log(p) + (n - k) * math.log1p(-p)
+
+
+def exact_binomial_pvalues(k, n, p: float = 0.5) -> np.ndarray:
+    """
+    Vectorized exact two-sided binomial test p-values.
+
+    Same definition as the scalar test: twice the tail on the side of the
+    observation, P(X <= k) if k <= n*p else P(X >= k), capped at 1. Tails are
+    summed in log space (log-sum-exp), so there is no overflow or underflow at
+    any n.
+
+    Args:
+        k: Successes (array-like)
+        n: Trials (array-like, same shape as k)
+        p: Null hypothesis proportion
+
+    Returns:
+        Array of p-values (1.0 where n == 0)
+    """
+    k, n = np.broadcast_arrays(np.asarray(k, dtype=np.int64), np.asarray(n, dtype=np.int64))
+    shape = k.shape
+    k, n = k.ravel(), n.ravel()
+    if k.size == 0:
+        return np.ones(shape)
+
+    lower = k <= n * p
+    window = int(TAIL_WINDOW_SD * math.sqrt(n.max() * p * (1 - p))) + 20
+    offsets = np.arange(min(window, int(n.max())) + 1)
+    # One row per test, one column per tail term
+    terms = np.where(lower[:, None], k[:, None] - offsets, k[:, None] + offsets)
+    valid = (terms >= 0) & (terms <= n[:, None])
+    logs = np.where(valid, binomial_log_pmf(np.clip(terms, 0, n[:, None]), n[:, None], p), -np.inf)
+
+    peak = logs.max(axis=1)
+    log_tail = peak + np.log(np.exp(logs - peak[:, None]).sum(axis=1))
+    p_values = np.minimum(1.0, 2 * np.exp(log_tail))
+    p_values[n == 0] = 1.0
+    return p_values.reshape(shape)
+
+
+def wilson_intervals(successes, n, z: float = 1.96) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized Wilson score intervals over arrays of (successes, n).
+
+    Returns:
+        Tuple of (lower, upper) arrays; (0, 0) where n == 0
+    """
+    successes = np.asarray(successes, dtype=float)
+    n = np.asarray(n, dtype=float)
+    safe_n = np.where(n > 0, n, 1.0)
+    p_hat = successes / safe_n
+
+    denominator = 1 + z**2 / safe_n
+    center = (p_hat + z**2 / (2 * safe_n)) / denominator
+    margin = z * np.sqrt((p_hat * (1 - p_hat) + z**2 / (4 * safe_n)) / safe_n) / denominator
+
+    lower = np.where(n > 0, np.maximum(0.0, center - margin), 0.0)
+    upper = np.where(n > 0, np.minimum(1.0, center + margin), 0.0)
+    return lower, upper
+
+
+def adjust_pvalues(p_values, method: str = "holm") -> np.ndarray:
+    """
+    Multiple-testing correction.
+
+    Args:
+        p_values: Raw p-values (array-like)
+        method: "holm" (family-wise error rate), "bh" (Benjamini-Hochberg,
+            false discovery rate) or "none"
+
+    Returns:
+        Adjusted p-values, in the input order
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    m = p_values.size
+    if m == 0 or method == "none":
+        return p_values.copy()
+    order = np.argsort(p_values)
+    ranked = p_values[order]
+    if method == "holm":
+        adjusted = np.maximum.accumulate((m - np.arange(m)) * ranked)
+    elif method == "bh":
+        adjusted = np.minimum.accumulate((m / np.arange(1, m + 1) * ranked)[::-1])[::-1]
     else:
-        # Sum P(X >= k)
-        p_value = sum(binomial_pmf(i, n, p) for i in range(k, n + 1))
-    
-    # Two-sided: multiply by 2 (capped at 1)
-    return min(1.0, 2 * p_value)
+        raise ValueError(f"Unknown correction method: {method}")
+    result = np.empty(m)
+    result[order] = np.minimum(1.0, adjusted)
+    return result
+
+
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+
+def _votes_frame(votes) -> pd.DataFrame:
+    """Votes as a DataFrame with one column per score criterion (flattens 'scores' dicts)."""
+    df = votes if isinstance(votes, pd.DataFrame) else pd.DataFrame(list(votes))
+    if 'scores' in df.columns:
+        scores = pd.json_normalize(df['scores'].map(lambda s: s if isinstance(s, dict) else {}).tolist())
+        scores.index = df.index
+        df = df.drop(columns='scores').join(scores[[c for c in scores.columns if c not in df.columns]])
+    if 'winnerSource' not in df.columns:
+        df = df.assign(winnerSource=pd.Series(dtype=object, index=df.index))
+    return df
+
+
+def batch_significance(votes, by=("seedId", "vibe"), criteria=SCORE_CRITERIA,
+                       alpha: float = 0.05, correction: str = "holm", z: float = 1.96) -> pd.DataFrame:
+    """
+    Scores the whole test grid at once: win rate and every score criterion,
+    overall and for each value of each grouping column (seeds, vibe categories).
+
+    Win rates get an exact binomial test (H0: p = 0.5) and a Wilson interval.
+    Criteria compare the mean score when VibeReco wins to the mean score when
+    YouTube wins (two-sample z-test, Welch standard error). All p-values are
+    then corrected together for multiple testing.
+
+    The criterion test is a normal approximation: it is unreliable with the
+    few ratings of a typical seed or vibe cell (use ab_bootstrap.py there).
+    Cells with fewer than MIN_CELL_RATINGS ratings on a side, or with no
+    spread in the ratings, are untestable: p_value 1, no interval.
+
+    Args:
+        votes: DataFrame (e.g. from src/vote_sync.py) or list of vote dicts
+        by: Grouping columns
+        criteria: Score columns to test
+        alpha: Significance level, applied to the adjusted p-values
+        correction: "holm", "bh" or "none"
+        z: Z-score of the intervals
+
+    Returns:
+        DataFrame with one row per test: metric, group, value, n, estimate
+        (win rate, or mean score difference vibe - youtube), ci_lower,
+        ci_upper, p_value, p_adjusted, significant
+    """
+    df = _votes_frame(votes)
+    df = df[df['winnerSource'].isin(('vibe', 'youtube'))]
+    is_vibe = df['winnerSource'].eq('vibe').to_numpy()
+    side = (~is_vibe).astype(np.int64)  # 0 = vibe, 1 = youtube
+    scores = {criterion: pd.to_numeric(df[criterion], errors='coerce').to_numpy(dtype=float)
+              for criterion in criteria if criterion in df.columns}
+
+    groupings = [('all', np.zeros(len(df), dtype=np.int64), np.array(['all']))]
+    for column in by:
+        if column in df.columns:
+            codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            groupings.append((column, codes, np.asarray(uniques).astype(str)))
+
+    frames = []
+    for group, codes, values in groupings:
+        # Every aggregate is a bincount over the group codes: one pass per column, no groupby
+        size = len(values)
+        n = np.bincount(codes, minlength=size)
+        k = np.bincount(codes, weights=is_vibe, minlength=size).astype(np.int64)
+        lower, upper = wilson_intervals(k, n, z)
+        frames.append(pd.DataFrame({
+            'metric': 'win_rate', 'group': group, 'value': values, 'n': n,
+            'estimate': k / np.maximum(n, 1), 'ci_lower': lower, 'ci_upper': upper,
+            'p_value': exact_binomial_pvalues(k, n),
+        }))
+
+        # Criteria: mean and variance per (group value, winner), then one z-test per group value
+        for criterion, x in scores.items():
+            rated = ~np.isnan(x)
+            cell = (codes * 2 + side)[rated]
+            count = np.bincount(cell, minlength=2 * size).reshape(size, 2)
+            total = np.bincount(cell, weights=x[rated], minlength=2 * size).reshape(size, 2)
+            total_sq = np.bincount(cell, weights=x[rated] ** 2, minlength=2 * size).reshape(size, 2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = total / count
+                var = np.maximum(total_sq - total * mean, 0.0) / (count - 1)
+                diff = mean[:, 0] - mean[:, 1]
+                se = np.sqrt(var[:, 0] / count[:, 0] + var[:, 1] / count[:, 1])
+                statistic = np.abs(diff) / se
+                pooled_var = ((count[:, 0] - 1) * var[:, 0] + (count[:, 1] - 1) * var[:, 1]) / (count.sum(axis=1) - 2)
+            # Too few ratings, or identical ratings on both sides (common with 1-5 scores in
+            # small cells): no spread to test against, so the cell is reported as untestable
+            testable = (count.min(axis=1) >= MIN_CELL_RATINGS) & (pooled_var > 0) & np.isfinite(statistic)
+            p_value = np.ones(size)
+            p_value[testable] = _erfc(statistic[testable] / math.sqrt(2)).astype(float)
+            frames.append(pd.DataFrame({
+                'metric': criterion, 'group': group, 'value': values, 'n': count.sum(axis=1),
+                'estimate': diff,
+                'ci_lower': np.where(testable, diff - z * se, np.nan),
+                'ci_upper': np.where(testable, diff + z * se, np.nan),
+                'p_value': p_value,
+            }))
+
+    report = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['metric', 'group', 'value', 'n', 'estimate', 'ci_lower', 'ci_upper', 'p_value'])
+    report['p_adjusted'] = adjust_pvalues(report['p_value'].to_numpy(dtype=float), correction)
+    report['significant'] = report['p_adjusted'] < alpha
+    return report
 
 
 def analyze_significance(
@@ -239,16 +441,272 @@ def generate_interpretation(
             f"📊 Tendance {direction} mais PAS ENCORE DÉFINITIVE (p = {p_value:.4f})\n"
             f"VibeReco obtient {win_pct:.1f}% [IC 95% : {ci_lower_pct:.1f}% – {ci_upper_pct:.1f}%].\n"
             f"Avec {n} votes, l'intervalle de confiance chevauche 50%.\n"
-            f"→ Besoin de plus de votes pour conclure de manière robuste."
+            f"→ Besoin de plus de votes pour conclure de manière robuste "
+            f"(combien : python ab_power.py --observed)."
         )
 
 
-def load_votes_from_local(filepath: str = None) -> tuple[int, int]:
+# ---------------------------------------------------------------------------
+# Sequential (always-valid) monitoring
+# ---------------------------------------------------------------------------
+
+# Beta(a, a) mixture over the win rate used by the mSPRT. a = 10 puts most of
+# the prior mass on win rates between ~30% and ~70%, the effect sizes this
+# test can realistically detect.
+DEFAULT_PRIOR_STRENGTH = 10.0
+
+# Bisection steps used to compute the confidence sequence bounds (precision 2^-40)
+CS_BISECTION_STEPS = 40
+
+
+@dataclass
+class SequentialResult:
+    """Container for the state of a sequential (always-valid) test."""
+    n_votes: int
+    vibe_wins: int
+    youtube_wins: int
+    win_rate: float
+    log_bayes_factor: float
+    always_valid_p_value: float
+    cs_lower: float
+    cs_upper: float
+    decision: str  # "continue", "stop_vibe", "stop_youtube" or "stop_inconclusive"
+
+
+def _log_likelihood(k: int, n: int, p: float) -> float:
+    """log(p^k (1-p)^(n-k)), with 0 * log(0) = 0."""
+    value = 0.0
+    if k:
+        value += k * math.log(p) if p > 0 else -math.inf
+    if n - k:
+        value += (n - k) * math.log(1 - p) if p < 1 else -math.inf
+    return value
+
+
+def _log_beta(a: float, b: float) -> float:
+    return math.lgamma(a) + math.lgamma(b) - math.lgamma(a + b)
+
+
+class SequentialMonitor:
     """
-    Load votes from local JSON file (localStorage backup).
-    
-    Returns:
-        Tuple of (vibe_wins, youtube_wins)
+    Mixture sequential probability ratio test (mSPRT) for H0: p = 0.5.
+
+    The test statistic is the Bayes factor of a Beta(a, a) mixture against
+    H0. Under H0 it is a nonnegative martingale, so by Ville's inequality
+    P(it ever reaches 1/alpha) <= alpha. The results can therefore be looked at
+    after every vote, and the test stopped as soon as the evidence is
+    sufficient, without inflating false positives.
+
+    The same mixture gives a confidence sequence for the win rate: an interval
+    that contains the true rate at all times simultaneously, with probability
+    1 - alpha. It only shrinks, as each new interval is intersected with the
+    previous ones.
+
+    Each update is O(1): the Bayes factor only depends on the vote counts.
+    """
+
+    def __init__(self, alpha: float = 0.05, prior_strength: float = DEFAULT_PRIOR_STRENGTH,
+                 max_votes: Optional[int] = None):
+        """
+        Args:
+            alpha: Type I error guaranteed over the whole (continuously monitored) test
+            prior_strength: a of the Beta(a, a) mixture
+            max_votes: Optional budget; reached without a conclusion, the decision is "stop_inconclusive"
+        """
+        self.alpha = alpha
+        self.prior_strength = prior_strength
+        self.max_votes = max_votes
+        self.n = 0
+        self.k = 0
+        self.min_p_value = 1.0
+        self.cs_lower = 0.0
+        self.cs_upper = 1.0
+        self.stopped_at = None
+
+    @classmethod
+    def from_counts(cls, vibe_wins: int, youtube_wins: int, **kwargs) -> "SequentialMonitor":
+        """
+        Monitor at the current counts, when the vote order is unknown (e.g. API totals).
+
+        The decision is still valid (Ville's inequality holds at any stopping
+        time), but without the history the p-value and the confidence
+        sequence are those of the current step only.
+        """
+        monitor = cls(**kwargs)
+        monitor.k, monitor.n = vibe_wins, vibe_wins + youtube_wins
+        monitor._refresh()
+        monitor.stopped_at = None  # Unknown without the history
+        return monitor
+
+    def _log_mixture(self) -> float:
+        a = self.prior_strength
+        return _log_beta(a + self.k, a + self.n - self.k) - _log_beta(a, a)
+
+    def log_bayes_factor(self) -> float:
+        """Log Bayes factor of the mixture against H0: p = 0.5."""
+        return self._log_mixture() - _log_likelihood(self.k, self.n, 0.5)
+
+    def _bound(self, log_mix: float, threshold: float, inside: float, outside: float) -> float:
+        # The log-likelihood is concave, so the accepted set is an interval around the MLE
+        for _ in range(CS_BISECTION_STEPS):
+            middle = (inside + outside) / 2
+            if log_mix - _log_likelihood(self.k, self.n, middle) < threshold:
+                inside = middle
+            else:
+                outside = middle
+        return inside
+
+    def _refresh(self):
+        log_bf = self.log_bayes_factor()
+        self.min_p_value = min(self.min_p_value, math.exp(-log_bf) if log_bf > 0 else 1.0)
+
+        if self.n:
+            log_mix = self._log_mixture()
+            threshold = math.log(1 / self.alpha)
+            p_hat = self.k / self.n
+            self.cs_lower = max(self.cs_lower, self._bound(log_mix, threshold, p_hat, 0.0))
+            self.cs_upper = min(self.cs_upper, self._bound(log_mix, threshold, p_hat, 1.0))
+
+        if self.stopped_at is None and self.decision() != "continue":
+            self.stopped_at = self.n
+
+    def update(self, vibe_won: bool) -> "SequentialMonitor":
+        """
+        Adds one vote.
+
+        Args:
+            vibe_won: True if the vote went to VibeReco
+        """
+        self.n += 1
+        self.k += int(bool(vibe_won))
+        self._refresh()
+        return self
+
+    def decision(self) -> str:
+        """
+        Stop/continue decision at the current step.
+
+        Returns:
+            "stop_vibe" / "stop_youtube" once the confidence sequence excludes
+            50% (equivalently, the always-valid p-value is below alpha),
+            "stop_inconclusive" when max_votes is reached first, else "continue"
+        """
+        if self.cs_lower > 0.5:
+            return "stop_vibe"
+        if self.cs_upper < 0.5:
+            return "stop_youtube"
+        if self.max_votes is not None and self.n >= self.max_votes:
+            return "stop_inconclusive"
+        return "continue"
+
+    def result(self) -> SequentialResult:
+        return SequentialResult(
+            n_votes=self.n,
+            vibe_wins=self.k,
+            youtube_wins=self.n - self.k,
+            win_rate=self.k / self.n if self.n else 0.0,
+            log_bayes_factor=self.log_bayes_factor(),
+            always_valid_p_value=self.min_p_value,
+            cs_lower=self.cs_lower,
+            cs_upper=self.cs_upper,
+            decision=self.decision(),
+        )
+
+
+class SequentialAnalyzer:
+    """
+    Streams votes into a global SequentialMonitor and one monitor per seed.
+
+    Per-seed tests each control their own error rate at seed_alpha; pass
+    alpha / number of seeds to control the error over all seeds at once.
+    """
+
+    def __init__(self, alpha: float = 0.05, seed_alpha: Optional[float] = None,
+                 prior_strength: float = DEFAULT_PRIOR_STRENGTH, max_votes: Optional[int] = None):
+        self.seed_alpha = seed_alpha if seed_alpha is not None else alpha
+        self.prior_strength = prior_strength
+        self.global_monitor = SequentialMonitor(alpha, prior_strength, max_votes)
+        self.seeds: dict[str, SequentialMonitor] = {}
+
+    def _seed_monitor(self, seed) -> SequentialMonitor:
+        seed = str(seed)
+        if seed not in self.seeds:
+            self.seeds[seed] = SequentialMonitor(self.seed_alpha, self.prior_strength)
+        return self.seeds[seed]
+
+    def update(self, vote: dict) -> str:
+        """
+        Adds one vote (a dict with winnerSource and seedId, as sent by the frontend).
+
+        Returns:
+            The global decision after this vote
+        """
+        source = vote.get('winnerSource')
+        if source not in ('vibe', 'youtube'):
+            return self.global_monitor.decision()
+        self.global_monitor.update(source == 'vibe')
+        self._seed_monitor(vote.get('seedId')).update(source == 'vibe')
+        return self.global_monitor.decision()
+
+    @classmethod
+    def from_stats(cls, stats: dict, **kwargs) -> "SequentialAnalyzer":
+        """
+        Builds the analyzer from the /api/track GET response (totals and by_seed counts).
+        """
+        analyzer = cls(**kwargs)
+        analyzer.global_monitor = SequentialMonitor.from_counts(
+            stats.get('vibe_wins', 0), stats.get('youtube_wins', 0),
+            alpha=analyzer.global_monitor.alpha, prior_strength=analyzer.prior_strength,
+            max_votes=analyzer.global_monitor.max_votes,
+        )
+        for seed, counts in (stats.get('by_seed') or {}).items():
+            analyzer.seeds[str(seed)] = SequentialMonitor.from_counts(
+                counts.get('vibe', 0), counts.get('youtube', 0),
+                alpha=analyzer.seed_alpha, prior_strength=analyzer.prior_strength,
+            )
+        return analyzer
+
+
+DECISION_LABELS = {
+    "continue": "⏳ Continuer la collecte",
+    "stop_vibe": "✅ Arrêt : VibeReco préféré",
+    "stop_youtube": "⚠️ Arrêt : YouTube préféré",
+    "stop_inconclusive": "⏹️ Arrêt : budget de votes atteint sans conclusion",
+}
+
+
+def print_sequential_report(analyzer: SequentialAnalyzer):
+    """Print the always-valid monitoring state, globally and per seed."""
+    result = analyzer.global_monitor.result()
+
+    print("\n" + "=" * 70)
+    print(" VibeReco A/B Test - Suivi séquentiel (toujours valide)")
+    print("=" * 70)
+
+    print(f"\n📊 GLOBAL ({result.n_votes} votes)")
+    print(f"   • Win Rate VibeReco       : {result.win_rate * 100:.1f}%")
+    print(f"   • Séquence de confiance   : [{result.cs_lower * 100:.1f}% – {result.cs_upper * 100:.1f}%] "
+          f"(α = {analyzer.global_monitor.alpha})")
+    print(f"   • Facteur de Bayes (log)  : {result.log_bayes_factor:.2f}")
+    print(f"   • p-value toujours valide : {result.always_valid_p_value:.4f}")
+    print(f"   • Décision                : {DECISION_LABELS[result.decision]}")
+    if analyzer.global_monitor.stopped_at is not None:
+        print(f"   • Arrêt possible dès le vote n° {analyzer.global_monitor.stopped_at}")
+
+    if analyzer.seeds:
+        print(f"\n🌱 PAR SEED (α = {analyzer.seed_alpha})")
+        for seed, monitor in sorted(analyzer.seeds.items(), key=lambda item: (not item[0].isdigit(), int(item[0]) if item[0].isdigit() else 0, item[0])):
+            seed_result = monitor.result()
+            print(f"   • Seed {seed:>4} : {seed_result.vibe_wins}/{seed_result.n_votes} "
+                  f"[{seed_result.cs_lower * 100:.0f}% – {seed_result.cs_upper * 100:.0f}%] "
+                  f"{DECISION_LABELS[seed_result.decision]}")
+
+    print("\n" + "=" * 70)
+
+
+def load_vote_list_from_local(filepath: str = None) -> list[dict]:
+    """
+    Load the individual votes from local JSON file (localStorage backup), oldest first.
     """
     if filepath is None:
         # Try common locations
@@ -263,11 +721,37 @@ def load_votes_from_local(filepath: str = None) -> tuple[int, int]:
     
     if filepath is None or not os.path.exists(filepath):
         print("⚠️ No local votes file found.")
-        return (0, 0)
+        return []
     
     with open(filepath, 'r', encoding='utf-8') as f:
         votes = json.load(f)
+
+    return sorted(votes, key=lambda v: v.get('timestamp') or '')
+
+
+def load_votes_from_archive(columns=None, since: str = None, until: str = None,
+                            archive_dir: str = None) -> pd.DataFrame:
+    """
+    Load votes from the columnar vote archive (src/vote_archive.py), oldest first.
+
+    Only the day partitions between since and until, and only the requested
+    columns, are read.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    from src.vote_archive import ARCHIVE_DIR, VoteArchive
+
+    return VoteArchive(archive_dir or os.path.join(root, ARCHIVE_DIR)).read(columns, since, until)
+
+
+def load_votes_from_local(filepath: str = None) -> tuple[int, int]:
+    """
+    Load votes from local JSON file (localStorage backup).
     
+    Returns:
+        Tuple of (vibe_wins, youtube_wins)
+    """
+    votes = load_vote_list_from_local(filepath)
     vibe_wins = sum(1 for v in votes if v.get('winnerSource') == 'vibe')
     youtube_wins = sum(1 for v in votes if v.get('winnerSource') == 'youtube')
     
@@ -281,22 +765,34 @@ def fetch_stats_from_api(api_url: str = None) -> Optional[tuple[int, int]]:
     Returns:
         Tuple of (vibe_wins, youtube_wins) or None if failed
     """
+    data = fetch_api_stats(api_url)
+    if data is None:
+        return None
+    return (data.get('vibe_wins', 0), data.get('youtube_wins', 0))
+
+
+def fetch_api_stats(api_url: str = None) -> Optional[dict]:
+    """
+    Fetch the full stats response of the API endpoint (totals and by_seed counts).
+
+    Returns:
+        The GET /api/track response, or None if failed
+    """
     if not HAS_REQUESTS:
         print("⚠️ requests library not installed. Run: pip install requests")
         return None
-    
+
     if api_url is None:
         # Default to production URL or local
         api_url = os.environ.get(
             'VIBERECO_API_URL', 
             'https://vibe-reco.vercel.app/api/track'
         )
-    
+
     try:
         response = requests.get(api_url, timeout=10)
         if response.ok:
-            data = response.json()
-            return (data.get('vibe_wins', 0), data.get('youtube_wins', 0))
+            return response.json()
         else:
             print(f"⚠️ API error: {response.status_code}")
             return None
@@ -352,11 +848,49 @@ def print_report(result: SignificanceResult, for_article: bool = True):
 
 def main():
     """Main entry point for CLI usage."""
-    import sys
-    
     use_local = '--local' in sys.argv
-    
-    if use_local:
+    use_archive = '--archive' in sys.argv
+    # Day range of the archive
+    since = sys.argv[sys.argv.index('--since') + 1] if '--since' in sys.argv[:-1] else None
+    until = sys.argv[sys.argv.index('--until') + 1] if '--until' in sys.argv[:-1] else None
+
+    if '--batch' in sys.argv:
+        # Individual votes are needed for the per-seed / per-criterion grid
+        if use_archive:
+            print("🗄️ Loading from the vote archive...")
+            votes = load_votes_from_archive(['seedId', 'vibe', 'winnerSource'] + list(SCORE_CRITERIA), since, until)
+        else:
+            print("📂 Loading from local votes file...")
+            votes = load_vote_list_from_local()
+        report = batch_significance(votes, correction='bh' if '--fdr' in sys.argv else 'holm')
+        print("\n🔬 SIGNIFICATIVITÉ PAR SEED, VIBE ET CRITÈRE "
+              f"(correction {'Benjamini-Hochberg' if '--fdr' in sys.argv else 'Holm'})")
+        print(report.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+        return report
+
+    if '--sequential' in sys.argv:
+        if use_archive:
+            print("🗄️ Streaming votes from the vote archive...")
+            analyzer = SequentialAnalyzer()
+            for vote in load_votes_from_archive(['seedId', 'winnerSource'], since, until).to_dict('records'):
+                analyzer.update(vote)
+        elif use_local:
+            print("📂 Streaming local votes...")
+            analyzer = SequentialAnalyzer()
+            for vote in load_vote_list_from_local():
+                analyzer.update(vote)
+        else:
+            print("🌐 Fetching from API...")
+            stats = fetch_api_stats()
+            analyzer = SequentialAnalyzer.from_stats(stats or {})
+        print_sequential_report(analyzer)
+        return analyzer
+    
+    if use_archive:
+        print("🗄️ Loading from the vote archive...")
+        winners = load_votes_from_archive(['winnerSource'], since, until)['winnerSource']
+        vibe_wins, youtube_wins = int((winners == 'vibe').sum()), int((winners == 'youtube').sum())
+    elif use_local:
         print("📂 Loading from local votes file...")
         vibe_wins, youtube_wins = load_votes_from_local()
     else:
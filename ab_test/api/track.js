@@ -1,9 +1,23 @@
 /**
  * Vercel Serverless Function - Vote Tracking API
- * 
+ *
  * Endpoint: POST /api/track
  * Stores A/B test votes in Vercel KV (Redis)
- * 
+ *
+ * Keys (shared with ab_test/vote_service.py, the local Python equivalent):
+ * - vibereco:votes     list of raw votes, newest first
+ * - vibereco:counters  hash: total_votes, vibe_wins, youtube_wins, seed:<id>:<source>
+ * - vibereco:test_ids  set of recorded testIds
+ *
+ * A vote is recorded by one Lua script, atomically and in one round trip:
+ * counters are only incremented (no read-modify-write of a stats blob, so
+ * concurrent votes cannot overwrite each other), and a testId already
+ * recorded (client retry) is not counted twice.
+ *
+ * Stores written before the counters existed only hold the vote list: the
+ * first vote or stats read after the deploy builds the counters from it, in
+ * the same script, so no manual migration step is needed.
+ *
  * Required env vars:
  * - KV_REST_API_URL
  * - KV_REST_API_TOKEN
@@ -13,54 +27,111 @@
 const KV_URL = process.env.KV_REST_API_URL;
 const KV_TOKEN = process.env.KV_REST_API_TOKEN;
 
-async function kvSet(key, value) {
-    const response = await fetch(`${KV_URL}/set/${key}`, {
+const VOTES_KEY = 'vibereco:votes';
+const COUNTERS_KEY = 'vibereco:counters';
+const TEST_IDS_KEY = 'vibereco:test_ids';
+const SOURCES = ['vibe', 'youtube'];
+
+// Builds the counters and the testId set from the vote list if the counters
+// hash does not exist yet (same rules as rebuild_counters in vote_service.py)
+// KEYS: votes, counters, test_ids
+const BACKFILL_LUA = `
+local function backfill()
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        return
+    end
+    local votes = redis.call('LRANGE', KEYS[1], 0, -1)
+    local seen = {}
+    -- Oldest first, so the first recorded copy of a testId is the one counted
+    for i = #votes, 1, -1 do
+        local ok, vote = pcall(cjson.decode, votes[i])
+        if ok and type(vote) == 'table' and vote.testId and (vote.winnerSource == 'vibe' or vote.winnerSource == 'youtube') then
+            local testId = tostring(vote.testId)
+            if not seen[testId] then
+                seen[testId] = true
+                redis.call('SADD', KEYS[3], testId)
+                redis.call('HINCRBY', KEYS[2], 'total_votes', 1)
+                redis.call('HINCRBY', KEYS[2], vote.winnerSource .. '_wins', 1)
+                if vote.seedId ~= nil and vote.seedId ~= cjson.null and vote.seedId ~= '' then
+                    redis.call('HINCRBY', KEYS[2], 'seed:' .. tostring(vote.seedId) .. ':' .. vote.winnerSource, 1)
+                end
+            end
+        end
+    end
+    -- Creates the hash even from an empty list, so the backfill runs once
+    redis.call('HINCRBY', KEYS[2], 'total_votes', 0)
+end
+`;
+
+// KEYS: votes, counters, test_ids - ARGV: testId, vote JSON, winnerSource, seedId
+const RECORD_VOTE_SCRIPT = BACKFILL_LUA + `
+backfill()
+if redis.call('SADD', KEYS[3], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('LPUSH', KEYS[1], ARGV[2])
+redis.call('HINCRBY', KEYS[2], 'total_votes', 1)
+redis.call('HINCRBY', KEYS[2], ARGV[3] .. '_wins', 1)
+redis.call('HINCRBY', KEYS[2], 'seed:' .. ARGV[4] .. ':' .. ARGV[3], 1)
+return 1
+`;
+
+// KEYS: votes, counters, test_ids
+const READ_STATS_SCRIPT = BACKFILL_LUA + `
+backfill()
+return redis.call('HGETALL', KEYS[2])
+`;
+
+async function kvCommand(command) {
+    const response = await fetch(KV_URL, {
         method: 'POST',
         headers: {
             'Authorization': `Bearer ${KV_TOKEN}`,
             'Content-Type': 'application/json'
         },
-        body: JSON.stringify(value)
+        body: JSON.stringify(command)
     });
-    return response.ok;
-}
-
-async function kvGet(key) {
-    const response = await fetch(`${KV_URL}/get/${key}`, {
-        headers: {
-            'Authorization': `Bearer ${KV_TOKEN}`
-        }
-    });
-    if (response.ok) {
-        const data = await response.json();
-        return data.result;
+    const data = await response.json();
+    if (!response.ok || data.error) {
+        throw new Error(data.error || `KV request failed (${response.status})`);
     }
-    return null;
+    return data.result;
 }
 
-async function kvLpush(key, value) {
-    const response = await fetch(`${KV_URL}/lpush/${key}`, {
-        method: 'POST',
-        headers: {
-            'Authorization': `Bearer ${KV_TOKEN}`,
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify(value)
-    });
-    return response.ok;
+async function recordVote(vote) {
+    const added = await kvCommand([
+        'EVAL', RECORD_VOTE_SCRIPT, '3', VOTES_KEY, COUNTERS_KEY, TEST_IDS_KEY,
+        String(vote.testId), JSON.stringify(vote), vote.winnerSource, String(vote.seedId)
+    ]);
+    return added === 1;
 }
 
-async function kvLrange(key, start, end) {
-    const response = await fetch(`${KV_URL}/lrange/${key}/${start}/${end}`, {
-        headers: {
-            'Authorization': `Bearer ${KV_TOKEN}`
-        }
-    });
-    if (response.ok) {
-        const data = await response.json();
-        return data.result || [];
+async function readStats() {
+    // HGETALL replies with a flat [field, value, field, value, ...] list
+    const flat = (await kvCommand(['EVAL', READ_STATS_SCRIPT, '3', VOTES_KEY, COUNTERS_KEY, TEST_IDS_KEY])) || [];
+    const counters = {};
+    for (let i = 0; i < flat.length; i += 2) {
+        counters[flat[i]] = parseInt(flat[i + 1], 10);
     }
-    return [];
+
+    const total = counters.total_votes || 0;
+    const bySeed = {};
+    for (const [field, value] of Object.entries(counters)) {
+        if (!field.startsWith('seed:')) continue;
+        const rest = field.slice('seed:'.length);
+        const split = rest.lastIndexOf(':');
+        const seedKey = rest.slice(0, split);
+        bySeed[seedKey] = bySeed[seedKey] || { vibe: 0, youtube: 0 };
+        bySeed[seedKey][rest.slice(split + 1)] = value;
+    }
+
+    return {
+        total_votes: total,
+        vibe_wins: counters.vibe_wins || 0,
+        youtube_wins: counters.youtube_wins || 0,
+        vibe_win_rate: total > 0 ? ((counters.vibe_wins || 0) / total) * 100 : 0,
+        by_seed: bySeed
+    };
 }
 
 // Main handler
@@ -79,7 +150,8 @@ export default async function handler(req, res) {
         try {
             const vote = req.body;
 
-            if (!vote || !vote.testId) {
+            const hasSeed = vote && vote.seedId !== undefined && vote.seedId !== null && vote.seedId !== '';
+            if (!vote || !vote.testId || !hasSeed || !SOURCES.includes(vote.winnerSource)) {
                 return res.status(400).json({ error: 'Invalid vote data' });
             }
 
@@ -93,17 +165,12 @@ export default async function handler(req, res) {
                 });
             }
 
-            // Save vote to list
-            const saved = await kvLpush('vibereco:votes', JSON.stringify(vote));
-
-            if (saved) {
-                // Update stats
-                await updateStats(vote);
-
-                return res.status(200).json({ success: true, testId: vote.testId });
-            } else {
-                return res.status(500).json({ error: 'Failed to save vote' });
+            const added = await recordVote(vote);
+            const body = { success: true, testId: vote.testId };
+            if (!added) {
+                body.duplicate = true;
             }
+            return res.status(200).json(body);
 
         } catch (error) {
             console.error('Error saving vote:', error);
@@ -124,18 +191,7 @@ export default async function handler(req, res) {
                 });
             }
 
-            const stats = await kvGet('vibereco:stats');
-
-            if (stats) {
-                return res.status(200).json(JSON.parse(stats));
-            } else {
-                return res.status(200).json({
-                    total_votes: 0,
-                    vibe_wins: 0,
-                    youtube_wins: 0,
-                    vibe_win_rate: 0
-                });
-            }
+            return res.status(200).json(await readStats());
 
         } catch (error) {
             console.error('Error getting stats:', error);
@@ -145,44 +201,3 @@ export default async function handler(req, res) {
 
     return res.status(405).json({ error: 'Method not allowed' });
 }
-
-async function updateStats(vote) {
-    try {
-        // Get current stats
-        let stats = await kvGet('vibereco:stats');
-        stats = stats ? JSON.parse(stats) : {
-            total_votes: 0,
-            vibe_wins: 0,
-            youtube_wins: 0,
-            vibe_win_rate: 0,
-            by_seed: {}
-        };
-
-        // Update counts
-        stats.total_votes++;
-
-        if (vote.winnerSource === 'vibe') {
-            stats.vibe_wins++;
-        } else {
-            stats.youtube_wins++;
-        }
-
-        // Calculate win rate
-        stats.vibe_win_rate = stats.total_votes > 0
-            ? (stats.vibe_wins / stats.total_votes) * 100
-            : 0;
-
-        // Track by seed
-        const seedKey = String(vote.seedId);
-        if (!stats.by_seed[seedKey]) {
-            stats.by_seed[seedKey] = { vibe: 0, youtube: 0 };
-        }
-        stats.by_seed[seedKey][vote.winnerSource]++;
-
-        // Save updated stats
-        await kvSet('vibereco:stats', JSON.stringify(stats));
-
-    } catch (error) {
-        console.error('Error updating stats:', error);
-    }
-}
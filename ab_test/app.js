@@ -26,7 +26,12 @@ const state = {
     currentPlaylistLabel: null
 };
 
+// Manifest of the per-seed playlist shards (small, loaded at startup)
+let PLAYLISTS_MANIFEST = null;
+// Legacy single-file data, only used when no manifest was generated
 let PLAYLISTS_DATA = null;
+// seedId -> Promise of the seed's playlists (each shard is fetched once)
+const shardCache = new Map();
 
 const elements = {
     // Steps
@@ -100,18 +105,52 @@ async function init() {
 
 async function loadPlaylistsData() {
     try {
-        const response = await fetch('data/ab_test_playlists.json');
-        if (!response.ok) {
-            PLAYLISTS_DATA = null;
+        const response = await fetch('data/playlists/manifest.json');
+        if (response.ok) {
+            PLAYLISTS_MANIFEST = await response.json();
             return;
         }
-        PLAYLISTS_DATA = await response.json();
+    } catch {
+        PLAYLISTS_MANIFEST = null;
+    }
+
+    // Fallback: legacy single file with every seed
+    try {
+        const response = await fetch('data/ab_test_playlists.json');
+        PLAYLISTS_DATA = response.ok ? await response.json() : null;
     } catch {
         PLAYLISTS_DATA = null;
     }
 }
 
-function getPlaylistsForSeed(seedId) {
+function getSeedCover(seedId) {
+    const shard = PLAYLISTS_MANIFEST?.shards?.[String(seedId)];
+    if (shard) return shard.cover || null;
+    return PLAYLISTS_DATA?.playlists?.[String(seedId)]?.youtube?.[0]?.videoId || null;
+}
+
+function fetchSeedShard(seedId) {
+    const shard = PLAYLISTS_MANIFEST?.shards?.[String(seedId)];
+    if (!shard) return Promise.resolve(null);
+
+    if (!shardCache.has(shard.file)) {
+        // Content-addressed file name: safe to cache forever
+        const request = fetch(`data/playlists/${shard.file}`)
+            .then(response => (response.ok ? response.json() : null))
+            .catch(() => null)
+            .then(data => {
+                if (!data) shardCache.delete(shard.file); // allow a retry
+                return data;
+            });
+        shardCache.set(shard.file, request);
+    }
+    return shardCache.get(shard.file);
+}
+
+async function getPlaylistsForSeed(seedId) {
+    const shard = await fetchSeedShard(seedId);
+    if (shard) return shard;
+
     if (PLAYLISTS_DATA?.playlists?.[String(seedId)]) {
         return PLAYLISTS_DATA.playlists[String(seedId)];
     }
@@ -160,10 +199,7 @@ function renderSeedGrid() {
         card.setAttribute('aria-label', `Choisir ${seed.title} - ${seed.artist}`);
 
         // Try cover from playlists if available
-        let videoId = null;
-        if (PLAYLISTS_DATA?.playlists?.[String(seed.id)]?.youtube?.[0]?.videoId) {
-            videoId = PLAYLISTS_DATA.playlists[String(seed.id)].youtube[0].videoId;
-        }
+        const videoId = getSeedCover(seed.id);
 
         if (videoId) {
             const img = document.createElement('img');
@@ -278,6 +314,9 @@ function selectSeedById(seedId) {
     if (card) card.classList.add('selected');
 
     elements.startTestBtn.disabled = false;
+
+    // Start downloading this seed's playlists while the user reaches for "start"
+    fetchSeedShard(idNum);
 }
 
 function stepIndex(step) {
@@ -335,12 +374,12 @@ function goToStep(step) {
 // Test flow
 // ------------------------------
 
-function startTest() {
+async function startTest() {
     if (!state.selectedSeedId || !state.selectedSeed) return;
 
     state.testId = generateTestId();
 
-    const seedData = getPlaylistsForSeed(state.selectedSeedId);
+    const seedData = await getPlaylistsForSeed(state.selectedSeedId);
     if (!seedData?.youtube?.length || !seedData?.vibereco?.length) {
         alert("Playlists non disponibles pour ce seed.");
         return;
@@ -4,22 +4,45 @@ This script runs the MusicPipeline for each seed and saves both:
 - YouTube original order
 - VibeReco reranked order
 
-Output: data/ab_test_playlists.json
+Output: data/playlists/
+- manifest.json: seed list and, per seed, its shard file, content hash, size
+  and cover videoId
+- seed-<id>.<hash>.json: playlists of one seed (compact JSON)
+- *.gz / *.br: precompressed variants of every file (brotli is in
+  requirements.txt; without it, only .gz variants are written)
+
+The frontend loads the small manifest first and fetches a seed's shard only
+when that seed is picked. Saving a seed rewrites its own shard and the
+manifest, never the other seeds.
 
 FEATURES:
-- Incremental saves after each seed (no data loss on crash)
-- Resume from existing data
+- All seeds processed as one batch (MusicPipeline.run_batch): radios are
+  fetched concurrently and a track shared by several seeds is analyzed once,
+  under one global rate-limit budget per API
+- Per-track journal (data/ab_test_track_journal.jsonl): every processed track
+  is appended as soon as it is done, so a crashed run resumes without
+  re-analyzing anything
+- Resume from existing data (seeds already in the manifest are skipped; a
+  legacy data/ab_test_playlists.json is split into shards on first run)
 - Converts numpy types to native Python for JSON
 """
 
+import gzip
+import hashlib
 import json
 import os
 import sys
 from datetime import datetime
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.journal import TrackJournal, load_journal
 from src.pipeline import MusicPipeline
 import numpy as np
 
@@ -42,8 +65,16 @@ SEED_SONGS = [
     {"id": 15, "title": "Iris", "artist": "The Goo Goo Dolls", "query": "Iris The Goo Goo Dolls", "vibe": "emotionnel"},
 ]
 
+PLAYLIST_LIMIT = 15
+
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "data")
-OUTPUT_FILE = os.path.join(OUTPUT_DIR, "ab_test_playlists.json")
+SHARDS_DIR = os.path.join(OUTPUT_DIR, "playlists")
+MANIFEST_FILE = os.path.join(SHARDS_DIR, "manifest.json")
+LEGACY_OUTPUT_FILE = os.path.join(OUTPUT_DIR, "ab_test_playlists.json")
+JOURNAL_FILE = os.path.join(OUTPUT_DIR, "ab_test_track_journal.jsonl")
+
+# Track fields kept in the journal (enough to skip every pipeline stage)
+JOURNAL_FIELDS = ("song_id", "title", "artist", "videoId", "status", "source", "analysis", "vibe_text", "embedding")
 
 
 def to_native_type(value):
@@ -68,44 +99,111 @@ def format_track(track, index):
     }
 
 
-def load_existing_data():
-    """Load existing data to resume from previous run."""
-    if os.path.exists(OUTPUT_FILE):
+def _write_atomic(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def write_precompressed(path, payload):
+    """
+    Write a file and its precompressed variants (path.gz and path.br; .br is
+    skipped if the brotli package is missing), for servers that serve them directly.
+    """
+    _write_atomic(path, payload)
+    _write_atomic(path + ".gz", gzip.compress(payload, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(path + ".br", brotli.compress(payload, quality=11))
+
+
+def _remove_with_variants(path):
+    for variant in (path, path + ".gz", path + ".br"):
+        if os.path.exists(variant):
+            os.remove(variant)
+
+
+def new_manifest():
+    return {
+        "version": 1,
+        "generated_at": datetime.now().isoformat(),
+        "seeds": SEED_SONGS,
+        "shards": {}
+    }
+
+
+def load_manifest():
+    """
+    Load the shard manifest to resume from a previous run.
+    
+    A legacy single-file ab_test_playlists.json is split into shards once.
+    """
+    if os.path.exists(MANIFEST_FILE):
         try:
-            with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                print(f"📂 Loaded existing data with {len(data.get('playlists', {}))} seeds")
-                return data
+            with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+                print(f"📂 Loaded manifest with {len(manifest.get('shards', {}))} seeds")
+                return manifest
         except Exception as e:
-            print(f"⚠️ Could not load existing data: {e}")
+            print(f"⚠️ Could not load manifest: {e}")
+    
+    if os.path.exists(LEGACY_OUTPUT_FILE):
+        with open(LEGACY_OUTPUT_FILE, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        manifest = new_manifest()
+        manifest["generated_at"] = legacy.get("generated_at", manifest["generated_at"])
+        for seed_id, pair in legacy.get("playlists", {}).items():
+            if pair is not None:
+                save_seed_shard(manifest, seed_id, pair)
+        save_manifest(manifest)
+        print(f"📦 Split {LEGACY_OUTPUT_FILE} into {len(manifest['shards'])} seed shards")
+        return manifest
     return None
 
 
-def save_data(data):
-    """Save data to JSON file (incremental save)."""
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Saved to {OUTPUT_FILE}")
+def save_seed_shard(manifest, seed_id, pair):
+    """
+    Write the playlists of one seed as a content-addressed shard.
+    
+    The file name carries the content hash, so shards can be cached forever by
+    browsers and CDNs; the previous shard of the seed is removed.
+    """
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+    payload = json.dumps(pair, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(payload).hexdigest()
+    file_name = f"seed-{seed_id}.{digest[:12]}.json"
+    
+    previous = manifest["shards"].get(str(seed_id))
+    write_precompressed(os.path.join(SHARDS_DIR, file_name), payload)
+    if previous and previous["file"] != file_name:
+        _remove_with_variants(os.path.join(SHARDS_DIR, previous["file"]))
+    
+    manifest["shards"][str(seed_id)] = {
+        "file": file_name,
+        "sha256": digest,
+        "bytes": len(payload),
+        "cover": pair["youtube"][0]["videoId"] if pair.get("youtube") else None,
+    }
+
+
+def save_manifest(manifest):
+    """Save the manifest (a few hundred bytes per seed)."""
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+    manifest["last_updated"] = datetime.now().isoformat()
+    write_precompressed(MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    print(f"💾 Saved to {MANIFEST_FILE}")
 
 
-def generate_playlist_pair(seed, limit=15):
+def format_playlist_pair(seed, results, limit=15):
     """
-    Generate YouTube and VibeReco playlists for a single seed.
+    Build the YouTube and VibeReco playlists of a seed from a pipeline result.
     
     Returns dict with:
     - youtube: list of tracks in YouTube order
     - vibereco: list of tracks reranked by VibeReco
+    None if the pipeline produced no ranking
     """
-    print(f"\n{'='*60}")
-    print(f"Processing seed: {seed['title']} - {seed['artist']}")
-    print(f"{'='*60}")
-    
-    pipeline = MusicPipeline()
-    
     try:
-        results = pipeline.run(seed["query"], limit=limit, return_youtube_tracks=True)
-        
         if not results or not results.get("final_tracks"):
             print(f"❌ Failed to get results for {seed['title']}")
             return None
@@ -150,59 +248,69 @@ def generate_playlist_pair(seed, limit=15):
 
 
 def main():
-    """Generate all playlist pairs and save to JSON."""
+    """Generate all playlist pairs and save them as seed shards."""
     print("\n" + "="*70)
     print(" VibeReco A/B Test - Playlist Pre-Generation")
     print(" (with incremental saves - crash-resistant)")
     print("="*70)
     
     # Try to load existing data to resume
-    existing_data = load_existing_data()
+    manifest = load_manifest()
     
-    if existing_data:
-        all_playlists = existing_data
+    if manifest:
         print(f"🔄 Resuming from existing data...")
     else:
-        all_playlists = {
-            "generated_at": datetime.now().isoformat(),
-            "seeds": SEED_SONGS,
-            "playlists": {}
-        }
+        manifest = new_manifest()
     
     success_count = 0
     skipped_count = 0
+    pending_seeds = []
     
     for seed in SEED_SONGS:
         seed_id = str(seed["id"])
         
         # Skip if already processed successfully
-        if seed_id in all_playlists["playlists"] and all_playlists["playlists"][seed_id] is not None:
+        if seed_id in manifest["shards"]:
             print(f"\n⏭️  Skipping {seed['title']} (already processed)")
             skipped_count += 1
             success_count += 1
-            continue
-        
-        result = generate_playlist_pair(seed)
-        
-        if result:
-            all_playlists["playlists"][seed_id] = result
-            success_count += 1
-            print(f"✅ {seed['title']}: {len(result['youtube'])} tracks (YT) / {len(result['vibereco'])} tracks (VR)")
         else:
-            all_playlists["playlists"][seed_id] = None
+            pending_seeds.append(seed)
+    
+    if pending_seeds:
+        print(f"\n🚀 Processing {len(pending_seeds)} seeds as one batch...")
+        known = load_journal(JOURNAL_FILE)
+        if known:
+            print(f"📓 Loaded {len(known)} already processed tracks from the journal")
+        journal = TrackJournal(JOURNAL_FILE, fields=JOURNAL_FIELDS)
+        try:
+            batch_results = MusicPipeline().run_batch(
+                [seed["query"] for seed in pending_seeds],
+                limit=PLAYLIST_LIMIT,
+                known=known,
+                on_track_done=journal.append,
+            )
+        finally:
+            journal.close()
         
-        # INCREMENTAL SAVE after each seed
-        all_playlists["last_updated"] = datetime.now().isoformat()
-        save_data(all_playlists)
+        for seed, results in zip(pending_seeds, batch_results):
+            result = format_playlist_pair(seed, results, limit=PLAYLIST_LIMIT)
+            
+            if result:
+                # INCREMENTAL SAVE: only this seed's shard and the manifest are written
+                save_seed_shard(manifest, seed["id"], result)
+                save_manifest(manifest)
+                success_count += 1
+                print(f"✅ {seed['title']}: {len(result['youtube'])} tracks (YT) / {len(result['vibereco'])} tracks (VR)")
     
     print(f"\n{'='*70}")
     print(f"✅ Generation complete: {success_count}/{len(SEED_SONGS)} seeds processed")
     if skipped_count > 0:
         print(f"⏭️  {skipped_count} seeds were already processed (skipped)")
-    print(f"📁 Output saved to: {OUTPUT_FILE}")
+    print(f"📁 Output saved to: {SHARDS_DIR}")
     print(f"{'='*70}\n")
     
-    return all_playlists
+    return manifest
 
 
 if __name__ == "__main__":
@@ -0,0 +1,377 @@
+"""
+A/B Vote Ingestion Service
+
+Python implementation of the /api/track endpoint (see api/track.js), that also
+serves the A/B test frontend, so the whole test runs locally:
+
+    POST /api/track    Record a vote (JSON body sent by app.js, testId required)
+    GET  /api/track    Aggregated stats: total_votes, vibe_wins, youtube_wins,
+                       vibe_win_rate, by_seed {seedId: {vibe, youtube}}
+    GET  /*            Static files of ab_test/
+
+Votes are written to a Redis-compatible store (src/kv.py): the Upstash / Vercel
+KV instance used in production, or a local in-memory or file-backed stand-in.
+Unlike the former read-modify-write of a JSON stats blob, counters are only
+changed with atomic hash increments, so concurrent votes never overwrite each
+other:
+
+    vibereco:votes       list of raw votes (newest first), read by fetch_and_analyze.py
+    vibereco:counters    hash: total_votes, vibe_wins, youtube_wins, seed:<id>:<source>
+    vibereco:test_ids    set of recorded testIds (idempotency)
+
+Incoming votes are micro-batched: they are queued and written every
+BATCH_DELAY seconds (or BATCH_SIZE votes), each batch as one atomic
+transaction in one round trip, and a POST is answered once its batch is
+stored. A testId already recorded (client retry, double click) is acknowledged
+without being counted again: each batch is written by one Lua script
+(RECORD_VOTES_SCRIPT) that counts a vote only if its SADD to the testId set
+added it, so several ingesters on the same store (two services, or this one
+next to api/track.js) never count a vote twice. Votes without a seedId are
+rejected.
+
+A store that has votes but no counters yet (written before they existed) gets
+its counters built from the vote list when the service starts, before any
+vote is written; api/track.js does the same in its Lua scripts.
+
+Usage:
+    python ab_test/vote_service.py [--port 8000] [--kv file://<repo>/data/vote_kv.jsonl]
+                                   [--batch-size 100] [--batch-delay-ms 50]
+    python ab_test/vote_service.py --kv "$KV_REST_API_URL"   production store (never the default)
+    python ab_test/vote_service.py --rebuild      recompute counters from the vote list (recovery)
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import DATA_DIR
+from src.kv import open_kv, register_script
+
+STATIC_DIR = os.path.dirname(os.path.abspath(__file__))
+# Outside STATIC_DIR, so the vote log is never served as a static file
+DEFAULT_KV_URL = "file://" + os.path.join(os.path.dirname(STATIC_DIR), DATA_DIR, "vote_kv.jsonl")
+
+VOTES_KEY = "vibereco:votes"
+COUNTERS_KEY = "vibereco:counters"
+TEST_IDS_KEY = "vibereco:test_ids"
+
+SOURCES = ("vibe", "youtube")
+
+# Records a batch of votes atomically (same counting rules as api/track.js)
+# KEYS: votes, counters, test_ids - ARGV: testId, vote JSON, winnerSource, seedId for each vote
+# Returns 1 per vote counted, 0 per testId already recorded
+RECORD_VOTES_SCRIPT = """
+local added = {}
+for i = 1, #ARGV, 4 do
+    if redis.call('SADD', KEYS[3], ARGV[i]) == 1 then
+        redis.call('LPUSH', KEYS[1], ARGV[i + 1])
+        redis.call('HINCRBY', KEYS[2], 'total_votes', 1)
+        redis.call('HINCRBY', KEYS[2], ARGV[i + 2] .. '_wins', 1)
+        redis.call('HINCRBY', KEYS[2], 'seed:' .. ARGV[i + 3] .. ':' .. ARGV[i + 2], 1)
+        added[#added + 1] = 1
+    else
+        added[#added + 1] = 0
+    end
+end
+return added
+"""
+
+# Micro-batching: maximum votes per write, and maximum wait before a partial batch is written
+BATCH_SIZE = 100
+BATCH_DELAY = 0.05
+
+# Seconds a POST waits for its batch to be stored
+WRITE_TIMEOUT = 10
+
+# Pending connections queued by the OS during a burst of votes
+LISTEN_BACKLOG = 128
+
+
+def counter_increments(votes):
+    """
+    Sums the counter increments of a list of votes.
+
+    Returns:
+        dict: {counter field: increment}
+    """
+    increments = {}
+    for vote in votes:
+        source = vote["winnerSource"]
+        fields = ["total_votes", f"{source}_wins"]
+        # Legacy votes without a seed still count in the totals
+        if has_seed(vote):
+            fields.append(f"seed:{vote['seedId']}:{source}")
+        for field in fields:
+            increments[field] = increments.get(field, 0) + 1
+    return increments
+
+
+def has_seed(vote):
+    """Tells whether a vote names its seed (0 is a valid seedId)."""
+    return vote.get("seedId") not in (None, "")
+
+
+def _record_votes_local(run, keys, args):
+    """Python equivalent of RECORD_VOTES_SCRIPT for the local stores."""
+    votes_key, counters_key, test_ids_key = keys
+    added = []
+    for i in range(0, len(args), 4):
+        test_id, raw, source, seed = args[i:i + 4]
+        if not run(["SADD", test_ids_key, test_id]):
+            added.append(0)
+            continue
+        run(["LPUSH", votes_key, raw])
+        for field in ("total_votes", f"{source}_wins", f"seed:{seed}:{source}"):
+            run(["HINCRBY", counters_key, field, "1"])
+        added.append(1)
+    return added
+
+
+register_script(RECORD_VOTES_SCRIPT, _record_votes_local)
+
+
+def read_stats(kv):
+    """
+    Builds the GET /api/track response from the counters hash.
+    """
+    flat = kv.command("HGETALL", COUNTERS_KEY) or []
+    counters = {flat[i]: int(flat[i + 1]) for i in range(0, len(flat), 2)}
+    total = counters.get("total_votes", 0)
+    by_seed = {}
+    for field, value in counters.items():
+        if field.startswith("seed:"):
+            seed, _, source = field[len("seed:"):].rpartition(":")
+            by_seed.setdefault(seed, {name: 0 for name in SOURCES})[source] = value
+    return {
+        "total_votes": total,
+        "vibe_wins": counters.get("vibe_wins", 0),
+        "youtube_wins": counters.get("youtube_wins", 0),
+        "vibe_win_rate": counters.get("vibe_wins", 0) / total * 100 if total else 0,
+        "by_seed": by_seed,
+    }
+
+
+def rebuild_counters(kv):
+    """
+    Recomputes the counters and the testId set from the vote list.
+
+    For recovery, and to migrate stores that only have the legacy
+    vibereco:stats blob. Run it while no ingestion service is writing.
+
+    Returns:
+        int: Number of distinct votes counted
+    """
+    votes, seen = [], set()
+    # Oldest first, so the first recorded copy of a testId is the one kept
+    for raw in reversed(kv.command("LRANGE", VOTES_KEY, 0, -1) or []):
+        try:
+            vote = json.loads(raw) if isinstance(raw, str) else raw
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(vote, dict) or not vote.get("testId") or vote.get("testId") in seen or vote.get("winnerSource") not in SOURCES:
+            continue
+        seen.add(vote.get("testId"))
+        votes.append(vote)
+
+    commands = [["DEL", COUNTERS_KEY, TEST_IDS_KEY]]
+    commands += [["HINCRBY", COUNTERS_KEY, field, amount] for field, amount in counter_increments(votes).items()]
+    if seen:
+        commands.append(["SADD", TEST_IDS_KEY] + sorted(seen, key=str))
+    kv.execute(commands, atomic=True)
+    return len(votes)
+
+
+def backfill_counters(kv):
+    """
+    Builds the counters from the vote list if the store has votes but no counters yet.
+
+    Called at startup, before the batcher writes anything: once a vote is
+    counted the counters exist and a missing history could no longer be told
+    apart from a complete one.
+
+    Returns:
+        int: Number of distinct votes counted, or None if nothing was built
+    """
+    if kv.command("HGETALL", COUNTERS_KEY) or not kv.command("LLEN", VOTES_KEY):
+        return None
+    return rebuild_counters(kv)
+
+
+class VoteBatcher:
+    """
+    Queues votes and writes them in atomic micro-batches from a background thread.
+
+    Attributes:
+        kv: Store the votes are written to
+        batch_size: Maximum votes per write
+        batch_delay: Maximum seconds a vote waits for its batch to fill
+    """
+
+    def __init__(self, kv, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY):
+        self.kv = kv
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="vote-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, vote):
+        """
+        Queues a vote.
+
+        Returns:
+            concurrent.futures.Future: Resolves to {"duplicate": bool} once the
+            vote's batch is stored, or to the write error
+        """
+        future = Future()
+        self._queue.put((vote, future))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        # The testId check and the writes run in one script, so no other ingester can slip in between
+        args = []
+        for vote, _ in batch:
+            args += [str(vote["testId"]), json.dumps(vote, ensure_ascii=False), vote["winnerSource"], str(vote["seedId"])]
+        try:
+            added = self.kv.command("EVAL", RECORD_VOTES_SCRIPT, 3, VOTES_KEY, COUNTERS_KEY, TEST_IDS_KEY, *args)
+        except Exception as e:
+            print(f"❌ Vote batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), counted in zip(batch, added):
+            future.set_result({"duplicate": not int(counted)})
+
+
+class VoteServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server with a listen backlog sized for bursts of votes.
+    """
+
+    request_queue_size = LISTEN_BACKLOG
+    daemon_threads = True
+
+
+class VoteHandler(SimpleHTTPRequestHandler):
+    """
+    Serves /api/track and the static frontend.
+    """
+
+    server_version = "VibeRecoVotes/1.0"
+    batcher = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=STATIC_DIR, **kwargs)
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        super().end_headers()
+
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/api/track":
+            return super().do_GET()
+        try:
+            self.send_json(200, read_stats(self.batcher.kv))
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/api/track":
+            return self.send_json(405, {"error": "Method not allowed"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            vote = json.loads(self.rfile.read(length) or b"null")
+        except (ValueError, json.JSONDecodeError):
+            vote = None
+        if not isinstance(vote, dict) or not vote.get("testId") or not has_seed(vote) or vote.get("winnerSource") not in SOURCES:
+            return self.send_json(400, {"error": "Invalid vote data"})
+
+        try:
+            outcome = self.batcher.submit(vote).result(timeout=WRITE_TIMEOUT)
+        except FutureTimeoutError:
+            return self.send_json(503, {"error": "Vote store busy, retry later"}, headers={"Retry-After": "2"})
+        except Exception as e:
+            return self.send_json(500, {"error": str(e)})
+
+        body = {"success": True, "testId": vote["testId"]}
+        if outcome["duplicate"]:
+            body["duplicate"] = True
+        self.send_json(200, body)
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Cache-Control", "no-store")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VibeReco A/B vote ingestion service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--kv", default=DEFAULT_KV_URL,
+                        help="memory://, file://<path> or the KV REST URL (default: a local file; "
+                             "pass --kv \"$KV_REST_API_URL\" to use the production store)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--batch-delay-ms", type=float, default=BATCH_DELAY * 1000)
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the counters from the vote list, then exit")
+    args = parser.parse_args()
+
+    kv = open_kv(args.kv)
+    if args.rebuild:
+        print(f"✅ Counters rebuilt from {rebuild_counters(kv)} votes")
+        return
+    counted = backfill_counters(kv)
+    if counted is not None:
+        print(f"✅ Counters built from {counted} stored votes")
+
+    VoteHandler.batcher = VoteBatcher(kv, batch_size=args.batch_size, batch_delay=args.batch_delay_ms / 1000)
+    server = VoteServer((args.host, args.port), VoteHandler)
+    print(f"🗳️  Vote service listening on http://{args.host}:{args.port} (store: {urlparse(args.kv).scheme})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -198,6 +198,27 @@ def main():
                 st.success("Pour l'instant, VibeReco surpasse la baseline.")
             else:
                 st.warning("Pour l'instant, YouTube reste meilleur. Il faudra peut-être ajuster l'algorithme.")
+
+            st.markdown("---")
+            st.subheader("Par morceau de départ")
+            st.dataframe(
+                [
+                    {"Seed": seed, "Votes": row["votes"], "VibeReco": row["vibe_wins"], "YouTube": row["youtube_wins"]}
+                    for seed, row in sorted(stats["by_seed"].items(), key=lambda item: -item[1]["votes"])
+                ],
+                use_container_width=True,
+            )
+
+            st.subheader("Notes moyennes de la playlist préférée")
+            st.dataframe(
+                [
+                    {"Source": "VibeReco" if source == "vibe" else "YouTube", "Critère": criterion,
+                     "Moyenne": round(score["mean"], 2), "Écart-type": round(score["std"], 2), "Votes": score["count"]}
+                    for source, criteria in sorted(stats["scores"].items())
+                    for criterion, score in sorted(criteria.items())
+                ],
+                use_container_width=True,
+            )
         else:
             st.info("Pas encore de données. Lance quelques tests pour commencer.")
 
@@ -1,8 +1,5 @@
 import streamlit as st
-import numpy as np
-import os
-import json
-import faiss
+from src.catalog import get_catalog
 from src.pipeline import MusicPipeline
 
 # --- CONFIGURATION DE LA PAGE ---
@@ -34,28 +31,24 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- FONCTIONS UTILITAIRES POUR LE MODE CATALOGUE (STATIC) ---
-@st.cache_data
+@st.cache_resource
 def load_static_data():
-    path = os.path.join("data", "candidates_with_embedding.json")
-    # Fallback pour compatibilité avec l'ancienne structure
-    if not os.path.exists(path):
-        path = "docs/candidates_with_embedding.json"
-    
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+    # Catalogue binaire (data/catalog/) : embeddings et index FAISS en mémoire mappée, métadonnées SQLite.
+    # L'ancien JSON (data/ ou docs/candidates_with_embedding.json) est converti au premier chargement.
+    # L'objet reste le même pour tout le processus : il bascule tout seul, en arrière-plan,
+    # sur chaque nouveau snapshot publié (pas de redémarrage ni de rechargement à froid).
+    return get_catalog()
 
-@st.cache_resource
-def load_static_index():
-    path = os.path.join("data", "my_music_index.faiss")
-    # Fallback
-    if not os.path.exists(path):
-        path = "docs/my_music_index.faiss"
-        
-    if os.path.exists(path):
-        return faiss.read_index(path)
-    return None
+
+SIMILAR_PAGE_SIZE = 3
+SEARCH_LIMIT = 20
+
+def show_similar(seed):
+    st.session_state["similar_seed"] = seed
+    st.session_state["similar_count"] = SIMILAR_PAGE_SIZE
+
+def show_more_similar():
+    st.session_state["similar_count"] += SIMILAR_PAGE_SIZE
 
 # --- UI PRINCIPALE ---
 def main():
@@ -141,45 +134,47 @@ Entrez un titre. Le système va chercher la chanson, scanner ses paroles, analys
         st.markdown("### Pre-analyzed Database - Base de données pré-analysée")
         st.caption("This mode allows you to instantly explore songs already processed by our AI. - Ce mode permet d'explorer instantanément des chansons déjà traitées par notre IA.")
         
-        candidates = load_static_data()
-        index = load_static_index()
+        catalog = load_static_data()
+        # Snapshot courant, figé pour tout ce rendu (les numéros de ligne n'ont de sens que dans un snapshot)
+        store = catalog.store
 
-        if not candidates or not index:
+        if not store or not len(store):
             st.warning("No static data found. Use **Live Mode** to start analyzing music! - Aucune donnée statique trouvée. Utilisez le **Mode Live** pour commencer à analyser des musiques !")
         else:
-            # Filtrage des chansons valides (avec embeddings)
-            valid_songs = [s for s in candidates if s.get("embedding")]
-            titles = [f"{s['title']} - {s['artist']}" for s in valid_songs]
-            
+            # Le catalogue ne contient que des chansons avec embeddings (ligne i = ligne i du graphe k-NN)
+            labels = store.labels()  # calculés une fois par snapshot
+            st.caption(f"Catalog snapshot {store.version} - {len(store)} songs")
+
+            # Recherche tolérante aux accents et aux fautes de frappe : l'index renvoie directement
+            # les numéros de ligne, la liste déroulante ne contient que les meilleurs résultats
+            query = st.text_input("Search a title or an artist: - Rechercher un titre ou un artiste :", placeholder="stromae, yesterday beatles...")
+            rows = store.search(query, limit=SEARCH_LIMIT) if query.strip() else list(range(min(SEARCH_LIMIT, len(store))))
+
+            if not rows:
+                st.info("No matching song in the catalog. - Aucune chanson correspondante dans le catalogue.")
+                return
+
             col_sel, col_btn = st.columns([3, 1])
-            selected = col_sel.selectbox("Choose a song from the catalog: - Choisir une chanson dans le catalogue :", titles)
+            row = col_sel.selectbox("Choose a song from the catalog: - Choisir une chanson dans le catalogue :", rows, format_func=lambda r: labels[r])
+            selected = labels[row]
             
-            if col_btn.button("Find similar vibes - Trouver les vibes similaires"):
-                # Logique de recherche locale
-                idx = titles.index(selected)
-                seed_vector = np.array([valid_songs[idx]["embedding"]]).astype("float32")
-                
-                # Normalisation & Recherche
-                faiss.normalize_L2(seed_vector)
-                # On cherche k+1 car la chanson elle-même sera le résultat #1 (distance 1.0)
-                D, I = index.search(seed_vector, k=min(4, len(valid_songs)))
+            col_btn.button("Find similar vibes - Trouver les vibes similaires", on_click=show_similar, args=((store.version, row),))
+
+            if st.session_state.get("similar_seed") == (store.version, row):
+                # Lecture directe dans le graphe k-NN précalculé : aucune recherche FAISS au clic
+                neighbors = store.neighbors(row, limit=st.session_state["similar_count"])
                 
                 # Affichage des résultats
                 st.subheader(f"If you like '{selected}', our AI suggests: - Si vous aimez '{selected}', notre IA suggère :")
                 
-                # On ignore le premier résultat (soi-même)
                 cols = st.columns(3)
-                found_count = 0
-                
-                for i in range(1, len(I[0])): 
-                    match_idx = I[0][i]
-                    match_score = D[0][i]
-                    
-                    if match_idx < len(valid_songs):
-                        song = valid_songs[match_idx]
-                        with cols[found_count % 3]:
-                            render_song_card(song, match_score, i)
-                        found_count += 1
+                for rank, (match_idx, match_score) in enumerate(neighbors, start=1):
+                    with cols[(rank - 1) % 3]:
+                        render_song_card(store.song(match_idx), match_score, rank)
+
+                # Page suivante ("more like this") tant que le catalogue a d'autres voisins
+                if len(neighbors) == st.session_state["similar_count"] and len(neighbors) < len(store) - 1:
+                    st.button("More like this - Plus de vibes similaires", on_click=show_more_similar)
 
 def display_live_results(tracks, distances, indices):
     """Affiche les résultats du mode Live de manière structurée"""
@@ -1,11 +1,22 @@
-import os
+import argparse
+import hashlib
 import json
-import requests
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # Charts are only written to files, also from worker processes
 import matplotlib.pyplot as plt
 import seaborn as sns
 import matplotlib.ticker as mtick
-from datetime import datetime
+from matplotlib import cbook
+
+from ab_test.ab_bootstrap import criterion_gains
+from src.kv import open_kv
+from src.vote_archive import ARCHIVE_DIR, VoteArchive
+from src.vote_sync import CACHE_DIR, SCORE_CRITERIA, sync_votes
 
 # --- CONFIGURATION ---
 # Load env vars manually if not in env
@@ -36,68 +47,121 @@ COLOR_VIBE = "#8A2BE2"  # BlueViolet
 COLOR_YOUTUBE = "#FF0000"  # Red
 PALETTE = {"vibe": COLOR_VIBE, "youtube": COLOR_YOUTUBE}
 
-def fetch_data():
-    """Fetch all votes from Redis list 'vibereco:votes'"""
-    print("Fetching data from Redis...")
-    if not KV_URL or not KV_TOKEN:
+# Output file of each chart
+CHART_FILES = {
+    "donut": "1_win_rate_donut.png",
+    "gains": "2_criteria_gain_bar.png",
+    "seeds": "3_win_rate_by_seed.png",
+    "distribution": "5_score_distribution.png",
+    "rolling": "6_win_rate_over_time.png",
+}
+
+# Columns the charts read from the vote archive
+CHART_COLUMNS = ["timestamp", "seedTitle", "winnerSource"] + list(SCORE_CRITERIA)
+
+# Days averaged by the rolling win rate
+ROLLING_WINDOW_DAYS = 7
+
+# Input-data hash of each chart at its last render; a chart whose hash is unchanged is not re-rendered
+CHART_STATE_FILE = ".chart_hashes.json"
+
+# Bump when the look of the charts changes, to re-render them all
+CHART_STYLE_VERSION = 1
+
+def fetch_data(kv_url=None, cache_dir=CACHE_DIR):
+    """Sync new votes from Redis list 'vibereco:votes' into the local cache and return all votes"""
+    kv_url = kv_url or KV_URL
+    if not kv_url or (kv_url.startswith("http") and not KV_TOKEN):
         raise ValueError("Missing KV_REST_API_URL or KV_REST_API_TOKEN")
 
-    # lrange vibereco:votes 0 -1
-    url = f"{KV_URL}/lrange/vibereco:votes/0/-1"
-    headers = {"Authorization": f"Bearer {KV_TOKEN}"}
-    
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    
-    data = response.json()
-    raw_list = data.get("result", [])
-    
-    parsed_data = []
-    print(f"Raw list type: {type(raw_list)}")
-    if raw_list:
-        print(f"First item type: {type(raw_list[0])}")
-        print(f"First item: {raw_list[0]}")
-
-    for item in raw_list:
-        try:
-            # Handle potential double encoding or non-string
-            if isinstance(item, str):
-                obj = json.loads(item)
-            else:
-                obj = item
-                
-            # If it's still a string (double encoded), try again
-            if isinstance(obj, str):
-                try:
-                    obj = json.loads(obj)
-                except:
-                    pass
-            
-            if isinstance(obj, dict):
-                parsed_data.append(obj)
-            else:
-                print(f"Skipping non-dict item: {obj}")
-                
-        except Exception as e:
-            print(f"Error parsing item: {e}")
-            continue
-            
-    df = pd.DataFrame(parsed_data)
+    print("Syncing votes from Redis...")
+    df = sync_votes(open_kv(kv_url, KV_TOKEN), cache_dir)
     print(f"Loaded {len(df)} votes.")
     print("Columns:", df.columns.tolist())
     return df
 
-def viz_win_rate_donut(df):
+def load_archive(archive_dir=ARCHIVE_DIR, since=None, until=None):
+    """Read the chart columns of the votes between two days from the vote archive (see src/vote_archive.py)"""
+    print("Reading votes from the archive...")
+    df = VoteArchive(archive_dir).read(CHART_COLUMNS, since, until)
+    print(f"Loaded {len(df)} votes.")
+    return df
+
+def summarize(df):
+    """Single aggregation pass: every aggregate the charts need, one JSON-serializable payload per chart"""
+    score_cols = list(SCORE_CRITERIA)
+    total = len(df)
+    is_vibe = df['winnerSource'].eq('vibe')
+    by_source = df.groupby('winnerSource')
+
+    # 1. Global win rate
+    vibe_wins = int(is_vibe.sum())
+    summary = {
+        "total": total,
+        "win_share": {source: float(count / total) for source, count in df['winnerSource'].value_counts().items()} if total else {},
+        CHART_FILES["donut"]: {"vibe_pct": vibe_wins / total * 100 if total else 0.0},
+    }
+
+    # 2. Gain per criterion
+    # Structure of 'scores': {'emotional': X, 'narrative': Y, 'keepability': Z}
+    # We need to know the scores of the WINNER (which we have)
+    # BUT we assume the user rates the PAIR? No, the user rates the playlists AFTER choosing?
+    # Actually, looking at app.js: user chooses A or B, THEN rates THE CHOSEN ONE.
+    # So we don't have the score for the loser. We can only compare Average Score of VibeReco Winners vs Average Score of YouTube Winners.
+    # OR if the user rated both, we would compare paired.
+    # Re-reading app.js: "scores" object is submitted with the vote. The user rates the chosen playlist.
+    # So we compare Avg Score when Vibe Wins vs Avg Score when YouTube Wins.
+    
+    means = by_source[score_cols].mean()
+    if 'vibe' in means.index and 'youtube' in means.index:
+        diffs = means.loc['vibe'] - means.loc['youtube']  # Positive = Vibe is better
+        # Bootstrap 95% CI and permutation p-value of each gain (seeded, so the chart hash is stable)
+        gains = criterion_gains(df, by=None, criteria=score_cols).set_index('criterion')
+        summary[CHART_FILES["gains"]] = {
+            "diffs": {criterion: float(diffs[criterion]) for criterion in score_cols},
+            "ci": {criterion: [float(gains.loc[criterion, 'ci_lower']), float(gains.loc[criterion, 'ci_upper'])] for criterion in score_cols},
+            "p_values": {criterion: float(gains.loc[criterion, 'p_value']) for criterion in score_cols},
+        }
+    else:
+        summary[CHART_FILES["gains"]] = None
+
+    # 3. Win rate per seed
+    seeds = (is_vibe.groupby(df['seedTitle']).mean() * 100).sort_values(ascending=True)
+    summary[CHART_FILES["seeds"]] = {"seeds": [[title, float(rate)] for title, rate in seeds.items()]}
+
+    # 5. Score distributions, reduced to box statistics so the chart does not depend on the number of votes
+    boxes = {}
+    for criterion in score_cols:
+        boxes[criterion] = {}
+        for source, scores in by_source[criterion]:
+            values = scores.dropna().to_numpy()
+            if len(values):
+                stats = cbook.boxplot_stats(values)[0]
+                boxes[criterion][source] = {key: float(stats[key]) for key in ("med", "q1", "q3", "whislo", "whishi")}
+                boxes[criterion][source]["fliers"] = np.unique(stats["fliers"]).tolist()
+    summary[CHART_FILES["distribution"]] = {"boxes": boxes}
+
+    # 6. Rolling win rate over time, from the daily vote counts
+    dated = df['timestamp'].notna()
+    if dated.any():
+        days = df.loc[dated, 'timestamp'].dt.floor('D')
+        daily = is_vibe[dated].groupby(days).agg(['size', 'sum']).asfreq('D', fill_value=0)
+        window = daily.rolling(ROLLING_WINDOW_DAYS, min_periods=1).sum()
+        rate = (window['sum'] / window['size'] * 100).where(window['size'] > 0)
+        summary[CHART_FILES["rolling"]] = {
+            "days": [day.strftime("%Y-%m-%d") for day in daily.index],
+            "votes": daily['size'].astype(int).tolist(),
+            "rate": [None if np.isnan(value) else float(value) for value in rate],
+        }
+    else:
+        summary[CHART_FILES["rolling"]] = None
+    return summary
+
+def viz_win_rate_donut(data):
     """1. Global Win Rate Donut"""
-    if 'winnerSource' not in df.columns:
-        print("Column 'winnerSource' missing. Available:", df.columns.tolist())
-        return
     plt.figure(figsize=(6, 6))
-    
-    counts = df['winnerSource'].value_counts()
-    vibe_wins = counts.get('vibe', 0)
-    total = len(df)
-    vibe_pct = (vibe_wins / total) * 100 if total > 0 else 0
+
+    vibe_pct = data["vibe_pct"]
     yt_pct = 100 - vibe_pct
     
     labels = ['VibeReco', 'YouTube']
@@ -117,52 +181,33 @@ def viz_win_rate_donut(df):
     
     plt.title("VibeReco Win Rate", fontsize=14, pad=20)
     plt.tight_layout()
-    plt.savefig(f"{OUTPUT_DIR}/1_win_rate_donut.png", dpi=300)
+    plt.savefig(f"{OUTPUT_DIR}/{CHART_FILES['donut']}", dpi=300)
     plt.close()
-    print("Generated 1_win_rate_donut.png")
 
-def viz_criteria_gains(df):
+def viz_criteria_gains(data):
     """2. Average Gain per Criterion"""
-    # Extract scores
-    # Structure of 'scores': {'emotional': X, 'narrative': Y, 'keepability': Z}
-    # We need to know the scores of the WINNER (which we have)
-    # BUT we assume the user rates the PAIR? No, the user rates the playlists AFTER choosing?
-    # Actually, looking at app.js: user chooses A or B, THEN rates THE CHOSEN ONE.
-    # So we don't have the score for the loser. We can only compare Average Score of VibeReco Winners vs Average Score of YouTube Winners.
-    # OR if the user rated both, we would compare paired.
-    # Re-reading app.js: "scores" object is submitted with the vote. The user rates the chosen playlist.
-    # So we compare Avg Score when Vibe Wins vs Avg Score when YouTube Wins.
-    
-    score_cols = ['emotional', 'narrative', 'keepability']
-    
-    # Expand scores column
-    scores_df = df['scores'].apply(pd.Series)
-    df_scores = pd.concat([df[['winnerSource']], scores_df], axis=1)
-    
-    # Calculate means
-    means = df_scores.groupby('winnerSource')[score_cols].mean()
-    
-    if 'vibe' not in means.index or 'youtube' not in means.index:
-        print("Not enough data for comparison (missing Vibe or YouTube wins).")
-        return
-
-    diffs = means.loc['vibe'] - means.loc['youtube'] # Positive = Vibe is better
+    diffs = pd.Series(data["diffs"])
     
     plt.figure(figsize=(8, 5))
     
-    # Plot bars
-    bars = plt.bar(diffs.index, diffs.values, color=['green' if x > 0 else 'red' for x in diffs.values])
+    ci = np.array([data["ci"][criterion] for criterion in diffs.index])
+    errors = np.abs(ci.T - diffs.values)
+
+    # Plot bars, with the bootstrap 95% CI
+    bars = plt.bar(diffs.index, diffs.values, color=['green' if x > 0 else 'red' for x in diffs.values],
+                   yerr=errors, capsize=6, error_kw=dict(ecolor='black', linewidth=1))
     
     plt.axhline(0, color='black', linewidth=0.8)
     plt.ylabel("Score Difference (VibeReco - YouTube)")
-    plt.title("Gain by Criterion (VibeReco vs YouTube Baseline)", pad=20)
-    plt.ylim(min(diffs.min(), -1), max(diffs.max(), 1)) # Center somewhat
+    plt.title("Gain by Criterion (VibeReco vs YouTube Baseline), 95% bootstrap CI", pad=20)
+    plt.ylim(min(ci.min(), -1), max(ci.max(), 1)) # Center somewhat
     
-    # Labels
-    for bar in bars:
+    # Labels (* = permutation test p < 0.05)
+    for bar, criterion in zip(bars, diffs.index):
         height = bar.get_height()
+        star = '*' if data["p_values"][criterion] < 0.05 else ''
         plt.text(bar.get_x() + bar.get_width()/2., height,
-                 f'{height:+.1f}',
+                 f'{height:+.1f}{star}',
                  ha='center', va='bottom' if height > 0 else 'top')
 
     # X labels
@@ -174,36 +219,31 @@ def viz_criteria_gains(df):
     plt.xticks(range(len(diffs)), [labels_map.get(x, x) for x in diffs.index])
     
     plt.tight_layout()
-    plt.savefig(f"{OUTPUT_DIR}/2_criteria_gain_bar.png", dpi=300)
+    plt.savefig(f"{OUTPUT_DIR}/{CHART_FILES['gains']}", dpi=300)
     plt.close()
-    print("Generated 2_criteria_gain_bar.png")
 
-def viz_win_rate_by_seed(df):
+def viz_win_rate_by_seed(data):
     """3. Win Rate by Seed"""
-    if 'seedTitle' not in df.columns:
-        return
+    titles = [title for title, _ in data["seeds"]]
+    rates = [rate for _, rate in data["seeds"]]
 
-    # Calculate win rate per seed
-    seeds = df.groupby('seedTitle')['winnerSource'].apply(lambda x: (x == 'vibe').mean() * 100).sort_values(ascending=True)
-    
-    plt.figure(figsize=(10, len(seeds) * 0.5 + 2))
+    plt.figure(figsize=(10, len(titles) * 0.5 + 2))
     
     # Filter only seeds with > 1 vote to reduce noise? Optional. keeping all for now.
     
-    bars = plt.barh(seeds.index, seeds.values, color=COLOR_VIBE)
+    bars = plt.barh(titles, rates, color=COLOR_VIBE)
     
     plt.xlim(0, 100)
     plt.xlabel("Win Rate (%)")
     plt.title("VibeReco Performance by Seed Song")
     
     # Add value labels
-    for i, v in enumerate(seeds.values):
+    for i, v in enumerate(rates):
         plt.text(v + 1, i, f"{v:.0f}%", va='center')
         
     plt.tight_layout()
-    plt.savefig(f"{OUTPUT_DIR}/3_win_rate_by_seed.png", dpi=300)
+    plt.savefig(f"{OUTPUT_DIR}/{CHART_FILES['seeds']}", dpi=300)
     plt.close()
-    print("Generated 3_win_rate_by_seed.png")
 
 def viz_playlist_changes(df):
     """4. Playlist Rank Changes (Bump Chart) - Simpler version: just a placeholder if we don't have track data"""
@@ -222,48 +262,149 @@ def viz_playlist_changes(df):
     # I will skip this one for the script to valid "votes" but I will mention it.
     pass
 
-def viz_score_distributions(df):
+def viz_score_distributions(data):
     """5. Score Distributions (Boxplot)"""
-    score_cols = ['emotional', 'narrative', 'keepability']
-    scores_df = df['scores'].apply(pd.Series)
-    df_scores = pd.concat([df[['winnerSource']], scores_df], axis=1)
-    
-    # Melt for seaborn
-    melted = df_scores.melt(id_vars='winnerSource', value_vars=score_cols, var_name='Criterion', value_name='Score')
-    
+    score_cols = list(SCORE_CRITERIA)
+    sources = list(PALETTE)
+    width = 0.8 / len(sources)
+
     plt.figure(figsize=(10, 6))
-    
-    sns.boxplot(data=melted, x='Criterion', y='Score', hue='winnerSource', palette=PALETTE)
+    ax = plt.gca()
+
+    # Boxes are drawn from the precomputed statistics, grouped by criterion like sns.boxplot(hue=...)
+    for offset, source in enumerate(sources):
+        stats = [dict(data["boxes"][criterion][source]) for criterion in score_cols if source in data["boxes"][criterion]]
+        positions = [i - 0.4 + width * (offset + 0.5) for i, criterion in enumerate(score_cols) if source in data["boxes"][criterion]]
+        if not stats:
+            continue
+        ax.bxp(stats, positions=positions, widths=width * 0.9, patch_artist=True, showfliers=True,
+               boxprops=dict(facecolor=PALETTE[source]), medianprops=dict(color='black'))
+        ax.plot([], [], color=PALETTE[source], linewidth=8, label=source)
+
+    ax.set_xticks(range(len(score_cols)))
+    ax.set_xticklabels(score_cols)
+    ax.set_xlabel("Criterion")
+    ax.legend(title="winnerSource")
     
     plt.title("Distribution of Scores: VibeReco vs YouTube")
     plt.ylim(1, 5.5)
     plt.ylabel("User Rating (1-5)")
     
     plt.tight_layout()
-    plt.savefig(f"{OUTPUT_DIR}/5_score_distribution.png", dpi=300)
+    plt.savefig(f"{OUTPUT_DIR}/{CHART_FILES['distribution']}", dpi=300)
     plt.close()
-    print("Generated 5_score_distribution.png")
+
+def viz_win_rate_over_time(data):
+    """6. Rolling Win Rate over Time"""
+    days = pd.to_datetime(data["days"])
+    rates = [np.nan if rate is None else rate for rate in data["rate"]]
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    # Daily votes in the background, on their own axis
+    counts = ax.twinx()
+    counts.bar(days, data["votes"], color='gray', alpha=0.25, width=0.8)
+    counts.set_ylabel("Votes per day")
+    counts.grid(False)
+    ax.set_zorder(counts.get_zorder() + 1)
+    ax.patch.set_visible(False)
+
+    ax.plot(days, rates, color=COLOR_VIBE, linewidth=2, marker='o', markersize=3)
+    ax.axhline(50, color='black', linewidth=0.8, linestyle='--')
+    ax.set_ylim(0, 100)
+    ax.yaxis.set_major_formatter(mtick.PercentFormatter())
+    ax.set_ylabel(f"VibeReco Win Rate ({ROLLING_WINDOW_DAYS}-day rolling)")
+    ax.set_title("VibeReco Win Rate over Time")
+    fig.autofmt_xdate()
+
+    plt.tight_layout()
+    plt.savefig(f"{OUTPUT_DIR}/{CHART_FILES['rolling']}", dpi=300)
+    plt.close()
+
+# Chart renderers, by output file
+CHARTS = {
+    CHART_FILES["donut"]: viz_win_rate_donut,
+    CHART_FILES["gains"]: viz_criteria_gains,
+    CHART_FILES["seeds"]: viz_win_rate_by_seed,
+    # CHART_FILES["bump"]: viz_playlist_changes,  # Requires track data
+    CHART_FILES["distribution"]: viz_score_distributions,
+    CHART_FILES["rolling"]: viz_win_rate_over_time,
+}
+
+def chart_hash(name, data):
+    """Hash of a chart's input data (and of the chart style version)"""
+    payload = json.dumps({"chart": name, "style": CHART_STYLE_VERSION, "data": data}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def render_chart(name, data):
+    """Renders one chart (runs in a worker process)"""
+    CHARTS[name](data)
+    return name
+
+def render_charts(summary, force=False):
+    """Renders the charts whose input data changed since the last run, in parallel"""
+    state_path = os.path.join(OUTPUT_DIR, CHART_STATE_FILE)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, "r") as f:
+            state = json.load(f)
+
+    todo = {}
+    for name in CHARTS:
+        data = summary.get(name)
+        if data is None:
+            print(f"Skipped {name}: not enough data (missing Vibe or YouTube wins, or timestamps).")
+            continue
+        digest = chart_hash(name, data)
+        if not force and state.get(name) == digest and os.path.exists(os.path.join(OUTPUT_DIR, name)):
+            print(f"Unchanged {name}")
+            continue
+        todo[name] = (data, digest)
+
+    if len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(todo), os.cpu_count() or 1)) as pool:
+            futures = {pool.submit(render_chart, name, data): name for name, (data, _) in todo.items()}
+            done = [future.result() for future in as_completed(futures)]
+    else:
+        done = [render_chart(name, data) for name, (data, _) in todo.items()]
+
+    for name in done:
+        state[name] = todo[name][1]
+        print(f"Generated {name}")
+    with open(state_path, "w") as f:
+        json.dump(state, f, indent=2)
+    return done
 
 def main():
+    parser = argparse.ArgumentParser(description="Sync the A/B test votes and generate the analysis charts")
+    parser.add_argument("--kv", default=KV_URL, help="KV REST URL (default: KV_REST_API_URL), or memory:// / file://<path> for a local store")
+    parser.add_argument("--cache", default=CACHE_DIR, help="Local vote cache directory")
+    parser.add_argument("--force", action="store_true", help="Re-render every chart, even if its data did not change")
+    parser.add_argument("--archive", nargs="?", const=ARCHIVE_DIR, default=None,
+                        help="Read the votes from the vote archive instead of Redis (python -m src.vote_archive import ...)")
+    parser.add_argument("--since", default=None, help="With --archive: first day (YYYY-MM-DD)")
+    parser.add_argument("--until", default=None, help="With --archive: last day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
     try:
-        df = fetch_data()
+        if args.archive:
+            df = load_archive(args.archive, args.since, args.until)
+        else:
+            df = fetch_data(args.kv, args.cache)
         
         if len(df) == 0:
             print("No data found.")
             return
 
-        viz_win_rate_donut(df)
-        viz_criteria_gains(df)
-        viz_win_rate_by_seed(df)
-        # viz_playlist_changes(df) # Requires track data
-        viz_score_distributions(df)
+        summary = summarize(df)
+        render_charts(summary, force=args.force)
         
         print("\nAnalysis complete. Charts saved to 'analysis_results/'.")
         
         # Print summary stats
         print("\n--- Summary ---")
-        print(f"Total Votes: {len(df)}")
-        print(df['winnerSource'].value_counts(normalize=True))
+        print(f"Total Votes: {summary['total']}")
+        for source, share in sorted(summary["win_share"].items()):
+            print(f"{source}: {share:.1%}")
         
     except Exception as e:
         print(f"Error: {e}")
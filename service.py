@@ -0,0 +1,326 @@
+"""
+VibeReco HTTP Recommendation Service
+
+Standalone JSON API in front of the recommendation pipeline, so that other
+services can use VibeReco without going through the Streamlit apps.
+
+Endpoints:
+    GET /recommend?q=<query>&limit=10   Live pipeline run (answered from the result cache when possible)
+    GET /similar/<videoId>?k=5&offset=0 Nearest catalog songs of a catalog song (paginated)
+    GET /search?q=<text>&limit=10       Title/artist search in the catalog (typo and accent tolerant)
+    GET /health                         Catalog size, cache, worker pool and memory status
+
+Catalog endpoints are served in-process from the catalog index. Their responses
+carry a short max-age (CATALOG_POLL_INTERVAL, as snapshots are hot-swapped)
+and an ETag naming the catalog snapshot; /recommend results may be cached for
+RESULT_CACHE_TTL. Live pipeline
+runs execute on a bounded pool of asyncio workers (MusicPipeline.arun); when
+more than SERVICE_MAX_QUEUE runs are already waiting, /recommend answers
+503 with a Retry-After header instead of queueing without bound.
+
+Usage:
+    python service.py [--host 127.0.0.1] [--port 8080] [--workers 4] [--max-queue 16]
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import traceback
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from src.cache import result_cache
+from src.catalog import get_catalog
+from src.config import (CATALOG_POLL_INTERVAL, EMBEDDING_VERSION, RESULT_CACHE_TTL, SERVICE_WORKERS, SERVICE_MAX_QUEUE,
+                        SERVICE_TIMEOUT)
+from src.memory import format_memory_usage, memory_usage
+from src.pipeline import MusicPipeline
+
+MAX_LIMIT = 30
+
+
+class PipelineWorkerPool:
+    """
+    Bounded pool of live pipeline runs on a dedicated event loop thread.
+
+    Attributes:
+        workers: Number of runs executing at the same time
+        max_queue: Number of runs allowed to wait for a free worker
+    """
+
+    def __init__(self, workers=SERVICE_WORKERS, max_queue=SERVICE_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        # Created on the pool's loop by the first run (a Semaphore binds to a loop before Python 3.10)
+        self._slots = None
+        threading.Thread(target=self._loop.run_forever, name="pipeline-workers", daemon=True).start()
+
+    @property
+    def queue_depth(self):
+        """Number of runs waiting for a worker."""
+        return max(0, self._pending - self.workers)
+
+    @property
+    def pending(self):
+        """Number of runs submitted and not finished yet."""
+        return self._pending
+
+    def submit(self, query, limit):
+        """
+        Schedules a live pipeline run.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the pipeline result dict
+            None: If the queue is full (the caller should answer 503)
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                return None
+            self._pending += 1
+        future = asyncio.run_coroutine_threadsafe(self._run(query, limit), self._loop)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def _run(self, query, limit):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            pipeline = MusicPipeline(status_callback=lambda message: None)
+            return await pipeline.arun(query, limit=limit, return_youtube_tracks=True)
+
+
+def _song_summary(song, score=None):
+    """
+    Public, compact view of a track (no lyrics or embedding).
+    """
+    summary = {
+        "title": song.get("title"),
+        "artist": song.get("artist"),
+        "videoId": song.get("videoId"),
+    }
+    if song.get("song_id"):
+        summary["song_id"] = song["song_id"]
+    if song.get("youtube_rank"):
+        summary["youtube_rank"] = song["youtube_rank"]
+    if score is not None:
+        summary["score"] = round(float(score), 4)
+    return summary
+
+
+def format_pipeline_result(result):
+    """
+    Converts a pipeline result dict into a JSON-serializable response body.
+    """
+    tracks = result.get("final_tracks")
+    if not tracks:
+        return {"success": False, "recommendations": [], "youtube": []}
+
+    distances, indices = result["distances"], result["indices"]
+    recommendations = [
+        _song_summary(tracks[idx], score)
+        for idx, score in zip(indices[0], distances[0])
+        if 0 <= idx < len(tracks)
+    ]
+    return {
+        "success": True,
+        "seed": recommendations[0] if recommendations else None,
+        "recommendations": recommendations[1:],
+        "youtube": [_song_summary(t) for t in result.get("youtube_tracks") or []],
+    }
+
+
+class RecommendationHandler(BaseHTTPRequestHandler):
+    """
+    Routes GET requests to the recommendation, similarity and search endpoints.
+    """
+
+    server_version = "VibeReco/1.0"
+    pool = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == "/recommend":
+                self.handle_recommend(params)
+            elif url.path.startswith("/similar/"):
+                self.handle_similar(unquote(url.path[len("/similar/"):]), params)
+            elif url.path == "/search":
+                self.handle_search(params)
+            elif url.path == "/health":
+                self.handle_health()
+            else:
+                self.send_json(404, {"error": "Not found"})
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            # Details stay in the service log, they can name internal hosts and paths
+            print(f"❌ {self.path} failed: {e}")
+            traceback.print_exc()
+            self.send_json(500, {"error": "Internal server error"})
+
+    def handle_recommend(self, params):
+        query = params.get("q", "").strip()
+        if not query:
+            raise ValueError("Missing 'q' parameter")
+        limit = max(1, min(int(params.get("limit", 10)), MAX_LIMIT))
+
+        # Cache fast path: answered without touching the worker pool
+        seed_id = result_cache.lookup_seed(query)
+        cached = result_cache.get(seed_id, limit) if seed_id else None
+        if cached:
+            body = format_pipeline_result(cached)
+            body["cached"] = True
+            return self.send_json(200, body, cache="HIT")
+
+        future = self.pool.submit(query, limit)
+        if future is None:
+            return self.send_json(503, {"error": "Too many pending requests, retry later"}, headers={"Retry-After": "5"})
+
+        try:
+            result = future.result(timeout=SERVICE_TIMEOUT)
+        except FutureTimeoutError:
+            # The run keeps going and will land in the cache for the next request
+            return self.send_json(504, {"error": "Recommendation still running, retry later"}, headers={"Retry-After": "10"})
+
+        body = format_pipeline_result(result)
+        body["cached"] = False
+        self.send_json(200 if body["success"] else 404, body, cache="MISS")
+
+    def handle_similar(self, video_id, params):
+        k = max(1, min(int(params.get("k", 5)), MAX_LIMIT))
+        offset = max(0, int(params.get("offset", 0)))
+        catalog = get_catalog()
+        if self.not_modified(catalog):
+            return
+        neighbors = catalog.similar(video_id, k=k, offset=offset)
+        if neighbors is None:
+            return self.send_json(404, {"error": f"Unknown videoId: {video_id}"})
+        self.send_json(200, {
+            "seed": _song_summary(catalog.get(video_id)),
+            "similar": [_song_summary(song, score) for song, score in neighbors],
+            "offset": offset,
+        }, headers=self.catalog_headers(catalog))
+
+    def handle_search(self, params):
+        text = params.get("q", "").strip()
+        if not text:
+            raise ValueError("Missing 'q' parameter")
+        limit = max(1, min(int(params.get("limit", 10)), MAX_LIMIT))
+        catalog = get_catalog()
+        if self.not_modified(catalog):
+            return
+        results = [_song_summary(song) for song in catalog.search(text, limit=limit)]
+        self.send_json(200, {"results": results}, headers=self.catalog_headers(catalog))
+
+    def handle_health(self):
+        catalog = get_catalog()
+        store = catalog.store
+        self.send_json(200, {
+            "catalog_songs": len(catalog),
+            "catalog_version": store.version if store else None,
+            "catalog_embedding_version": store.embedding_version if store else None,
+            "embedding_version": EMBEDDING_VERSION,
+            "cached_results": len(result_cache.results),
+            "cache_hits": result_cache.results.hits,
+            "cache_misses": result_cache.results.misses,
+            "workers": self.pool.workers,
+            "pending_runs": self.pool.pending,
+            "queue_depth": self.pool.queue_depth,
+            "memory_mb": {key: round(value, 1) for key, value in memory_usage().items() if value is not None},
+        })
+
+    def catalog_headers(self, catalog):
+        """
+        Caching headers of a catalog response, read after the catalog was queried.
+
+        The max-age is short because a new snapshot may be swapped in at any
+        poll; the ETag names the snapshot, so clients can revalidate cheaply.
+        """
+        headers = {"Cache-Control": f"public, max-age={CATALOG_POLL_INTERVAL}"}
+        if catalog.store:
+            headers["ETag"] = f'"{catalog.store.version}"'
+        return headers
+
+    def not_modified(self, catalog):
+        """
+        Answers 304 if the client already holds the response of the current snapshot.
+
+        Returns:
+            bool: True if the response was sent
+        """
+        etag = self.catalog_headers(catalog).get("ETag")
+        if not etag or self.headers.get("If-None-Match") != etag:
+            return False
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", f"public, max-age={CATALOG_POLL_INTERVAL}")
+        self.end_headers()
+        return True
+
+    def send_json(self, status, body, cache=None, headers=None):
+        """
+        Sends a JSON response.
+
+        Args:
+            status: HTTP status
+            body: JSON-serializable body
+            cache: Result cache outcome of a /recommend run ("HIT" or "MISS"),
+                   sent as X-Cache; a 200 may then be cached for RESULT_CACHE_TTL
+            headers: Extra headers
+        """
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        if cache:
+            self.send_header("X-Cache", cache)
+            if status == 200:
+                self.send_header("Cache-Control", f"public, max-age={RESULT_CACHE_TTL}")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VibeReco HTTP recommendation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    parser.add_argument("--max-queue", type=int, default=SERVICE_MAX_QUEUE)
+    args = parser.parse_args()
+
+    RecommendationHandler.pool = PipelineWorkerPool(workers=args.workers, max_queue=args.max_queue)
+
+    # Load the catalog and its memory-mapped index before accepting requests
+    catalog = get_catalog()
+    if catalog.store:
+        catalog.store.warm()
+    print(f"📂 Catalog loaded: {len(catalog)} songs - memory: {format_memory_usage()}")
+
+    server = ThreadingHTTPServer((args.host, args.port), RecommendationHandler)
+    server.daemon_threads = True
+    print(f"🎵 VibeReco service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
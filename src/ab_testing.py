@@ -1,22 +1,276 @@
+"""
+A/B Testing Module
+
+Blind A/B tests between the YouTube radio order and the VibeReco ranking.
+
+Votes are stored in an append-only SQLite database (data/ab_test_votes.sqlite)
+in WAL mode: saving a vote is a single-row INSERT, whatever the number of
+votes already recorded, and several Streamlit sessions or processes can vote
+at the same time. SQLite serializes writers with its own file lock (writers
+wait up to VOTE_LOCK_TIMEOUT seconds), readers never block writers, and a
+vote is never lost to a concurrent read-modify-write of a JSON file.
+
+Votes are keyed by test_id, so submitting the same blind test twice records
+it once. The legacy data/ab_test_results.json file is imported on first use,
+exactly once (the import is recorded in the database).
+
+Statistics are materialized: each vote updates running aggregates (totals,
+wins per source, per-seed counts, per-criterion score count/sum/sum of
+squares) in the same transaction as its insert, so get_stats() reads a few
+rows whatever the number of votes. If the aggregates are ever suspect, they
+are recomputed from the vote log with:
+
+    python -m src.ab_testing rebuild-stats [db_path]
+"""
+
 import json
+import math
 import os
 import random
+import sqlite3
+import sys
+import threading
 import uuid
 from datetime import datetime
-import pandas as pd
 
 RESULTS_FILE = os.path.join("data", "ab_test_results.json")
+VOTES_DB = os.path.join("data", "ab_test_votes.sqlite")
+
+# Seconds a writer waits for another process's write lock before failing
+VOTE_LOCK_TIMEOUT = 30
+
+# Vote fields stored as JSON text
+_JSON_FIELDS = ("scores", "mapping")
+_VOTE_FIELDS = ("test_id", "timestamp", "seed_song", "vote_for_playlist", "winner_source", "scores", "mapping")
+
+# Version of the aggregate tables; a database without it gets its aggregates rebuilt on open
+STATS_VERSION = "1"
+
+
+class VoteStore:
+    """
+    Append-only vote log in SQLite (WAL mode), safe for concurrent writers.
+
+    Each thread uses its own connection. The store is shared per database
+    file (see get_vote_store), so the legacy import check runs once per process.
+
+    Attributes:
+        path: SQLite database file
+    """
+
+    def __init__(self, path=VOTES_DB, legacy_path=RESULTS_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS votes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {', '.join(field + (' TEXT UNIQUE' if field == 'test_id' else ' TEXT') for field in _VOTE_FIELDS)}
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # Aggregates: scope "all" (key "") and "seed" (key = seed song)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS vote_stats (
+                scope TEXT, key TEXT, votes INTEGER NOT NULL, vibe_wins INTEGER NOT NULL, youtube_wins INTEGER NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+        """)
+        # Scores given to the preferred playlist, per winning source and criterion
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS score_stats (
+                source TEXT, criterion TEXT, count INTEGER NOT NULL, total REAL NOT NULL, total_sq REAL NOT NULL,
+                PRIMARY KEY (source, criterion)
+            )
+        """)
+        self._import_legacy(legacy_path)
+        if not conn.execute("SELECT 1 FROM meta WHERE key = 'stats_version' AND value = ?", (STATS_VERSION,)).fetchone():
+            self.rebuild_stats()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: every statement is its own transaction unless BEGIN is issued
+            conn = sqlite3.connect(self.path, timeout=VOTE_LOCK_TIMEOUT, isolation_level=None)
+            # WAL + NORMAL: a committed vote survives a process crash, and fsyncs are batched at checkpoints
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy(self, legacy_path):
+        """
+        Imports the votes of the legacy JSON file, once per database.
+        """
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_import'").fetchone():
+            return
+        # BEGIN IMMEDIATE takes the write lock: concurrent first starts import only once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_import'").fetchone():
+                records = []
+                if legacy_path and os.path.exists(legacy_path):
+                    with open(legacy_path, "r", encoding="utf-8") as f:
+                        try:
+                            records = json.load(f)
+                        except json.JSONDecodeError:
+                            records = []
+                for record in records:
+                    if conn.execute(self._insert_sql(), self._row(record)).rowcount == 1:
+                        self._count(conn, record)
+                conn.execute("INSERT INTO meta VALUES ('legacy_import', ?)",
+                             (json.dumps({"file": legacy_path, "votes": len(records), "at": datetime.now().isoformat()}),))
+                if records:
+                    print(f"Imported {len(records)} votes from {legacy_path}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _insert_sql():
+        return f"INSERT OR IGNORE INTO votes ({', '.join(_VOTE_FIELDS)}) VALUES ({', '.join('?' for _ in _VOTE_FIELDS)})"
+
+    @staticmethod
+    def _row(record):
+        return tuple(
+            json.dumps(record.get(field), ensure_ascii=False) if field in _JSON_FIELDS else record.get(field)
+            for field in _VOTE_FIELDS
+        )
+
+    @staticmethod
+    def _count(conn, record):
+        """
+        Adds one vote to the aggregates (inside the caller's transaction).
+        """
+        winner = record.get("winner_source")
+        wins = (int(winner == "vibe"), int(winner == "youtube"))
+        for scope, key in (("all", ""), ("seed", record.get("seed_song") or "")):
+            conn.execute(
+                """INSERT INTO vote_stats VALUES (?, ?, 1, ?, ?)
+                   ON CONFLICT (scope, key) DO UPDATE SET
+                   votes = votes + 1, vibe_wins = vibe_wins + excluded.vibe_wins, youtube_wins = youtube_wins + excluded.youtube_wins""",
+                (scope, key) + wins,
+            )
+        for criterion, score in (record.get("scores") or {}).items():
+            if isinstance(score, bool) or not isinstance(score, (int, float)):
+                continue
+            conn.execute(
+                """INSERT INTO score_stats VALUES (?, ?, 1, ?, ?)
+                   ON CONFLICT (source, criterion) DO UPDATE SET
+                   count = count + 1, total = total + excluded.total, total_sq = total_sq + excluded.total_sq""",
+                (winner or "", criterion, float(score), float(score) ** 2),
+            )
+
+    def append(self, record):
+        """
+        Records one vote and updates the aggregates, in one transaction.
+
+        Returns:
+            bool: False if a vote with the same test_id was already recorded
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = conn.execute(self._insert_sql(), self._row(record)).rowcount == 1
+            if added:
+                self._count(conn, record)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def rebuild_stats(self):
+        """
+        Recomputes every aggregate from the vote log (recovery).
+
+        Returns:
+            int: Number of votes counted
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM vote_stats")
+            conn.execute("DELETE FROM score_stats")
+            votes = self.votes()
+            for vote in votes:
+                self._count(conn, vote)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('stats_version', ?)", (STATS_VERSION,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(votes)
+
+    def stats(self):
+        """
+        Reads the materialized aggregates.
+
+        Returns:
+            dict: "totals" and "seeds" ({key: (votes, vibe_wins, youtube_wins)}),
+                  "scores" ({(source, criterion): (count, total, total_sq)})
+        """
+        conn = self._connection()
+        # One read transaction, so the three reads see the same votes
+        conn.execute("BEGIN")
+        try:
+            counts = conn.execute("SELECT scope, key, votes, vibe_wins, youtube_wins FROM vote_stats").fetchall()
+            scores = conn.execute("SELECT source, criterion, count, total, total_sq FROM score_stats").fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return {
+            "totals": next((tuple(row[2:]) for row in counts if row[0] == "all"), (0, 0, 0)),
+            "seeds": {row[1]: tuple(row[2:]) for row in counts if row[0] == "seed"},
+            "scores": {(row[0], row[1]): tuple(row[2:]) for row in scores},
+        }
+
+    def votes(self, after_id=0):
+        """
+        Returns the recorded votes in insertion order, shaped like the legacy JSON records.
+
+        Args:
+            after_id: Only return votes inserted after this vote id
+
+        Returns:
+            list: Vote dictionaries, each with its "id"
+        """
+        rows = self._connection().execute(
+            f"SELECT id, {', '.join(_VOTE_FIELDS)} FROM votes WHERE id > ? ORDER BY id", (after_id,)
+        ).fetchall()
+        votes = []
+        for row in rows:
+            vote = dict(zip(("id",) + _VOTE_FIELDS, row))
+            for field in _JSON_FIELDS:
+                vote[field] = json.loads(vote[field]) if vote[field] else None
+            votes.append(vote)
+        return votes
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM votes").fetchone()[0]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_vote_store(path=VOTES_DB):
+    """
+    Returns the process-wide vote store of a database file, opening it on first use.
+    """
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = VoteStore(path)
+        return _stores[path]
+
 
 class ABTestManager:
-    def __init__(self):
-        self._ensure_data_dir()
-    
-    def _ensure_data_dir(self):
-        if not os.path.exists("data"):
-            os.makedirs("data")
-        if not os.path.exists(RESULTS_FILE):
-            with open(RESULTS_FILE, "w", encoding="utf-8") as f:
-                json.dump([], f)
+    def __init__(self, db_path=VOTES_DB):
+        self.store = get_vote_store(db_path)
 
     def prepare_blind_test(self, youtube_tracks, vibe_tracks):
         """
@@ -73,47 +327,51 @@ class ABTestManager:
             "mapping": test_data["mapping"]
         }
         
-        # Load existing
-        with open(RESULTS_FILE, "r", encoding="utf-8") as f:
-            try:
-                history = json.load(f)
-            except json.JSONDecodeError:
-                history = []
-        
-        history.append(record)
-        
-        with open(RESULTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
-            
+        # Single-row append; a resubmitted test is recorded once
+        self.store.append(record)
         return True
 
     def get_stats(self):
         """
-        Computes aggregate statistics.
-        """
-        if not os.path.exists(RESULTS_FILE):
-            return None
+        Returns aggregate statistics, read from the materialized aggregates.
         
-        with open(RESULTS_FILE, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-            except:
-                return None
-                
-        if not data:
+        Returns:
+            dict: total_votes, vibe_wins, youtube_wins, vibe_win_rate (%),
+                  by_seed ({seed: {votes, vibe_wins, youtube_wins}}) and
+                  scores ({source: {criterion: {count, mean, std}}})
+            None: If no vote was recorded yet
+        """
+        stats = self.store.stats()
+        total_votes, vibe_wins, youtube_wins = stats["totals"]
+        if not total_votes:
             return None
-            
-        df = pd.DataFrame(data)
-        
-        total_votes = len(df)
-        vibe_wins = len(df[df["winner_source"] == "vibe"])
-        youtube_wins = len(df[df["winner_source"] == "youtube"])
         
         win_rate_vibe = (vibe_wins / total_votes) * 100 if total_votes > 0 else 0
         
+        scores = {}
+        for (source, criterion), (count, total, total_sq) in stats["scores"].items():
+            mean = total / count
+            # Sample standard deviation from the running sums
+            variance = (total_sq - count * mean ** 2) / (count - 1) if count > 1 else 0.0
+            scores.setdefault(source, {})[criterion] = {"count": count, "mean": mean, "std": math.sqrt(max(variance, 0.0))}
+        
         return {
             "total_votes": total_votes,
             "vibe_wins": vibe_wins,
             "youtube_wins": youtube_wins,
-            "vibe_win_rate": win_rate_vibe
+            "vibe_win_rate": win_rate_vibe,
+            "by_seed": {
+                seed: {"votes": votes, "vibe_wins": vibe, "youtube_wins": youtube}
+                for seed, (votes, vibe, youtube) in stats["seeds"].items()
+            },
+            "scores": scores,
         }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild-stats":
+        print("Usage: python -m src.ab_testing rebuild-stats [db_path]")
+        sys.exit(1)
+    
+    store = VoteStore(sys.argv[2] if len(sys.argv) > 2 else VOTES_DB)
+    print(f"✅ Statistics rebuilt from {store.rebuild_stats()} votes")
@@ -0,0 +1,103 @@
+"""
+Asyncio helpers for the RecoLLM project.
+
+The pipeline is implemented natively with asyncio (MusicPipeline.arun and the
+a* functions of extraction, analysis and recommendation). The synchronous API
+is a thin wrapper around it, built with run_sync().
+
+Clients that hold connections (e.g. AsyncOpenAI and its httpx pool) are bound
+to the event loop that first used them; LoopLocal keeps one instance per loop.
+
+RateLimiter spaces out the calls to an external API for the whole process,
+whatever the number of concurrent pipeline runs, threads or event loops.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine to completion from synchronous code.
+
+    Uses asyncio.run() when no event loop is running in this thread, and a
+    helper thread with its own loop otherwise (e.g. when a blocking API is
+    called from inside async code).
+
+    Args:
+        coro: Coroutine object to run
+
+    Returns:
+        The value returned by the coroutine
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+class LoopLocal:
+    """
+    Lazily created object, one instance per running event loop.
+
+    Example:
+        _client = LoopLocal(lambda: AsyncOpenAI(api_key=...))
+        completion = await _client.get().embeddings.create(...)
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = weakref.WeakKeyDictionary()
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        instance = self._instances.get(loop)
+        if instance is None:
+            instance = self._factory()
+            self._instances[loop] = instance
+        return instance
+
+
+class RateLimiter:
+    """
+    Process-wide request budget: at most `rate` acquisitions per second.
+
+    Each acquisition reserves the next free time slot under a thread lock and
+    sleeps until it, so one limiter can be shared by every event loop and
+    thread of the process (unlike asyncio.Semaphore, which is bound to a loop).
+
+    Example:
+        _genius_rate = RateLimiter(1)
+        async with _genius_rate:
+            song = await asyncio.to_thread(genius.search_song, title, artist)
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
@@ -1,6 +1,23 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
+import hashlib
 import json
-from src.config import OPENROUTER_API_KEY
+from src.aio import LoopLocal, RateLimiter, run_sync
+from src.config import OPENROUTER_API_KEY, ANALYSIS_MODEL, OPENROUTER_RATE, VIBE_TEXT_VERSION
+from src.identity import song_identity
+from src.singleflight import SingleFlight
+
+
+# Coalesces concurrent analyses of the same song across pipeline runs
+_analysis_flight = SingleFlight()
+
+# Request budget shared by every run of the process
+_openrouter_rate = RateLimiter(OPENROUTER_RATE)
+
+# One async OpenRouter client per event loop
+_openrouter = LoopLocal(lambda: AsyncOpenAI(
+    base_url="https://openrouter.ai/api/v1",
+    api_key=OPENROUTER_API_KEY,
+))
 
 def analyze_emotional_profile(title, artist, lyrics):
     """
@@ -26,14 +43,24 @@ def analyze_emotional_profile(title, artist, lyrics):
     Raises:
         May print warning message if JSON decoding fails
     """
+    return run_sync(aanalyze_emotional_profile(title, artist, lyrics))
 
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=OPENROUTER_API_KEY,
-    )
+async def aanalyze_emotional_profile(title, artist, lyrics):
+    """
+    Async counterpart of analyze_emotional_profile.
+    
+    Concurrent calls for the same song and lyrics share a single LLM request.
+    """
+    key = (song_identity.resolve(title, artist), hashlib.sha1((lyrics or "").encode("utf-8")).hexdigest())
+    return await _analysis_flight.ado(key, lambda: _arequest_emotional_profile(title, artist, lyrics))
 
-    completion = client.chat.completions.create(
-    model="tngtech/deepseek-r1t2-chimera:free",
+async def _arequest_emotional_profile(title, artist, lyrics):
+    """
+    Sends the analysis request to OpenRouter and parses the JSON profile.
+    """
+    await _openrouter_rate.acquire()
+    completion = await _openrouter.get().chat.completions.create(
+    model=ANALYSIS_MODEL,
     messages=[
         {
         "role": "system",
@@ -84,28 +111,49 @@ def analyze_emotional_profile(title, artist, lyrics):
         print(f"⚠️ Erreur de décodage JSON pour {title}")
         return None
 
+def _vibe_text_v1(title, artist, data):
+    theme_str = "".join(data["semantic_layer"]["primary_theme"])
+    secondary_themes_str = ", ".join(data["semantic_layer"]["secondary_themes"])
+    keywords_str = ", ".join(data["semantic_layer"]["keywords"])
+    context_str = ", ".join(data["contextual_metadata"]["listening_context"])
+    return (
+    f"Title: {title}. Artist: {artist}. "
+    f"Primary Theme: {theme_str}. "
+    f"Secondary Themes: {secondary_themes_str}. "
+    f"Emotions: Valence {data['emotional_profile']['valence']}, "
+    f"Arousal {data['emotional_profile']['arousal']}, "
+    f"Dominance {data['emotional_profile']['dominance']}. "
+    f"Vibe Description: {data['emotional_profile']['emotional_trajectory']}. "
+    f"Keywords: {keywords_str}. "
+    f"Context: {context_str}. "
+    f"Narrative: {data['semantic_layer']['narrative_arc']}"
+    )
+
+# Vibe text templates by version. A changed template gets a new version
+# (VIBE_TEXT_VERSION) so that vectors embedded from different templates are
+# never mixed; the catalog is re-embedded with src/embedding_migration.py.
+VIBE_TEXT_TEMPLATES = {
+    1: _vibe_text_v1,
+}
+
+def format_vibe_text(song, version=VIBE_TEXT_VERSION):
+    """
+    Builds the vibe text of an analyzed song.
+    
+    Args:
+        song: Dict with title, artist and analysis
+        version: Template version (default: VIBE_TEXT_VERSION)
+        
+    Returns:
+        str: The vibe text
+    """
+    return VIBE_TEXT_TEMPLATES[version](song["title"], song["artist"], song["analysis"])
+
 def generate_vibe_text(song_data):
+    vibe_string = None
     for song in song_data:
         if song.get("analysis"):
-            data = song["analysis"]
-
-            theme_str = "".join(data["semantic_layer"]["primary_theme"])
-            secondary_themes_str = ", ".join(data["semantic_layer"]["secondary_themes"])
-            keywords_str = ", ".join(data["semantic_layer"]["keywords"])
-            context_str = ", ".join(data["contextual_metadata"]["listening_context"])
-            vibe_string = (
-            f"Title: {song['title']}. Artist: {song['artist']}. "
-            f"Primary Theme: {theme_str}. "
-            f"Secondary Themes: {secondary_themes_str}. "
-            f"Emotions: Valence {data['emotional_profile']['valence']}, "
-            f"Arousal {data['emotional_profile']['arousal']}, "
-            f"Dominance {data['emotional_profile']['dominance']}. "
-            f"Vibe Description: {data['emotional_profile']['emotional_trajectory']}. "
-            f"Keywords: {keywords_str}. "
-            f"Context: {context_str}. "
-            f"Narrative: {data['semantic_layer']['narrative_arc']}"
-            )
-
+            vibe_string = format_vibe_text(song)
             song["vibe_text"] = vibe_string
             print(f"Vibe text generated for {song['title']} by {song['artist']}")
 
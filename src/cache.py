@@ -0,0 +1,154 @@
+"""
+Result Cache Module
+
+This module keeps finished pipeline results in memory so that popular seeds
+are answered without re-running YouTube Music, Genius, the LLM and the
+embedding API.
+
+Two levels of keys are used:
+- a cheap pre-key built from the normalized query string, which maps variant
+  spellings ("Iris The Goo Goo Dolls", "the goo goo dolls - iris") to the
+  resolved seed videoId
+- the result key itself: (seed videoId, limit, model versions)
+
+Entries expire after a TTL and the least recently used ones are evicted once
+the cache is full. The module-level `result_cache` instance lives as long as
+the Python process, so every Streamlit session of an app shares it.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from src.config import MODEL_VERSIONS, RESULT_CACHE_TTL, RESULT_CACHE_SIZE
+
+
+def normalize_query(query):
+    """
+    Normalizes a free-text query into a stable pre-key.
+
+    Lowercases, strips accents and punctuation, then sorts the words so that
+    "Iris - The Goo Goo Dolls" and "the goo goo dolls iris" give the same key.
+
+    Args:
+        query: Search query string
+
+    Returns:
+        str: Normalized query key
+    """
+    text = unicodedata.normalize("NFKD", query or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(sorted(text.split()))
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with TTL expiry and LRU eviction.
+
+    Attributes:
+        maxsize: Maximum number of entries kept
+        ttl: Lifetime of an entry in seconds
+        hits: Number of successful lookups
+        misses: Number of failed lookups
+    """
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for key, or default if missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Stores value under key, evicting the least recently used entries if needed.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResultCache:
+    """
+    Cache of complete MusicPipeline results.
+
+    Attributes:
+        aliases: TTLCache mapping normalized queries to seed videoIds
+        results: TTLCache mapping (videoId, limit, model versions) to results
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        # Aliases are tiny, keep more of them than results
+        self.aliases = TTLCache(maxsize=maxsize * 4, ttl=ttl)
+        self.results = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def result_key(video_id, limit):
+        return (video_id, int(limit), MODEL_VERSIONS)
+
+    def lookup_seed(self, query):
+        """
+        Returns the seed videoId previously resolved for query, or None.
+        """
+        return self.aliases.get(normalize_query(query))
+
+    def remember_seed(self, query, video_id):
+        self.aliases.set(normalize_query(query), video_id)
+
+    def get(self, video_id, limit):
+        """
+        Returns the cached pipeline result for a seed, or None.
+
+        The returned object is shared between callers and must be treated as read-only.
+        """
+        return self.results.get(self.result_key(video_id, limit))
+
+    def put(self, video_id, limit, result):
+        self.results.set(self.result_key(video_id, limit), result)
+
+    def invalidate(self, video_id, limit):
+        self.results.pop(self.result_key(video_id, limit))
+
+    def clear(self):
+        self.aliases.clear()
+        self.results.clear()
+
+
+# Process-wide cache shared by every pipeline (and every Streamlit session)
+result_cache = ResultCache()
@@ -0,0 +1,285 @@
+"""
+Catalog Module
+
+This module gives the pipeline access to the songs that were already analyzed
+and embedded offline.
+
+The catalog is read from the current snapshot of the binary store in
+data/catalog/ (see src/catalog_store.py). If only the legacy
+data/candidates_with_embedding.json file exists, it is converted once on
+first load.
+
+When a new snapshot is published, a background thread opens and warms it,
+then swaps it in by replacing a single reference. Readers are never blocked:
+each call works on the store it picked up at its start, so a query that
+overlaps a swap is answered entirely from the old snapshot.
+
+Songs are matched by videoId first, then by canonical song id (see
+src/identity.py), so another version of a catalog song is recognized too.
+
+When a radio track returned by YouTube Music is found in the catalog, its
+stored lyrics status, analysis, vibe text and embedding are reused and the
+track skips the lyrics, LLM and embedding stages entirely. Only vectors of the
+live embedding version (EMBEDDING_VERSION) are reused: during a model
+migration a snapshot carries both the new and the previous vectors, and a
+process configured for a version the snapshot does not have processes its
+tracks live instead of mixing embedding spaces. Tracks analyzed
+live are remembered in memory too, so the catalog keeps warming up for the
+lifetime of the process.
+"""
+
+import os
+import threading
+import time
+
+from src.catalog_store import CATALOG_DIR, CatalogStore, convert_json_catalog, current_snapshot
+from src.config import CATALOG_POLL_INTERVAL, DATA_DIR, EMBEDDING_VERSION
+from src.identity import canonical_song_id, song_identity
+
+CATALOG_FILE = os.path.join(DATA_DIR, "candidates_with_embedding.json")
+LEGACY_CATALOG_FILE = os.path.join("docs", "candidates_with_embedding.json")
+
+# Fields copied from a catalog entry onto a live track
+REUSED_FIELDS = ("lyrics", "status", "source", "analysis", "vibe_text", "embedding")
+
+
+class Catalog:
+    """
+    Lookup over analyzed songs, by videoId and by canonical song id.
+
+    Stored songs come from a CatalogStore (rows 0..n-1); songs remembered from
+    live runs are kept in an in-memory overlay.
+
+    Row numbers are only meaningful within one snapshot: callers doing several
+    row-based reads (labels, embeddings, song) should take `store` once and
+    use it for all of them.
+
+    Attributes:
+        store: CatalogStore of the current snapshot, or None if there is none yet
+        root: Catalog directory watched for new snapshots
+    """
+
+    def __init__(self, store=None, root=CATALOG_DIR):
+        self.store = store
+        self.root = root
+        self._live = []
+        self._live_by_video_id = {}
+        self._live_by_song_id = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._watcher = None
+
+    @classmethod
+    def load(cls, path=CATALOG_DIR):
+        """
+        Opens the binary catalog, converting the legacy JSON file first if needed.
+
+        Returns:
+            Catalog: Possibly empty catalog
+        """
+        store = CatalogStore.open(path)
+        if store is None:
+            for json_path in (CATALOG_FILE, LEGACY_CATALOG_FILE):
+                if os.path.exists(json_path):
+                    print(f"Converting {json_path} to the binary catalog format...")
+                    convert_json_catalog(json_path, path)
+                    store = CatalogStore.open(path)
+                    break
+        return cls(store, root=path)
+
+    def refresh(self):
+        """
+        Swaps to the current snapshot if a newer one was published.
+
+        The new store is fully warmed before the swap, so the first queries on
+        it are as fast as the last ones on the old store.
+
+        Returns:
+            bool: True if the catalog switched to another snapshot
+        """
+        with self._refresh_lock:
+            path = current_snapshot(self.root)
+            if path is None or (self.store and os.path.abspath(path) == os.path.abspath(self.store.path)):
+                return False
+            store = CatalogStore.open(self.root)
+            if store is None:
+                return False
+            store.warm()
+            previous, self.store = self.store, store
+
+            # Live songs now part of the snapshot (with usable vectors) no longer need the overlay
+            with self._lock:
+                if store.vectors(EMBEDDING_VERSION) is not None:
+                    self._live = [song for song in self._live if store.row_of(video_id=song.get("videoId")) is None]
+                self._live_by_video_id = {song["videoId"]: song for song in self._live if song.get("videoId")}
+                self._live_by_song_id = {}
+                for song in self._live:
+                    self._live_by_song_id.setdefault(song["song_id"], song)
+
+        print(f"🔄 Catalog swapped to snapshot {store.version} ({len(store)} songs, was {previous.version if previous else 'empty'})")
+        return True
+
+    def watch(self, interval=CATALOG_POLL_INTERVAL):
+        """
+        Starts a daemon thread that calls refresh() every interval seconds.
+        """
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Catalog refresh failed: {e}")
+
+        self._watcher = threading.Thread(target=poll, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def add(self, song):
+        """
+        Adds a song to the in-memory overlay if it carries a usable analysis and embedding.
+
+        Returns:
+            bool: True if the song was added
+        """
+        if not song.get("embedding") or not song.get("analysis"):
+            return False
+        song_identity.assign([song])
+        with self._lock:
+            self._live.append(song)
+            if song.get("videoId"):
+                self._live_by_video_id[song["videoId"]] = song
+            self._live_by_song_id.setdefault(song["song_id"], song)
+        return True
+
+    def song(self, row):
+        """
+        Returns the stored song at a row of the current snapshot.
+        """
+        store = self.store
+        return store.song(row) if store else None
+
+    def get(self, video_id):
+        """
+        Returns the catalog entry of a videoId, or None.
+
+        The embedding is only included when it is in the live embedding version.
+        """
+        store = self.store
+        row = store.row_of(video_id=video_id) if store else None
+        song = store.song(row, embedding_version=EMBEDDING_VERSION) if row is not None else None
+        if song is None or "embedding" not in song:
+            song = self._live_by_video_id.get(video_id) or song
+        return song
+
+    def lookup(self, track):
+        """
+        Returns the catalog entry matching a track, or None.
+        """
+        song = self.get(track.get("videoId"))
+        if song is None or "embedding" not in song:
+            store = self.store
+            song_id = track.get("song_id") or canonical_song_id(track.get("title"), track.get("artist"))
+            row = store.row_of(song_id=song_id) if store else None
+            stored = store.song(row, embedding_version=EMBEDDING_VERSION) if row is not None else None
+            for candidate in (stored, self._live_by_song_id.get(song_id)):
+                if candidate is not None and (song is None or "embedding" in candidate):
+                    song = candidate
+        return song
+
+    def apply(self, tracks):
+        """
+        Copies stored analysis and embeddings onto the tracks found in the catalog.
+
+        Matched tracks are flagged with from_catalog=True.
+
+        Returns:
+            int: Number of tracks served from the catalog
+        """
+        hits = 0
+        for track in tracks:
+            song = self.lookup(track)
+            if song is None or "embedding" not in song:
+                continue
+            for field in REUSED_FIELDS:
+                if field in song:
+                    track[field] = song[field]
+            track.setdefault("status", "found")
+            track["from_catalog"] = True
+            hits += 1
+        return hits
+
+    def remember(self, tracks):
+        """
+        Adds freshly analyzed live tracks so later queries can reuse them.
+        """
+        for track in tracks:
+            known = None if track.get("from_catalog") else self.lookup(track)
+            if not track.get("from_catalog") and (known is None or "embedding" not in known):
+                self.add({field: track[field] for field in ("title", "artist", "videoId", "song_id") + REUSED_FIELDS if field in track})
+
+    def labels(self):
+        """
+        Returns the "title - artist" label of every stored row, in row order.
+        """
+        store = self.store
+        return store.labels() if store else []
+
+    def similar(self, video_id, k=5, offset=0):
+        """
+        Finds the stored songs closest to a stored song.
+
+        Args:
+            video_id: YouTube videoId of a catalog song
+            k: Number of neighbors to return (default 5)
+            offset: Number of neighbors to skip, for "more like this" pages
+
+        Returns:
+            list: (song, score) tuples, best first, excluding the song itself
+            None: If the videoId is not in the stored catalog
+        """
+        store = self.store
+        row = store.row_of(video_id=video_id) if store else None
+        if row is None:
+            return None
+        return [(store.song(i, with_embedding=False), score) for i, score in store.neighbors(row, offset=offset, limit=k)]
+
+    def search(self, text, limit=10):
+        """
+        Finds the stored songs whose title and artist best match text.
+
+        Accent-insensitive and typo-tolerant; the last word may be a prefix
+        being typed (see src/search_index.py).
+
+        Returns:
+            list: Matching catalog songs (without embeddings), best match first
+        """
+        store = self.store
+        if not store:
+            return []
+        return [store.song(row, with_embedding=False) for row in store.search(text, limit=limit)]
+
+    def __len__(self):
+        store = self.store
+        return (len(store) if store else 0) + len(self._live)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Returns the process-wide catalog, loading it on first use.
+
+    The catalog then follows newly published snapshots in the background.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog.load()
+                _catalog.watch()
+    return _catalog
@@ -0,0 +1,689 @@
+"""
+Catalog Store Module
+
+Binary on-disk format of the analyzed catalog, replacing the
+candidates_with_embedding.json file (where every embedding is 1536 floats
+written as text). The catalog is published as immutable, versioned snapshots:
+
+    data/catalog/
+    ├── CURRENT                    name of the snapshot in use
+    └── snapshots/<version>/
+        ├── embeddings.npy         float32 matrix (n_songs x dim), memory-mapped on load
+        ├── embeddings.prev.npy    vectors of the previous embedding version, after a re-embedding
+        ├── index.faiss            FAISS index over the embeddings, memory-mapped on load
+        ├── knn_indices.npy        precomputed top-K neighbors of every song (see src/knn_graph.py)
+        ├── knn_scores.npy
+        ├── search_*.npy           title/artist trigram search index (see src/search_index.py)
+        ├── metadata.sqlite        one row per song: ids, title, artist, analysis, ...
+        └── manifest.json          version, song count, dimension, embedding model and version
+
+A new snapshot is fully written in its own directory before CURRENT is
+switched to it with an atomic rename, so readers see either the old or the
+new catalog, never a mix. Running processes poll CURRENT and swap to the new
+snapshot in the background (see Catalog.watch in src/catalog.py). The most
+recent snapshots are kept so that readers still using an old one are not
+disturbed; a plain catalog directory (manifest at the top level) still opens.
+
+Row i of metadata.sqlite describes row i of embeddings.npy. Only songs with
+an embedding are stored, in the order of the JSON file, so row ids match the
+existing FAISS index (my_music_index.faiss).
+
+Every snapshot records the embedding version (model + vibe text template,
+see EMBEDDING_VERSION in src/config.py) of its vectors. A snapshot published
+by the re-embedding job (src/embedding_migration.py) also keeps the vectors
+of the previous version, so processes still configured with the old model
+keep reading vectors of their own version until they are upgraded. Snapshots
+are published under an exclusive lock file, so concurrent publishers
+(ingestion, re-embedding) never drop each other's rows.
+
+Opening a store reads the manifest only: the embedding matrix and the FAISS
+index are memory-mapped and the metadata queried on first use. Startup is
+therefore near-instant and their pages are shared by every process (e.g. every
+Streamlit worker) reading the same files.
+
+Usage:
+    python -m src.catalog_store convert [json_path] [catalog_dir]
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from src.config import DATA_DIR, EMBEDDING_MODEL, EMBEDDING_VERSION
+from src.identity import canonical_song_id
+from src.knn_graph import compute_knn_graph, load_knn_graph, save_knn_graph, update_knn_graph
+from src.memory import format_memory_usage
+from src.search_index import SEARCH_FILES, SearchIndex
+from src.recommendation import (add_faiss_vectors, build_faiss_index, index_vectors, load_faiss_index, save_faiss_index,
+                                search_similar_songs)
+
+CATALOG_DIR = os.path.join(DATA_DIR, "catalog")
+FORMAT_VERSION = 1
+
+EMBEDDINGS_FILE = "embeddings.npy"
+PREVIOUS_EMBEDDINGS_FILE = "embeddings.prev.npy"
+INDEX_FILE = "index.faiss"
+METADATA_FILE = "metadata.sqlite"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+SNAPSHOTS_DIR = "snapshots"
+LOCK_FILE = ".publish.lock"
+
+# Number of published snapshots kept on disk, the current one included
+KEEP_SNAPSHOTS = 3
+
+# Upper bound on the size of one slice of embeddings copied between snapshots (bytes)
+COPY_BYTES = 64 * 1024 * 1024
+
+# Text columns of the metadata table, besides the row id
+METADATA_COLUMNS = ("video_id", "song_id", "title", "artist", "status", "source", "lyrics", "vibe_text", "analysis")
+
+
+def write_catalog(songs, out_dir=CATALOG_DIR, embedding_model=EMBEDDING_MODEL, version=None, previous=None, base=None,
+                  embedding_version=EMBEDDING_VERSION):
+    """
+    Writes songs as a binary catalog.
+
+    Files are written under temporary names and renamed into place, the
+    manifest last, so a reader never sees a half-written catalog.
+
+    Args:
+        songs: List of song dictionaries; songs without an embedding are skipped
+        out_dir: Target directory (created if needed)
+        embedding_model: Name of the model that produced the embeddings
+        version: Snapshot version recorded in the manifest
+        previous: CatalogStore whose songs are the first rows of songs, if any;
+                  its k-NN graph is then updated instead of recomputed
+        base: CatalogStore whose rows are copied as-is before songs (its
+              embeddings are streamed slice by slice into the new file, its
+              metadata file copied, its FAISS and search indexes extended with
+              the new rows only; nothing is decoded to dictionaries)
+        embedding_version: Embedding space of the vectors (model + vibe text template)
+
+    Returns:
+        dict: The written manifest
+    """
+    songs = [s for s in songs if s.get("embedding")]
+    os.makedirs(out_dir, exist_ok=True)
+    if base is not None and len(base) == 0:
+        base = None
+    offset = len(base) if base is not None else 0
+
+    matrix = np.array([s["embedding"] for s in songs], dtype="float32")
+    if base is not None:
+        dimension = base.embeddings.shape[1]
+        if songs and matrix.shape[1] != dimension:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match the catalog ({dimension})")
+        matrix = matrix.reshape(len(songs), dimension)
+        previous = base
+    elif not songs:
+        matrix = matrix.reshape(0, 0)
+    count = offset + len(matrix)
+
+    embeddings_tmp = os.path.join(out_dir, EMBEDDINGS_FILE + ".tmp")
+    if base is not None:
+        _write_appended_embeddings(embeddings_tmp, base.embeddings, matrix)
+    else:
+        with open(embeddings_tmp, "wb") as f:
+            np.save(f, matrix)
+
+    metadata_tmp = os.path.join(out_dir, METADATA_FILE + ".tmp")
+    if os.path.exists(metadata_tmp):
+        os.remove(metadata_tmp)
+    if base is not None:
+        shutil.copyfile(os.path.join(base.path, METADATA_FILE), metadata_tmp)
+    conn = sqlite3.connect(metadata_tmp)
+    with conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS songs (row INTEGER PRIMARY KEY, {', '.join(c + ' TEXT' for c in METADATA_COLUMNS)})")
+        conn.executemany(
+            f"INSERT INTO songs VALUES (?, {', '.join('?' for _ in METADATA_COLUMNS)})",
+            (
+                (offset + row, song.get("videoId"), song.get("song_id") or canonical_song_id(song.get("title"), song.get("artist")),
+                 song.get("title"), song.get("artist"), song.get("status"), song.get("source"), song.get("lyrics"),
+                 song.get("vibe_text"), json.dumps(song["analysis"], ensure_ascii=False) if song.get("analysis") else None)
+                for row, song in enumerate(songs)
+            ),
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_video_id ON songs (video_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_song_id ON songs (song_id)")
+    conn.close()
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "count": count,
+        "dimension": int(matrix.shape[1]) if count else 0,
+        "embedding_model": embedding_model,
+        "embedding_version": embedding_version,
+    }
+    manifest_tmp = os.path.join(out_dir, MANIFEST_FILE + ".tmp")
+    with open(manifest_tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    if count:
+        index = _appended_index(base, matrix, embeddings_tmp) if base is not None else build_faiss_index(matrix)
+        save_faiss_index(index, os.path.join(out_dir, INDEX_FILE))
+        # The index holds the normalized vectors: the k-NN graph reads them in place
+        vectors = index_vectors(index)
+        same_space = previous is not None and previous.embedding_version == embedding_version
+        graph = previous.knn if same_space and (previous is base or _is_prefix(previous, songs)) else None
+        if graph is not None:
+            indices, scores = update_knn_graph(graph[0], graph[1], vectors, normalized=True)
+        else:
+            indices, scores = compute_knn_graph(vectors, normalized=True)
+        save_knn_graph(indices, scores, out_dir)
+        del vectors, index
+    labels = [f"{song.get('title')} - {song.get('artist')}" for song in songs]
+    (base.search_index.extend(labels) if base is not None else SearchIndex.build(labels)).save(out_dir)
+
+    os.replace(embeddings_tmp, os.path.join(out_dir, EMBEDDINGS_FILE))
+    os.replace(metadata_tmp, os.path.join(out_dir, METADATA_FILE))
+    os.replace(manifest_tmp, os.path.join(out_dir, MANIFEST_FILE))
+    return manifest
+
+
+def _write_appended_embeddings(path, embeddings, matrix):
+    """
+    Writes the rows of embeddings followed by matrix as a .npy file.
+
+    The output is memory-mapped and the (memory-mapped) embeddings copied into
+    it slice by slice, so at most COPY_BYTES of the existing rows are in memory.
+    """
+    out = np.lib.format.open_memmap(path, mode="w+", dtype="float32", shape=(len(embeddings) + len(matrix), embeddings.shape[1]))
+    rows = max(1, COPY_BYTES // (4 * max(1, embeddings.shape[1])))
+    for start in range(0, len(embeddings), rows):
+        stop = min(start + rows, len(embeddings))
+        out[start:stop] = embeddings[start:stop]
+    out[len(embeddings):] = matrix
+    out.flush()
+    del out
+
+
+def _appended_index(base, matrix, embeddings_path):
+    """
+    Returns the FAISS index of the rows of base followed by matrix.
+
+    The index file of base is read into memory (a private copy, never the
+    shared mapping) and only the new rows are added to it. Older snapshots
+    without a matching index get one built from the written embeddings.
+    """
+    path = os.path.join(base.path, INDEX_FILE)
+    if os.path.exists(path):
+        index = load_faiss_index(path, mmap=False)
+        if index.ntotal == len(base):
+            add_faiss_vectors(index, matrix)
+            return index
+    return build_faiss_index(np.load(embeddings_path, mmap_mode="r"))
+
+
+def _is_prefix(store, songs):
+    """
+    Tells whether the songs of a store are, row by row, the first songs of a list.
+    """
+    if len(store) == 0 or len(store) > len(songs) or store.manifest.get("dimension") != len(songs[0]["embedding"]):
+        return False
+    return store.column("video_id") == [song.get("videoId") for song in songs[:len(store)]]
+
+
+def current_snapshot(root=CATALOG_DIR):
+    """
+    Returns the directory of the snapshot CURRENT points to.
+
+    Returns:
+        str: Snapshot directory (root itself for a plain catalog directory)
+        None: If nothing was published under root
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return root if os.path.exists(os.path.join(root, MANIFEST_FILE)) else None
+    return os.path.join(root, SNAPSHOTS_DIR, version)
+
+
+def _new_version():
+    # Versions sort chronologically; the suffix keeps concurrent publishers apart
+    now = time.time()
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f".{int(now * 1000) % 1000:03d}-{uuid.uuid4().hex[:6]}"
+
+
+def _switch_current(root, version):
+    current_tmp = os.path.join(root, f"{CURRENT_FILE}.{version}.tmp")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(root, CURRENT_FILE))
+
+
+@contextmanager
+def publish_lock(root=CATALOG_DIR):
+    """
+    Holds the exclusive publish lock of a catalog directory (across processes).
+
+    Publishers read the current snapshot and publish the next one under this
+    lock, so two of them never build on the same snapshot.
+    """
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, LOCK_FILE), "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def publish_snapshot(songs, root=CATALOG_DIR, embedding_model=EMBEDDING_MODEL, keep=KEEP_SNAPSHOTS,
+                     embedding_version=EMBEDDING_VERSION):
+    """
+    Writes songs as a new catalog snapshot and makes it the current one.
+
+    Args:
+        songs: List of song dictionaries; songs without an embedding are skipped
+        root: Catalog directory
+        embedding_model: Name of the model that produced the embeddings
+        keep: Number of snapshots kept on disk, the new one included
+        embedding_version: Embedding space of the vectors (model + vibe text template)
+
+    Returns:
+        dict: The manifest of the published snapshot
+    """
+    songs = [s for s in songs if s.get("embedding")]
+    with publish_lock(root):
+        version = _new_version()
+        # Songs appended after the current snapshot only extend its k-NN graph
+        previous = CatalogStore.open(root)
+        manifest = write_catalog(songs, os.path.join(root, SNAPSHOTS_DIR, version), embedding_model, version=version,
+                                 previous=previous, embedding_version=embedding_version)
+        _switch_current(root, version)
+        _prune_snapshots(root, keep)
+    return manifest
+
+
+def append_snapshot(songs, root=CATALOG_DIR, embedding_model=EMBEDDING_MODEL, keep=KEEP_SNAPSHOTS,
+                    embedding_version=EMBEDDING_VERSION):
+    """
+    Publishes a new snapshot made of the current one plus songs appended after it.
+
+    The rows of the current snapshot are copied file to file (embeddings in
+    slices), so the cost does not depend on decoding the existing catalog, and
+    its FAISS index, k-NN graph and search index are extended rather than
+    rebuilt. Peak memory is one in-memory copy of the FAISS index (the
+    normalized matrix), which the k-NN update reads in place. Songs already in the catalog (same
+    videoId or song id) are skipped. Vectors kept from a previous embedding
+    version are not carried over (the new songs have none).
+
+    Args:
+        songs: List of song dictionaries; songs without an embedding are skipped
+        root: Catalog directory
+        embedding_model: Name of the model that produced the embeddings
+        keep: Number of snapshots kept on disk, the new one included
+        embedding_version: Embedding space of the vectors (model + vibe text template)
+
+    Returns:
+        dict: The manifest of the published snapshot
+
+    Raises:
+        ValueError: If the current snapshot is in another embedding version
+    """
+    with publish_lock(root):
+        base = CatalogStore.open(root)
+        if base is None:
+            version = _new_version()
+            manifest = write_catalog(songs, os.path.join(root, SNAPSHOTS_DIR, version), embedding_model, version=version,
+                                     embedding_version=embedding_version)
+        else:
+            manifest = _append_to(base, songs, root, embedding_model, embedding_version)
+        _switch_current(root, manifest["version"])
+        _prune_snapshots(root, keep)
+    return manifest
+
+
+def _append_to(base, songs, root, embedding_model, embedding_version):
+    """Writes the snapshot of append_snapshot() (called under the publish lock)."""
+    if len(base) and base.embedding_version != embedding_version:
+        raise ValueError(f"Catalog {base.version} is embedded with {base.embedding_version}, not {embedding_version}")
+
+    new_songs, seen = [], set()
+    for song in songs:
+        if not song.get("embedding"):
+            continue
+        song_id = song.get("song_id") or canonical_song_id(song.get("title"), song.get("artist"))
+        keys = {("video_id", song.get("videoId")), ("song_id", song_id)} - {("video_id", None)}
+        if keys & seen or any(base.row_of(**{key: value}) is not None for key, value in keys):
+            continue
+        seen |= keys
+        new_songs.append(dict(song, song_id=song_id))
+
+    version = _new_version()
+    return write_catalog(new_songs, os.path.join(root, SNAPSHOTS_DIR, version), embedding_model, version=version, base=base,
+                         embedding_version=embedding_version)
+
+
+def publish_reembedded(base, matrix, root=CATALOG_DIR, embedding_model=EMBEDDING_MODEL, embedding_version=EMBEDDING_VERSION,
+                       vibe_texts=None, keep=KEEP_SNAPSHOTS):
+    """
+    Publishes a copy of a snapshot whose vectors were recomputed in another embedding version.
+
+    Metadata and search index are copied from base; the vectors of base are
+    kept as the previous version (see CatalogStore.vectors). The FAISS index
+    and the k-NN graph are rebuilt for the new vectors. Must be called under
+    publish_lock(root), with base the current snapshot.
+
+    Args:
+        base: CatalogStore the vectors were computed from (row for row)
+        matrix: (len(base) x dim) new vectors
+        root: Catalog directory
+        embedding_model: Model that produced the new vectors
+        embedding_version: Embedding space of the new vectors
+        vibe_texts: Optional {row: vibe text} to store (changed template)
+        keep: Number of snapshots kept on disk, the new one included
+
+    Returns:
+        dict: The manifest of the published snapshot
+    """
+    matrix = np.asarray(matrix, dtype="float32")
+    if len(matrix) != len(base):
+        raise ValueError(f"{len(matrix)} vectors for a catalog of {len(base)} songs")
+    version = _new_version()
+    out_dir = os.path.join(root, SNAPSHOTS_DIR, version)
+    os.makedirs(out_dir, exist_ok=True)
+
+    with open(os.path.join(out_dir, EMBEDDINGS_FILE), "wb") as f:
+        np.save(f, matrix)
+    shutil.copyfile(os.path.join(base.path, EMBEDDINGS_FILE), os.path.join(out_dir, PREVIOUS_EMBEDDINGS_FILE))
+    shutil.copyfile(os.path.join(base.path, METADATA_FILE), os.path.join(out_dir, METADATA_FILE))
+    if vibe_texts:
+        conn = sqlite3.connect(os.path.join(out_dir, METADATA_FILE))
+        with conn:
+            conn.executemany("UPDATE songs SET vibe_text = ? WHERE row = ?", ((text, int(row)) for row, text in vibe_texts.items()))
+        conn.close()
+    if SearchIndex.load(base.path) is not None:
+        for name in SEARCH_FILES:
+            shutil.copyfile(os.path.join(base.path, name), os.path.join(out_dir, name))
+    else:
+        SearchIndex.build(base.labels()).save(out_dir)
+
+    if len(matrix):
+        index = build_faiss_index(matrix)
+        save_faiss_index(index, os.path.join(out_dir, INDEX_FILE))
+        indices, scores = compute_knn_graph(index_vectors(index), normalized=True)
+        save_knn_graph(indices, scores, out_dir)
+        del index
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "count": len(matrix),
+        "dimension": int(matrix.shape[1]) if len(matrix) else 0,
+        "embedding_model": embedding_model,
+        "embedding_version": embedding_version,
+        "previous_embeddings": {"embedding_version": base.embedding_version, "file": PREVIOUS_EMBEDDINGS_FILE},
+    }
+    manifest_tmp = os.path.join(out_dir, MANIFEST_FILE + ".tmp")
+    with open(manifest_tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_tmp, os.path.join(out_dir, MANIFEST_FILE))
+
+    _switch_current(root, version)
+    _prune_snapshots(root, keep)
+    return manifest
+
+
+def _prune_snapshots(root, keep):
+    """
+    Deletes the oldest snapshots, never the current one.
+
+    Processes still reading a deleted snapshot keep working: their mapped files
+    and open SQLite connection stay valid until they swap to a newer one.
+    """
+    snapshots_dir = os.path.join(root, SNAPSHOTS_DIR)
+    current = os.path.basename(current_snapshot(root) or "")
+    versions = sorted(os.listdir(snapshots_dir))
+    for version in versions[:-keep] if keep > 0 else []:
+        if version != current:
+            shutil.rmtree(os.path.join(snapshots_dir, version), ignore_errors=True)
+
+
+def convert_json_catalog(json_path, root=CATALOG_DIR):
+    """
+    One-shot conversion of a candidates_with_embedding.json file to a published snapshot.
+
+    Returns:
+        dict: The written manifest
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        songs = json.load(f)
+    return publish_snapshot(songs, root)
+
+
+class CatalogStore:
+    """
+    Read-only, lazily opened view of one catalog snapshot.
+
+    A store never changes once opened: a newly published snapshot is opened
+    as a new store.
+
+    Attributes:
+        path: Snapshot directory
+        manifest: Parsed manifest.json
+        version: Snapshot version (the directory name for unversioned catalogs)
+        embedding_version: Embedding space of the main vectors
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest.get("version") or os.path.basename(os.path.abspath(path))
+        # Snapshots written before embedding versions used the first vibe text template
+        self.embedding_version = self.manifest.get("embedding_version") or f"{self.manifest.get('embedding_model')}+vibe-v1"
+        self._embeddings = None
+        self._previous_embeddings = None
+        self._index = None
+        self._knn = None
+        self._search_index = None
+        self._labels = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path=CATALOG_DIR):
+        """
+        Opens the current snapshot of the catalog at path.
+
+        Returns:
+            CatalogStore: The store, or None if no catalog was published there
+        """
+        snapshot = current_snapshot(path)
+        if snapshot is None or not os.path.exists(os.path.join(snapshot, MANIFEST_FILE)):
+            return None
+        return cls(snapshot)
+
+    @property
+    def embeddings(self):
+        """Memory-mapped (n_songs x dim) float32 matrix."""
+        if self._embeddings is None:
+            self._embeddings = np.load(os.path.join(self.path, EMBEDDINGS_FILE), mmap_mode="r")
+        return self._embeddings
+
+    def vectors(self, embedding_version=None):
+        """
+        Returns the memory-mapped vectors of an embedding version.
+
+        Args:
+            embedding_version: Wanted version (default: the main one)
+
+        Returns:
+            The (n_songs x dim) matrix, or None if the snapshot has no vectors of that version
+        """
+        if embedding_version in (None, self.embedding_version):
+            return self.embeddings
+        previous = self.manifest.get("previous_embeddings") or {}
+        if previous.get("embedding_version") != embedding_version:
+            return None
+        if self._previous_embeddings is None:
+            self._previous_embeddings = np.load(os.path.join(self.path, previous["file"]), mmap_mode="r")
+        return self._previous_embeddings
+
+    @property
+    def index(self):
+        """FAISS index over the embeddings (inner product on normalized vectors), memory-mapped."""
+        with self._load_lock:
+            if self._index is None:
+                path = os.path.join(self.path, INDEX_FILE)
+                if os.path.exists(path):
+                    self._index = load_faiss_index(path)
+                else:
+                    self._index = build_faiss_index(np.array(self.embeddings, dtype="float32"))
+                print(f"📂 FAISS index of catalog {self.version} loaded ({self._index.ntotal} vectors) - memory: {format_memory_usage()}")
+        return self._index
+
+    @property
+    def knn(self):
+        """Memory-mapped (indices, scores) k-NN graph, or None if the snapshot has none."""
+        if self._knn is None:
+            self._knn = load_knn_graph(self.path) or False
+        return self._knn or None
+
+    @property
+    def search_index(self):
+        """Memory-mapped title/artist search index (built from the labels for older snapshots)."""
+        if self._search_index is None:
+            self._search_index = SearchIndex.load(self.path) or SearchIndex.build(self.labels())
+        return self._search_index
+
+    def search(self, text, limit=10):
+        """
+        Returns the rows whose "title - artist" best matches text (typo and accent tolerant).
+        """
+        return self.search_index.search(text, limit=limit)
+
+    def neighbors(self, row, offset=0, limit=5):
+        """
+        Returns the nearest songs of a row, best first, without the song itself.
+
+        Read from the precomputed k-NN graph; pages beyond the stored
+        neighbors (or snapshots without a graph) fall back to a FAISS search.
+
+        Args:
+            row: Catalog row of the song
+            offset: Number of neighbors to skip (pagination)
+            limit: Number of neighbors to return
+
+        Returns:
+            list: (row, score) tuples
+        """
+        graph = self.knn
+        if graph is not None and (offset + limit <= graph[0].shape[1] or graph[0].shape[1] >= len(self) - 1):
+            indices, scores = graph[0][row, offset:offset + limit], graph[1][row, offset:offset + limit]
+            return [(int(i), float(s)) for i, s in zip(indices, scores)]
+
+        k = min(offset + limit, len(self) - 1)
+        if k < 1:
+            return []
+        distances, indices = search_similar_songs(self.index, np.array(self.embeddings[row], dtype="float32"), k=k)
+        pairs = [(int(i), float(d)) for d, i in zip(distances[0], indices[0]) if 0 <= i != row]
+        return pairs[offset:offset + limit]
+
+    def warm(self):
+        """
+        Maps the embeddings, opens the index and reads the labels, so that the
+        first query on this store does not pay for them.
+        """
+        self.embeddings
+        self.index
+        self.knn
+        self.search_index
+        self.labels()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            if self._conn is None:
+                uri = f"file:{os.path.abspath(os.path.join(self.path, METADATA_FILE))}?mode=ro"
+                self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return self._conn.execute(sql, params).fetchall()
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def row_of(self, video_id=None, song_id=None):
+        """
+        Returns the row of a song by videoId or canonical song id, or None.
+        """
+        column, value = ("video_id", video_id) if video_id else ("song_id", song_id)
+        rows = self._query(f"SELECT row FROM songs WHERE {column} = ? LIMIT 1", (value,))
+        return rows[0][0] if rows else None
+
+    def song(self, row, with_embedding=True, embedding_version=None):
+        """
+        Returns a song dictionary in the same shape as the JSON catalog entries.
+
+        Args:
+            row: Catalog row
+            with_embedding: If False, the embedding is left out
+            embedding_version: Embedding version wanted (default: the main one);
+                               the embedding is left out if the snapshot has none
+        """
+        rows = self._query(f"SELECT {', '.join(METADATA_COLUMNS)} FROM songs WHERE row = ?", (int(row),))
+        if not rows:
+            return None
+        values = dict(zip(METADATA_COLUMNS, rows[0]))
+        song = {
+            "title": values["title"],
+            "artist": values["artist"],
+            "videoId": values["video_id"],
+            "song_id": values["song_id"],
+            "catalog_row": int(row),
+        }
+        for field in ("status", "source", "lyrics", "vibe_text"):
+            if values[field] is not None:
+                song[field] = values[field]
+        song["analysis"] = json.loads(values["analysis"]) if values["analysis"] else None
+        vectors = self.vectors(embedding_version) if with_embedding else None
+        if vectors is not None:
+            song["embedding"] = vectors[row].tolist()
+        return song
+
+    def column(self, name):
+        """
+        Returns one metadata column for every row, in row order.
+        """
+        if name not in METADATA_COLUMNS:
+            raise ValueError(f"Unknown catalog column: {name}")
+        return [value for (value,) in self._query(f"SELECT {name} FROM songs ORDER BY row")]
+
+    def labels(self):
+        """
+        Returns the "title - artist" label of every row, in row order.
+        """
+        if self._labels is None:
+            self._labels = [f"{title} - {artist}" for title, artist in self._query("SELECT title, artist FROM songs ORDER BY row")]
+        return self._labels
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "convert":
+        print("Usage: python -m src.catalog_store convert [json_path] [catalog_dir]")
+        sys.exit(1)
+
+    json_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(DATA_DIR, "candidates_with_embedding.json")
+    out_dir = sys.argv[3] if len(sys.argv) > 3 else CATALOG_DIR
+    manifest = convert_json_catalog(json_path, out_dir)
+    print(f"✅ {manifest['count']} songs published to {out_dir} as snapshot {manifest['version']} (dim {manifest['dimension']})")
@@ -14,6 +14,23 @@ Environment Variables:
 
 Constants:
     DATA_DIR: Directory path for storing data files (default: "data")
+    ANALYSIS_MODEL: OpenRouter model used for emotional/semantic analysis
+    EMBEDDING_MODEL: OpenAI model used for vibe text embeddings
+    VIBE_TEXT_VERSION: Version of the vibe text template (see src/analysis.py)
+    EMBEDDING_VERSION: Embedding space of the live pipeline (model + vibe text
+        template); catalog vectors are only reused when they match it
+    EMBEDDING_BATCH_SIZE: Texts sent per embedding request by the re-embedding job
+    MODEL_VERSIONS: Tuple identifying the models behind a pipeline result
+    RESULT_CACHE_TTL: Lifetime in seconds of a cached pipeline result
+    RESULT_CACHE_SIZE: Maximum number of cached pipeline results (LRU)
+    PIPELINE_CONCURRENCY: Maximum number of tracks processed at once per pipeline stage
+    SERVICE_WORKERS: Number of live pipeline runs the HTTP service executes at once
+    SERVICE_MAX_QUEUE: Number of live runs allowed to wait before the service answers 503
+    SERVICE_TIMEOUT: Seconds a /recommend request waits for its live run
+    CATALOG_POLL_INTERVAL: Seconds between checks for a newly published catalog snapshot (0 disables)
+    CATALOG_KNN_K: Number of precomputed neighbors stored per catalog song
+    YTMUSIC_RATE, GENIUS_RATE, OPENROUTER_RATE, OPENAI_RATE: Maximum requests per
+        second sent to each API by the whole process (shared by concurrent runs)
 """
 
 import os
@@ -26,4 +43,28 @@ TOKEN_GENIUS = os.getenv("TOKEN_GENIUS")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 CLIENT_ID_GENIUS = os.getenv("CLIENT_ID_GENIUS")
 CLIENT_SECRET_GENIUS = os.getenv("CLIENT_SECRET_GENIUS")
-DATA_DIR = "data"
\ No newline at end of file
+DATA_DIR = "data"
+
+ANALYSIS_MODEL = "tngtech/deepseek-r1t2-chimera:free"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+VIBE_TEXT_VERSION = int(os.getenv("VIBE_TEXT_VERSION", 1))
+EMBEDDING_VERSION = f"{EMBEDDING_MODEL}+vibe-v{VIBE_TEXT_VERSION}"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 256))
+MODEL_VERSIONS = (ANALYSIS_MODEL, EMBEDDING_VERSION)
+
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 6 * 3600))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 256))
+
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", 8))
+
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", 4))
+SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", 16))
+SERVICE_TIMEOUT = int(os.getenv("SERVICE_TIMEOUT", 120))
+
+CATALOG_POLL_INTERVAL = int(os.getenv("CATALOG_POLL_INTERVAL", 30))
+CATALOG_KNN_K = int(os.getenv("CATALOG_KNN_K", 50))
+
+YTMUSIC_RATE = float(os.getenv("YTMUSIC_RATE", 5))
+GENIUS_RATE = float(os.getenv("GENIUS_RATE", 1))
+OPENROUTER_RATE = float(os.getenv("OPENROUTER_RATE", 2))
+OPENAI_RATE = float(os.getenv("OPENAI_RATE", 20))
@@ -0,0 +1,228 @@
+"""
+Embedding Migration Module
+
+Re-embeds the catalog for a new embedding model and/or vibe text template
+(see VIBE_TEXT_TEMPLATES in src/analysis.py) in the background, while the
+apps keep serving the current snapshot.
+
+The job embeds the catalog in batches of rows, one OpenAI request per batch,
+and stages every finished batch in its own file:
+
+    data/catalog/migrations/<embedding version>/
+    ├── migration.json         target model, template version and batch size
+    └── batch-<n>.npz          vectors, videoIds and vibe texts of rows [n*B, (n+1)*B)
+
+Batches are checked against the videoIds of the current snapshot, so the job
+can be stopped and restarted at any time, and songs appended in the meantime
+(e.g. by src/ingest.py) are embedded on the next pass. Once every row is
+covered, the new vectors are published as a new snapshot under the catalog
+publish lock: running apps switch to it atomically, like for any snapshot.
+
+The new snapshot also keeps the previous vectors, so processes still
+configured with the old EMBEDDING_MODEL / VIBE_TEXT_VERSION keep reusing
+catalog vectors of their own version (dual read) until they are restarted
+with the new settings.
+
+Usage:
+    python -m src.embedding_migration --model text-embedding-3-large [--vibe-text-version 2]
+                                      [--batch-size 256] [--concurrency 4] [--catalog data/catalog]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+from src.analysis import format_vibe_text
+from src.catalog_store import CATALOG_DIR, CatalogStore, publish_lock, publish_reembedded
+from src.config import EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL, VIBE_TEXT_VERSION
+from src.recommendation import aembed_texts
+
+MIGRATIONS_DIR = "migrations"
+STATE_FILE = "migration.json"
+
+# Passes over the missing batches before giving up (failed batches are retried on the next pass)
+MAX_PASSES = 3
+
+
+class EmbeddingMigration:
+    """
+    Resumable re-embedding of the catalog into a new embedding version.
+
+    Attributes:
+        root: Catalog directory
+        model: Target OpenAI embedding model
+        vibe_text_version: Target vibe text template version
+        embedding_version: Target embedding version (model + template)
+        batch_size: Rows per embedding request (fixed for the lifetime of a migration)
+        concurrency: Embedding requests in flight
+        staging: Directory of the staged batches
+    """
+
+    def __init__(self, root=CATALOG_DIR, model=EMBEDDING_MODEL, vibe_text_version=VIBE_TEXT_VERSION,
+                 batch_size=EMBEDDING_BATCH_SIZE, concurrency=4):
+        self.root = root
+        self.model = model
+        self.vibe_text_version = vibe_text_version
+        self.embedding_version = f"{model}+vibe-v{vibe_text_version}"
+        self.concurrency = concurrency
+        self.staging = os.path.join(root, MIGRATIONS_DIR, re.sub(r"[^A-Za-z0-9.+-]", "_", self.embedding_version))
+        self.batch_size = self._load_batch_size(batch_size)
+
+    def _load_batch_size(self, batch_size):
+        # Batch boundaries must not move between runs, or staged batches would be lost
+        path = os.path.join(self.staging, STATE_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["batch_size"]
+        os.makedirs(self.staging, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"embedding_version": self.embedding_version, "model": self.model,
+                       "vibe_text_version": self.vibe_text_version, "batch_size": batch_size}, f, indent=2)
+        return batch_size
+
+    def _batch_path(self, batch):
+        return os.path.join(self.staging, f"batch-{batch:06d}.npz")
+
+    def _is_staged(self, batch, video_ids):
+        """Tells whether a batch is staged for exactly these videoIds."""
+        path = self._batch_path(batch)
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as staged:
+            return staged["video_ids"].tolist() == video_ids
+
+    def _vibe_text(self, song):
+        if song.get("analysis"):
+            try:
+                return format_vibe_text(song, self.vibe_text_version)
+            except (KeyError, TypeError):
+                pass
+        return song.get("vibe_text") or f"Title: {song['title']}. Artist: {song['artist']}."
+
+    async def _embed_batch(self, store, batch, video_ids):
+        start = batch * self.batch_size
+        songs = [store.song(row, with_embedding=False) for row in range(start, start + len(video_ids))]
+        texts = [self._vibe_text(song) for song in songs]
+        vectors = np.array(await aembed_texts(texts, model=self.model), dtype="float32")
+
+        tmp_path = self._batch_path(batch) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, vectors=vectors, video_ids=np.array(video_ids, dtype=str), vibe_texts=np.array(texts, dtype=str))
+        os.replace(tmp_path, self._batch_path(batch))
+
+    def _missing_batches(self, video_ids):
+        batches = range((len(video_ids) + self.batch_size - 1) // self.batch_size)
+        return {b: video_ids[b * self.batch_size:(b + 1) * self.batch_size] for b in batches
+                if not self._is_staged(b, video_ids[b * self.batch_size:(b + 1) * self.batch_size])}
+
+    async def _embed_missing(self, store, missing):
+        """
+        Embeds the missing batches of a snapshot.
+
+        Returns:
+            int: Number of batches that failed
+        """
+        slots = asyncio.Semaphore(self.concurrency)
+        started = time.time()
+        done = 0
+        failed = 0
+
+        async def process(batch, video_ids):
+            nonlocal done, failed
+            async with slots:
+                try:
+                    await self._embed_batch(store, batch, video_ids)
+                except Exception as e:
+                    failed += 1
+                    print(f"  Embedding error for batch {batch}: {e} - Erreur d'embedding pour le lot {batch}: {e}")
+                    return
+            done += 1
+            elapsed = time.time() - started
+            print(f"⏱️  {done}/{len(missing)} batches embedded ({elapsed / 60:.1f} min, "
+                  f"~{elapsed / done * (len(missing) - done) / 60:.1f} min left)")
+
+        await asyncio.gather(*(process(batch, ids) for batch, ids in missing.items()))
+        return failed
+
+    def _publish(self, store):
+        """
+        Assembles the staged batches of a snapshot and publishes them (under the publish lock).
+        """
+        vectors, texts = [], {}
+        for batch in range((len(store) + self.batch_size - 1) // self.batch_size):
+            with np.load(self._batch_path(batch)) as staged:
+                vectors.append(staged["vectors"])
+                texts.update(enumerate(staged["vibe_texts"].tolist(), start=batch * self.batch_size))
+        matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype="float32")
+        return publish_reembedded(store, matrix, self.root, self.model, self.embedding_version, vibe_texts=texts)
+
+    async def arun(self):
+        """
+        Embeds every missing batch, then publishes the re-embedded snapshot.
+
+        Returns:
+            dict: Manifest of the published snapshot, or None if nothing was published
+        """
+        passes = 0
+        while True:
+            store = CatalogStore.open(self.root)
+            if store is None:
+                print("No catalog found - Aucun catalogue trouvé")
+                return None
+            if store.embedding_version == self.embedding_version:
+                print(f"Catalog {store.version} is already embedded with {self.embedding_version} - "
+                      f"Le catalogue {store.version} est déjà en {self.embedding_version}")
+                shutil.rmtree(self.staging, ignore_errors=True)
+                return None
+
+            video_ids = store.column("video_id")
+            missing = self._missing_batches(video_ids)
+            if missing:
+                passes += 1
+                if passes > MAX_PASSES:
+                    print(f"❌ {len(missing)} batches still failing, rerun to resume - "
+                          f"{len(missing)} lots toujours en échec, relancer pour reprendre")
+                    return None
+                print(f"🚀 Snapshot {store.version}: {len(missing)} of {(len(video_ids) + self.batch_size - 1) // self.batch_size} "
+                      f"batches to embed with {self.embedding_version}")
+                await self._embed_missing(store, missing)
+                continue
+
+            with publish_lock(self.root):
+                current = CatalogStore.open(self.root)
+                if current is None or current.version != store.version:
+                    # A snapshot was published meanwhile: embed its new rows first
+                    continue
+                manifest = self._publish(current)
+            shutil.rmtree(self.staging, ignore_errors=True)
+            print(f"✅ Snapshot {manifest['version']} published with {self.embedding_version} ({manifest['count']} songs) - "
+                  f"Snapshot {manifest['version']} publié avec {self.embedding_version} ({manifest['count']} chansons)")
+            return manifest
+
+    def run(self):
+        """
+        Blocking wrapper around arun().
+        """
+        return asyncio.run(self.arun())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed the VibeReco catalog with a new embedding model or vibe text template")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--vibe-text-version", type=int, default=VIBE_TEXT_VERSION)
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--catalog", default=CATALOG_DIR)
+    args = parser.parse_args()
+
+    EmbeddingMigration(args.catalog, args.model, args.vibe_text_version, args.batch_size, args.concurrency).run()
+
+
+if __name__ == "__main__":
+    main()
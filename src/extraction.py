@@ -1,9 +1,81 @@
 import ytmusicapi
 from lyricsgenius import Genius
-from src.config import TOKEN_GENIUS
-import time
+from src.aio import LoopLocal, RateLimiter, run_sync
+from src.config import TOKEN_GENIUS, PIPELINE_CONCURRENCY, YTMUSIC_RATE, GENIUS_RATE
+from src.singleflight import SingleFlight
+import asyncio
 import re
 
+
+# Coalesces concurrent lyrics lookups for the same track across pipeline runs
+_lyrics_flight = SingleFlight()
+
+# Request budgets shared by every run of the process
+_ytmusic_rate = RateLimiter(YTMUSIC_RATE)
+_genius_rate = RateLimiter(GENIUS_RATE)
+
+# API clients reused by every run of the same event loop
+_ytmusic = LoopLocal(ytmusicapi.YTMusic)
+_genius = LoopLocal(lambda: Genius(TOKEN_GENIUS, verbose=False, remove_section_headers=True))
+
+def resolve_seed(seed_query, limit=10, yt=None):
+    """
+    Resolves a seed query to the YouTube Music videoId of its first song result.
+    
+    Args:
+        seed_query: Search query string (song title, artist, or combination)
+        limit: Maximum number of search results to request (default: 10)
+        yt: Optional YTMusic client to reuse
+        
+    Returns:
+        str: videoId of the seed song
+        None: If the search returns an artist instead of a song, or no results found
+    """
+    yt = yt or ytmusicapi.YTMusic()
+    search_results = yt.search(seed_query, limit=limit)
+
+    if len(search_results) == 0:
+        print("Aucune chanson trouvée pour la requête :", seed_query)
+        return None
+
+    if search_results[0]['resultType'] == 'artist':
+        print("Artist found, please search a song")
+        return None
+
+    track_id = search_results[0].get('videoId')
+    
+    # Vérifier que le videoId existe et n'est pas None
+    if not track_id:
+        print(f"Aucun videoId trouvé pour: {seed_query}")
+        return None
+
+    return track_id
+
+def get_radio_tracks(video_id, limit=10, yt=None):
+    """
+    Retrieves the YouTube Music radio playlist generated around a seed videoId.
+    
+    Args:
+        video_id: YouTube videoId of the seed song
+        limit: Maximum number of tracks to return (default: 10)
+        yt: Optional YTMusic client to reuse
+        
+    Returns:
+        list: List of dictionaries containing title, artist and videoId
+    """
+    yt = yt or ytmusicapi.YTMusic()
+    radio = yt.get_watch_playlist(video_id, limit=10)
+
+    tracks = []
+    for track in radio["tracks"][:limit]:
+        chanson_propre = {
+            "title": track["title"],
+            "artist": track["artists"][0]["name"],
+            "videoId": track["videoId"]
+        }
+        tracks.append(chanson_propre)
+    return tracks
+
 def get_youtube_recommendations(seed_query, limit=10):
     """
     Retrieves song recommendations from YouTube Music based on a seed query.
@@ -23,44 +95,54 @@ def get_youtube_recommendations(seed_query, limit=10):
         None: If the search returns an artist instead of a song, or no results found
     """
     yt = ytmusicapi.YTMusic()
-    search_results = yt.search(seed_query, limit=limit)
+    track_id = resolve_seed(seed_query, limit=limit, yt=yt)
 
-    tracks = []
+    if not track_id:
+        return None
 
-    if len(search_results) > 0:
-        if search_results[0]['resultType'] == 'artist':
-            print("Artist found, please search a song")
-            return None
-        else:
-            first_track = search_results[0]
-            track_id = first_track.get('videoId')
-            
-            # Vérifier que le videoId existe et n'est pas None
-            if not track_id:
-                print(f"Aucun videoId trouvé pour: {seed_query}")
-                return None
-            
-            radio = yt.get_watch_playlist(track_id, limit=10)
-
-            for track in radio["tracks"][:limit]:
-                chanson_propre = {
-                    "title": track["title"],
-                    "artist": track["artists"][0]["name"],
-                    "videoId": track["videoId"]
-                }
-                tracks.append(chanson_propre)
-    else:
-        print("Aucune chanson trouvée pour la requête :", seed_query)
+    return get_radio_tracks(track_id, limit=limit, yt=yt)
+
+async def aresolve_seed(seed_query, limit=10, yt=None):
+    """
+    Async counterpart of resolve_seed.
     
-    return tracks
+    ytmusicapi has no async client, so the blocking call runs in the default executor.
+    Without yt, the client shared by the calling event loop is used.
+    """
+    yt = yt or _ytmusic.get()
+    async with _ytmusic_rate:
+        return await asyncio.to_thread(resolve_seed, seed_query, limit, yt)
+
+async def aget_radio_tracks(video_id, limit=10, yt=None):
+    """
+    Async counterpart of get_radio_tracks (same client sharing as aresolve_seed).
+    """
+    yt = yt or _ytmusic.get()
+    async with _ytmusic_rate:
+        return await asyncio.to_thread(get_radio_tracks, video_id, limit, yt)
+
+async def aget_youtube_recommendations(seed_query, limit=10):
+    """
+    Async counterpart of get_youtube_recommendations.
+    """
+    yt = _ytmusic.get()
+    track_id = await aresolve_seed(seed_query, limit=limit, yt=yt)
+
+    if not track_id:
+        return None
+
+    return await aget_radio_tracks(track_id, limit=limit, yt=yt)
 
 def fetch_lyrics(tracks):
     """
     Fetches lyrics for a list of tracks using the Genius API.
     
-    Iterates through the provided tracks and attempts to retrieve lyrics from Genius.
-    Updates each track dictionary with lyrics and status information. Includes a 1-second
-    delay between requests to respect API rate limits.
+    Iterates through the provided tracks and attempts to retrieve lyrics from
+    YTMusic, then Genius. Updates each track dictionary with lyrics and status
+    information. Genius requests go through the process-wide GENIUS_RATE budget
+    (see afetch_lyrics) to respect API rate limits.
+    
+    Thin blocking wrapper around afetch_lyrics.
     
     Args:
         tracks: List of track dictionaries containing 'title' and 'artist' keys
@@ -74,57 +156,88 @@ def fetch_lyrics(tracks):
     Side effects:
         Prints status messages for each track processed
     """
+    return run_sync(afetch_lyrics(tracks))
+
+async def afetch_lyrics(tracks, concurrency=PIPELINE_CONCURRENCY):
+    """
+    Async counterpart of fetch_lyrics.
+    
+    YTMusic lookups run concurrently (up to `concurrency` at a time); Genius
+    fallbacks are spaced by the process-wide GENIUS_RATE budget (one per second
+    by default), shared with every other concurrent run.
+    
+    Args:
+        tracks: List of track dictionaries containing 'title' and 'artist' keys
+        concurrency: Maximum number of tracks looked up at the same time
+        
+    Returns:
+        list: Updated list of tracks (see fetch_lyrics)
+        None: If tracks parameter is None (artist search result)
+    """
     if tracks is None:
         print("Artist found, please search a song")
         return None
-    else:
-        yt = ytmusicapi.YTMusic()
-        genius = Genius(TOKEN_GENIUS, verbose=False, remove_section_headers=True)
-        
-        for candidate in tracks:
-            lyrics_found = False
-            
-            # 1. Try YTMusic (Fast)
-            try:
-                print(f"Attempting YTMusic for: {candidate['title']}")
-                watch_data = yt.get_watch_playlist(candidate["videoId"])
-                if "lyrics" in watch_data and watch_data["lyrics"]:
-                    lyrics_data = yt.get_lyrics(watch_data["lyrics"])
-                    if lyrics_data and "lyrics" in lyrics_data:
-                        candidate["lyrics"] = lyrics_data["lyrics"]
-                        candidate["status"] = "found"
-                        candidate["source"] = "ytmusic"
-                        print(f"  -> Found lyrics via YTMusic")
-                        lyrics_found = True
-            except Exception as e:
-                print(f"  -> YTMusic error: {e}")
-
-            # 2. Fallback to Genius (Reliable)
-            if not lyrics_found:
-                try: 
-                    print(f"Fallback to Genius for: {candidate['title']}")
-                    # Clean title to remove noise like "(Official Audio)"
-                    clean_title = re.sub(r"[\(\[].*?(official|video|audio|lyrics|version|remaster|remaster version).*?[\)\]]", "", candidate["title"], flags=re.IGNORECASE).strip()
-                    
-                    song = genius.search_song(clean_title, candidate["artist"])
-                    if song:
-                        candidate["lyrics"] = song.lyrics
-                        candidate["status"] = "found"
-                        candidate["source"] = "genius"
-                        print(f"  -> Found lyrics via Genius (searched as '{clean_title}')")
-                    else:
-                        candidate["lyrics"] = None
-                        candidate["status"] = "not found"
-                        print(f"  -> Lyrics not found on Genius")
-                except Exception as e:
-                    candidate["lyrics"] = None
-                    candidate["status"] = "not found"
-                    print(f"  -> Genius error: {str(e)}")
-                
-                time.sleep(1)
-        
 
+    yt = _ytmusic.get()
+    genius = _genius.get()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def process(candidate):
+        async with slots:
+            # Concurrent runs asking for the same track share a single lookup
+            found = await _lyrics_flight.ado(
+                candidate.get("song_id") or candidate["videoId"],
+                lambda: _alookup_lyrics(yt, genius, candidate["title"], candidate["artist"], candidate["videoId"])
+            )
+        candidate.update(found)
+
+    await asyncio.gather(*(process(candidate) for candidate in tracks))
+    return tracks
+
+
+async def _alookup_lyrics(yt, genius, title, artist, video_id):
+    """
+    Looks up the lyrics of one track, YTMusic first then Genius.
     
-        return tracks
+    Returns:
+        dict: lyrics, status and (when found) source fields for the track
+    """
+    # 1. Try YTMusic (Fast)
+    async with _ytmusic_rate:
+        found = await asyncio.to_thread(_lookup_ytmusic_lyrics, yt, title, video_id)
+    if found:
+        return found
 
+    # 2. Fallback to Genius (Reliable)
+    async with _genius_rate:
+        return await asyncio.to_thread(_lookup_genius_lyrics, genius, title, artist)
 
+
+def _lookup_ytmusic_lyrics(yt, title, video_id):
+    try:
+        print(f"Attempting YTMusic for: {title}")
+        watch_data = yt.get_watch_playlist(video_id)
+        if "lyrics" in watch_data and watch_data["lyrics"]:
+            lyrics_data = yt.get_lyrics(watch_data["lyrics"])
+            if lyrics_data and "lyrics" in lyrics_data:
+                print(f"  -> Found lyrics via YTMusic")
+                return {"lyrics": lyrics_data["lyrics"], "status": "found", "source": "ytmusic"}
+    except Exception as e:
+        print(f"  -> YTMusic error: {e}")
+    return None
+
+
+def _lookup_genius_lyrics(genius, title, artist):
+    try: 
+        print(f"Fallback to Genius for: {title}")
+        # Clean title to remove noise like "(Official Audio)"
+        clean_title = re.sub(r"[\(\[].*?(official|video|audio|lyrics|version|remaster|remaster version).*?[\)\]]", "", title, flags=re.IGNORECASE).strip()
+        
+        song = genius.search_song(clean_title, artist)
+        if song:
+            print(f"  -> Found lyrics via Genius (searched as '{clean_title}')")
+            return {"lyrics": song.lyrics, "status": "found", "source": "genius"}
+        print(f"  -> Lyrics not found on Genius")
+    except Exception as e:
+        print(f"  -> Genius error: {str(e)}")
+    return {"lyrics": None, "status": "not found"}
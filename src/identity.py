@@ -0,0 +1,206 @@
+"""
+Song Identity Module
+
+YouTube Music often returns the same song several times under different
+videoIds: official audio, clip, lyric video, remaster, "feat." variants...
+This module resolves such tracks to one canonical song id so that each song
+is fetched, analyzed and embedded only once.
+
+Canonicalization:
+1. Strip title decorations: "(Official Video)", "[Remastered 2011]",
+   "- Lyric Video", "| HD", ...
+2. Move featured artists ("feat. X", "ft. X", and "(with X)" when X is
+   credited in the artist field) out of the title and artist fields, and keep
+   the primary artist only (without a leading "The")
+3. Normalize case, accents and punctuation
+
+The id is a readable "artist::title" string, reused as the key of the lyrics
+lookups and of the catalog. It only depends on the (title, artist) pair, so it
+is the one stored.
+
+Within a run, candidates still spelled slightly differently are also merged by
+fuzzy matching within the same primary artist (see SongIdentityIndex.dedupe).
+Those merges are never persisted, and titles with different numbers ("Pt. 1"
+and "Pt. 2", "Symphony No. 5" and "No. 9") are never merged.
+"""
+
+import re
+import threading
+import unicodedata
+from difflib import SequenceMatcher
+
+# Words that mark a bracketed / trailing part of a title as decoration
+DECORATION_WORDS = (
+    r"official|video|audio|clip|lyrics?|lyric video|visuali[sz]er|version|remaster(?:ed)?|"
+    r"hd|hq|4k|explicit|clean|radio edit|mono|stereo|mv|paroles|vid[eé]o officielle|clip officiel"
+)
+
+_BRACKETED_DECORATION = re.compile(rf"[\(\[][^\)\]]*\b({DECORATION_WORDS})\b[^\)\]]*[\)\]]", re.IGNORECASE)
+_TRAILING_DECORATION = re.compile(rf"\s[-–|]\s[^-–|]*\b({DECORATION_WORDS})\b.*$", re.IGNORECASE)
+_BRACKETED_FEATURING = re.compile(r"[\(\[]\s*(?:feat\.?|ft\.?|featuring)\s+([^\)\]]+)[\)\]]", re.IGNORECASE)
+_BRACKETED_WITH = re.compile(r"[\(\[]\s*with\s+([^\)\]]+)[\)\]]", re.IGNORECASE)
+_TRAILING_FEATURING = re.compile(r"\s(?:feat\.?|ft\.?|featuring)\s+(.+)$", re.IGNORECASE)
+_ARTIST_SEPARATORS = re.compile(r"\s*(?:,|&|\s+x\s+|\s+feat\.?\s+|\s+ft\.?\s+|\s+featuring\s+)\s*", re.IGNORECASE)
+
+# Minimum title similarity (0-1) for two ids of the same artist to be merged
+FUZZY_TITLE_THRESHOLD = 0.9
+
+# Numbers and roman numerals (part, volume, opus numbers) that tell two titles apart
+_NUMBER_TOKEN = re.compile(r"^(?:\d+|(?=[ivxlc]+$)c{0,3}(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3}))$")
+
+
+def normalize_text(text):
+    """
+    Lowercases text, strips accents and punctuation and collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def split_artists(artist):
+    """
+    Splits an artist field into its individual artists.
+
+    Example:
+        "GIMS, La Mano 1.9" -> ["GIMS", "La Mano 1.9"]
+    """
+    return [a for a in _ARTIST_SEPARATORS.split(artist or "") if a.strip()]
+
+
+def clean_title(title, artist=None):
+    """
+    Removes decorations and featured artists from a song title.
+
+    "(with X)" is only a featured artist when X is credited in the artist
+    field: "Stay (With Me)" keeps its title.
+
+    Returns:
+        tuple: (clean_title, featured_artists)
+    """
+    title = title or ""
+    featured = []
+
+    title = _BRACKETED_DECORATION.sub("", title)
+    title = _TRAILING_DECORATION.sub("", title)
+
+    for pattern in (_BRACKETED_FEATURING, _TRAILING_FEATURING):
+        match = pattern.search(title)
+        if match:
+            featured += split_artists(match.group(1))
+            title = title[:match.start()] + title[match.end():]
+
+    match = _BRACKETED_WITH.search(title)
+    if match:
+        credited = {normalize_text(a) for a in split_artists(artist)}
+        guests = split_artists(match.group(1))
+        if guests and all(normalize_text(guest) in credited for guest in guests):
+            featured += guests
+            title = title[:match.start()] + title[match.end():]
+
+    return title.strip(" -–|"), featured
+
+
+def canonicalize(title, artist):
+    """
+    Canonicalizes a (title, artist) pair.
+
+    Returns:
+        dict: title, primary_artist and featured artists (all normalized)
+    """
+    base_title, featured = clean_title(title, artist)
+    artists = split_artists(artist)
+    primary = artists[0] if artists else (artist or "")
+    featured = artists[1:] + featured
+    return {
+        "title": normalize_text(base_title) or normalize_text(title),
+        "primary_artist": re.sub(r"^the ", "", normalize_text(primary)),
+        "featured": [normalize_text(a) for a in featured],
+    }
+
+
+def canonical_song_id(title, artist):
+    """
+    Returns the exact (non fuzzy) canonical id of a (title, artist) pair.
+    """
+    canon = canonicalize(title, artist)
+    return f"{canon['primary_artist']}::{canon['title']}"
+
+
+def number_tokens(title):
+    """
+    Returns the numbers and roman numerals of a normalized title.
+    """
+    return {token for token in title.split() if _NUMBER_TOKEN.match(token)}
+
+
+class SongIdentityIndex:
+    """
+    Registry of canonical song ids with fuzzy merging, for in-run deduplication.
+
+    Ids are bucketed by primary artist; a new title is merged into an existing
+    id of the same artist when their similarity reaches FUZZY_TITLE_THRESHOLD
+    and they contain the same numbers. The merged id depends on which title
+    was seen first, so it is never stored: tracks carry canonical_song_id.
+    """
+
+    def __init__(self, threshold=FUZZY_TITLE_THRESHOLD):
+        self.threshold = threshold
+        self._aliases = {}
+        self._titles_by_artist = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, title, artist):
+        """
+        Returns the in-run (fuzzy) song id of a (title, artist) pair, registering it if new.
+        """
+        exact_id = canonical_song_id(title, artist)
+        known = self._aliases.get(exact_id)
+        if known:
+            return known
+
+        primary, _, clean = exact_id.partition("::")
+        with self._lock:
+            song_id = exact_id
+            numbers = number_tokens(clean)
+            for other_title, other_id in self._titles_by_artist.get(primary, {}).items():
+                if number_tokens(other_title) == numbers and SequenceMatcher(None, clean, other_title).ratio() >= self.threshold:
+                    song_id = other_id
+                    break
+            else:
+                self._titles_by_artist.setdefault(primary, {})[clean] = exact_id
+            self._aliases[exact_id] = song_id
+        return song_id
+
+    def assign(self, tracks):
+        """
+        Sets track["song_id"] (the deterministic canonical_song_id) on every track.
+        """
+        for track in tracks:
+            if not track.get("song_id"):
+                track["song_id"] = canonical_song_id(track.get("title"), track.get("artist"))
+        return tracks
+
+    def dedupe(self, tracks):
+        """
+        Assigns canonical ids and keeps only the first track of each song,
+        versions merged by fuzzy matching included.
+
+        Returns:
+            tuple: (unique_tracks, duplicate_count)
+        """
+        self.assign(tracks)
+        seen = set()
+        unique = []
+        for track in tracks:
+            key = self.resolve(track.get("title"), track.get("artist"))
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(track)
+        return unique, len(tracks) - len(unique)
+
+
+# Process-wide index shared by every pipeline run and by the catalog
+song_identity = SongIdentityIndex()
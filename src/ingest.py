@@ -0,0 +1,291 @@
+"""
+Bulk Catalog Ingestion Module
+
+Builds or extends the catalog from a list of songs, unattended: a CSV or JSONL
+file of thousands of (title, artist) pairs and/or YouTube videoIds goes
+through lyrics, analysis, vibe text and embedding, and the results are
+published straight into the binary catalog (see src/catalog_store.py).
+
+Input rows may use the columns/keys title, artist and videoId (or video_id):
+- title + artist: the videoId is resolved with a YouTube Music search
+- videoId only: title and artist are read from YouTube Music
+- both: used as given, no lookup
+
+Guarantees:
+- Bounded parallelism: at most `concurrency` tracks are in flight, and every
+  API call goes through the process-wide rate limits (see src/config.py)
+- Checkpoint journal: each input row is appended to a JSONL journal as soon
+  as it is done (fsynced), whatever the outcome. A rerun skips every row
+  already in it, so an interrupted run resumes where it stopped
+- Cache reuse: songs already in the catalog, or met earlier in the same run
+  under another videoId or spelling (canonical song id, see src/identity.py),
+  skip every stage
+- Incremental publishing: every `publish_every` new songs, and at the end,
+  the current snapshot plus the new songs is published as a new snapshot
+  (rows copied file to file, k-NN graph extended, see append_snapshot).
+  Running apps pick it up in the background. Songs processed but not yet
+  published when a run stops are published by the next run, from the journal
+
+Usage:
+    python -m src.ingest songs.csv [--catalog data/catalog] [--journal path]
+                                   [--concurrency 8] [--publish-every 1000]
+                                   [--retry-failed]
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+
+from src.catalog import Catalog
+from src.catalog_store import CATALOG_DIR, append_snapshot
+from src.config import DATA_DIR, PIPELINE_CONCURRENCY
+from src.extraction import aget_radio_tracks, aresolve_seed
+from src.identity import canonical_song_id, song_identity
+from src.journal import TrackJournal, load_journal
+from src.pipeline import MusicPipeline
+
+JOURNAL_FILE = os.path.join(DATA_DIR, "ingest_journal.jsonl")
+
+# New songs accumulated before a snapshot is published
+PUBLISH_EVERY = 1000
+
+# Processed rows between two progress lines
+PROGRESS_EVERY = 100
+
+# Track fields written to the journal, enough to publish the song without recomputing it
+JOURNAL_FIELDS = ("title", "artist", "videoId", "song_id", "status", "source", "lyrics", "analysis", "vibe_text", "embedding")
+
+# Journal outcomes that are retried with --retry-failed
+RETRYABLE_OUTCOMES = ("failed", "not_found", "no_analysis")
+
+
+def read_inputs(path):
+    """
+    Reads the songs to ingest from a CSV (with a header row) or JSONL file.
+
+    Yields:
+        dict: title, artist and videoId of one row (missing values are None)
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.endswith(".jsonl") or path.endswith(".json"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            row = {str(k).strip().lower().replace("_", ""): (str(v).strip() if v is not None else "") for k, v in row.items()}
+            item = {
+                "title": row.get("title") or None,
+                "artist": row.get("artist") or None,
+                "videoId": row.get("videoid") or None,
+            }
+            if item["videoId"] or (item["title"] and item["artist"]):
+                yield item
+
+
+def input_key(item):
+    """
+    Journal key of an input row: its videoId, else its exact canonical song id.
+    """
+    return item["videoId"] or canonical_song_id(item["title"], item["artist"])
+
+
+async def aresolve_input(item):
+    """
+    Completes an input row into a track with title, artist and videoId.
+
+    Returns:
+        dict: The track, or None if YouTube Music has no match
+    """
+    if item["videoId"] and item["title"] and item["artist"]:
+        return dict(item)
+    if item["videoId"]:
+        tracks = await aget_radio_tracks(item["videoId"], limit=1)
+        if not tracks:
+            return None
+        return {"title": tracks[0]["title"], "artist": tracks[0]["artist"], "videoId": item["videoId"]}
+    video_id = await aresolve_seed(f"{item['title']} {item['artist']}", limit=1)
+    if not video_id:
+        return None
+    return {"title": item["title"], "artist": item["artist"], "videoId": video_id}
+
+
+class CatalogIngester:
+    """
+    Runs input rows through the pipeline stages and publishes the new songs.
+
+    Attributes:
+        root: Catalog directory
+        journal_path: Checkpoint journal file
+        concurrency: Maximum number of rows processed at the same time
+        publish_every: New songs accumulated before a snapshot is published
+        stats: Count of rows per outcome
+    """
+
+    def __init__(self, root=CATALOG_DIR, journal_path=JOURNAL_FILE, concurrency=PIPELINE_CONCURRENCY,
+                 publish_every=PUBLISH_EVERY, retry_failed=False):
+        self.root = root
+        self.journal_path = journal_path
+        self.concurrency = concurrency
+        self.publish_every = publish_every
+        self.retry_failed = retry_failed
+        self.stats = {}
+        self.pipeline = MusicPipeline(status_callback=lambda message: None)
+        self._pending = []
+        self._seen = set()
+        self._publish_lock = None
+
+    def _record(self, key, outcome, track=None):
+        self.stats[outcome] = self.stats.get(outcome, 0) + 1
+        self.journal.append(track or {}, key=key, outcome=outcome)
+
+    async def _process(self, item, key, analysis_slots):
+        try:
+            track = await aresolve_input(item)
+            if track is None:
+                self._record(key, "not_found")
+                return
+            song_identity.assign([track])
+
+            if track["song_id"] in self._seen or self.catalog.lookup(track) is not None:
+                self._record(key, "cached", {"song_id": track["song_id"], "videoId": track["videoId"]})
+                return
+            self._seen.add(track["song_id"])
+
+            await self.pipeline.aprocess_track(track, analysis_slots)
+        except Exception as e:
+            print(f"  Ingestion error for {key}: {e} - Erreur d'ingestion pour {key}: {e}")
+            self._record(key, "failed")
+            return
+
+        if track.get("embedding"):
+            self._record(key, "processed", track)
+            self._pending.append((key, track))
+            if len(self._pending) >= self.publish_every:
+                await self.publish()
+        else:
+            self._record(key, "no_lyrics" if track.get("status") != "found" else "no_analysis",
+                         {"song_id": track["song_id"], "videoId": track["videoId"], "status": track.get("status")})
+
+    async def publish(self):
+        """
+        Publishes the songs processed since the last publish as a new snapshot.
+
+        The embeddings and lyrics of the published songs are then dropped from
+        the journal, which only has to remember that their rows are done.
+        """
+        async with self._publish_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                manifest = await asyncio.to_thread(append_snapshot, [track for _, track in batch], self.root)
+            except Exception as e:
+                self._pending = batch + self._pending
+                print(f"❌ Publishing failed, will retry: {e} - Échec de la publication, nouvel essai plus tard: {e}")
+                return
+
+            published = {key for key, _ in batch}
+            self.journal.compact(
+                lambda entry: {"key": entry["key"], "outcome": "published", "song_id": entry.get("song_id"), "videoId": entry.get("videoId")}
+                if entry.get("key") in published and entry.get("outcome") == "processed" else entry
+            )
+            await asyncio.to_thread(self.catalog.refresh)
+            print(f"📦 Snapshot {manifest['version']} published: {manifest['count']} songs (+{len(batch)}) - "
+                  f"Snapshot {manifest['version']} publié : {manifest['count']} chansons (+{len(batch)})")
+
+    def _progress(self, done, total_hint, started):
+        elapsed = time.time() - started
+        rate = done / elapsed if elapsed else 0.0
+        remaining = f", ~{(total_hint - done) / rate / 3600:.1f} h left" if rate and total_hint else ""
+        counts = ", ".join(f"{outcome} {count}" for outcome, count in sorted(self.stats.items()))
+        print(f"⏱️  {done} rows in {elapsed / 60:.1f} min ({rate * 3600:.0f}/h{remaining}) - {counts}")
+
+    async def arun(self, input_path):
+        """
+        Ingests every row of an input file not already in the journal.
+
+        Returns:
+            dict: Count of rows per outcome for this run
+        """
+        self._publish_lock = asyncio.Lock()
+        self.catalog = Catalog.load(self.root)
+        done = load_journal(self.journal_path, key="key")
+        self.journal = TrackJournal(self.journal_path, fields=JOURNAL_FIELDS, durable=True)
+
+        # Songs processed by an earlier run that stopped before publishing them
+        for key, entry in done.items():
+            if entry.get("outcome") == "processed" and entry.get("embedding"):
+                self._pending.append((key, entry))
+                self._seen.add(entry.get("song_id"))
+        if self._pending:
+            print(f"📓 {len(self._pending)} songs from the journal still to publish - {len(self._pending)} chansons du journal à publier")
+            await self.publish()
+
+        skip = {key for key, entry in done.items() if not (self.retry_failed and entry.get("outcome") in RETRYABLE_OUTCOMES)}
+        total = sum(1 for item in read_inputs(input_path) if input_key(item) not in skip)
+        print(f"🚀 {total} rows to ingest, {len(skip)} already in the journal - {total} lignes à ingérer, {len(skip)} déjà dans le journal")
+
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        analysis_slots = asyncio.Semaphore(self.concurrency)
+        started = time.time()
+        processed = 0
+
+        async def worker():
+            nonlocal processed
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                await self._process(item, input_key(item), analysis_slots)
+                processed += 1
+                if processed % PROGRESS_EVERY == 0:
+                    self._progress(processed, total, started)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            queued = set()
+            for item in read_inputs(input_path):
+                key = input_key(item)
+                if key in skip or key in queued:
+                    continue
+                queued.add(key)
+                await queue.put(item)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            await self.publish()
+        finally:
+            for task in workers:
+                task.cancel()
+            self.journal.close()
+
+        self._progress(processed, 0, started)
+        return self.stats
+
+    def run(self, input_path):
+        """
+        Blocking wrapper around arun().
+        """
+        return asyncio.run(self.arun(input_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest songs into the VibeReco catalog")
+    parser.add_argument("input", help="CSV or JSONL file with title/artist and/or videoId columns")
+    parser.add_argument("--catalog", default=CATALOG_DIR)
+    parser.add_argument("--journal", default=JOURNAL_FILE)
+    parser.add_argument("--concurrency", type=int, default=PIPELINE_CONCURRENCY)
+    parser.add_argument("--publish-every", type=int, default=PUBLISH_EVERY)
+    parser.add_argument("--retry-failed", action="store_true", help="Retry rows that failed, were not found or got no analysis in a previous run")
+    args = parser.parse_args()
+
+    ingester = CatalogIngester(args.catalog, args.journal, args.concurrency, args.publish_every, args.retry_failed)
+    stats = ingester.run(args.input)
+    print(f"✅ Ingestion complete - Ingestion terminée: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Track Journal Module
+
+Append-only JSONL checkpoint of processed tracks, one line per track, written
+as soon as the track is done. Long batch jobs (A/B playlist generation, bulk
+catalog ingestion) reload it on start and skip everything already in it, so a
+crashed or interrupted run resumes where it stopped.
+
+A line cut short by a crash is ignored on load; the track it described is
+simply processed again.
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+def _native(value):
+    """Converts numpy values (possibly nested) to JSON-serializable Python values."""
+    if isinstance(value, dict):
+        return {k: _native(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_native(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def load_journal(path, key="song_id"):
+    """
+    Loads a journal written by TrackJournal.
+
+    Args:
+        path: Journal file
+        key: Entry field used as the dictionary key; a later line wins
+
+    Returns:
+        dict: {entry[key]: entry}, empty if the file does not exist
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get(key) is not None:
+                entries[entry[key]] = entry
+    return entries
+
+
+class TrackJournal:
+    """
+    Append-only journal of processed tracks.
+
+    Every entry is flushed right away; with durable=True it is also fsynced,
+    so it survives a power loss and not only a process crash.
+
+    Attributes:
+        path: Journal file
+        fields: Track fields written per entry (None writes the whole track)
+    """
+
+    def __init__(self, path, fields=None, durable=False):
+        self.path = path
+        self.fields = fields
+        self.durable = durable
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def append(self, track, **extra):
+        """
+        Writes one track, plus extra fields (e.g. the input key it came from).
+        """
+        entry = {field: track.get(field) for field in self.fields} if self.fields else dict(track)
+        entry.update(extra)
+        self._file.write(json.dumps(_native(entry), ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.durable:
+            os.fsync(self._file.fileno())
+
+    def compact(self, transform):
+        """
+        Rewrites the journal, replacing every entry by transform(entry).
+
+        Used to drop bulky fields once they are safely stored elsewhere;
+        transform may return None to drop the entry. The new file replaces the
+        old one atomically.
+        """
+        self._file.close()
+        tmp_path = self.path + ".tmp"
+        with open(self.path, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                try:
+                    entry = transform(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+                if entry is not None:
+                    dst.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,192 @@
+"""
+k-NN Graph Module
+
+Precomputes the top-K nearest neighbors of every catalog song, so that
+catalog-mode similarity ("Find similar vibes", /similar, "more like this"
+pages) is a row read instead of a FAISS search.
+
+The graph is computed with blocked matrix multiplies on L2-normalized
+embeddings (cosine similarity, same scores as the FAISS IndexFlatIP), one
+block of rows per worker thread; numpy releases the GIL inside the products,
+so all cores are used. It is stored as two compact arrays:
+
+    knn_indices.npy    int32   (n_songs x K)  neighbor rows, best first
+    knn_scores.npy     float16 (n_songs x K)  cosine similarity of each neighbor
+
+A song is never its own neighbor. When songs are appended to the catalog,
+update_knn_graph() only scores the new rows against everything and the old
+rows against the new ones, instead of recomputing the whole graph.
+
+Usage:
+    python -m src.knn_graph [catalog_dir]    builds the graph of the current snapshot if missing
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.config import CATALOG_KNN_K
+
+KNN_INDICES_FILE = "knn_indices.npy"
+KNN_SCORES_FILE = "knn_scores.npy"
+
+# Upper bound on the size of one block of scores (bytes), per worker
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _normalize(embeddings):
+    vectors = np.array(embeddings, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores, k):
+    """
+    Returns the (columns, scores) of the k highest scores of each row, best first.
+    """
+    if k <= 0:
+        empty = np.zeros((scores.shape[0], 0))
+        return empty.astype("int64"), empty.astype("float32")
+    columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-top, axis=1, kind="stable")
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+def _blocked_top_k(queries, corpus, k, self_offset=None, workers=None):
+    """
+    Top-k corpus rows of every query row, computed block by block in parallel.
+
+    Args:
+        queries: (m x d) normalized vectors
+        corpus: (n x d) normalized vectors
+        k: Number of neighbors per query
+        self_offset: If set, query row i is corpus row self_offset + i and is excluded
+        workers: Number of threads (default: all cores)
+
+    Returns:
+        Tuple (indices int32 (m x k), scores float32 (m x k))
+    """
+    m = len(queries)
+    indices = np.zeros((m, k), dtype="int32")
+    scores = np.zeros((m, k), dtype="float32")
+    if m == 0 or k == 0:
+        return indices, scores
+
+    rows = max(1, min(m, BLOCK_BYTES // (4 * max(1, len(corpus)))))
+
+    def block(start):
+        stop = min(start + rows, m)
+        block_scores = queries[start:stop] @ corpus.T
+        if self_offset is not None:
+            local = np.arange(stop - start)
+            block_scores[local, self_offset + start + local] = -np.inf
+        columns, top = _top_k(block_scores, k)
+        indices[start:stop] = columns
+        scores[start:stop] = top
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        list(executor.map(block, range(0, m, rows)))
+    return indices, scores
+
+
+def compute_knn_graph(embeddings, k=CATALOG_KNN_K, workers=None, normalized=False):
+    """
+    Computes the k-NN graph of a whole embedding matrix.
+
+    Args:
+        embeddings: (n_songs x dim) matrix (may be memory-mapped)
+        k: Neighbors kept per song (capped at n_songs - 1)
+        workers: Number of threads (default: all cores)
+        normalized: True if the rows are already L2-normalized (used as-is, no copy)
+
+    Returns:
+        Tuple (indices int32 (n x k), scores float16 (n x k))
+    """
+    vectors = embeddings if normalized else _normalize(embeddings)
+    k = max(0, min(k, len(vectors) - 1))
+    indices, scores = _blocked_top_k(vectors, vectors, k, self_offset=0, workers=workers)
+    return indices, scores.astype("float16")
+
+
+def update_knn_graph(indices, scores, embeddings, k=CATALOG_KNN_K, workers=None, normalized=False):
+    """
+    Extends a k-NN graph after songs were appended to the catalog.
+
+    Args:
+        indices: Existing (n_old x k_old) neighbor rows
+        scores: Existing (n_old x k_old) neighbor scores
+        embeddings: Full (n_songs x dim) matrix; its first n_old rows are the songs already in the graph
+        k: Neighbors kept per song (capped at n_songs - 1)
+        workers: Number of threads (default: all cores)
+        normalized: True if the rows are already L2-normalized (used as-is, no copy)
+
+    Returns:
+        Tuple (indices int32 (n x k), scores float16 (n x k))
+    """
+    n_old = len(indices)
+    vectors = embeddings if normalized else _normalize(embeddings)
+    k = max(0, min(k, len(vectors) - 1))
+
+    # An old graph narrower than needed does not hold enough candidates: rebuild
+    if indices.shape[1] < min(k, n_old - 1):
+        return compute_knn_graph(embeddings, k=k, workers=workers, normalized=normalized)
+
+    # New songs against the whole catalog
+    new_indices, new_scores = _blocked_top_k(vectors[n_old:], vectors, k, self_offset=n_old, workers=workers)
+
+    # Old songs against the new songs only, merged with their current neighbors
+    added_indices, added_scores = _blocked_top_k(vectors[:n_old], vectors[n_old:], min(k, len(vectors) - n_old), workers=workers)
+    candidates = np.concatenate([np.asarray(indices, dtype="int32"), added_indices + n_old], axis=1)
+    candidate_scores = np.concatenate([np.asarray(scores, dtype="float32"), added_scores], axis=1)
+    positions, old_scores = _top_k(candidate_scores, k)
+    old_indices = np.take_along_axis(candidates, positions, axis=1)
+
+    return (
+        np.concatenate([old_indices, new_indices]).astype("int32"),
+        np.concatenate([old_scores, new_scores]).astype("float16"),
+    )
+
+
+def save_knn_graph(indices, scores, directory):
+    """
+    Writes the graph arrays into a catalog snapshot directory (temporary file then rename).
+    """
+    for name, array in ((KNN_INDICES_FILE, indices), (KNN_SCORES_FILE, scores)):
+        tmp_path = os.path.join(directory, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+
+def load_knn_graph(directory):
+    """
+    Memory-maps the graph arrays of a catalog snapshot.
+
+    Returns:
+        Tuple (indices, scores), or None if the snapshot has no graph
+    """
+    indices_path = os.path.join(directory, KNN_INDICES_FILE)
+    scores_path = os.path.join(directory, KNN_SCORES_FILE)
+    if not (os.path.exists(indices_path) and os.path.exists(scores_path)):
+        return None
+    return np.load(indices_path, mmap_mode="r"), np.load(scores_path, mmap_mode="r")
+
+
+if __name__ == "__main__":
+    from src.catalog_store import CATALOG_DIR, CatalogStore
+
+    store = CatalogStore.open(sys.argv[1] if len(sys.argv) > 1 else CATALOG_DIR)
+    if store is None:
+        print("No catalog found")
+        sys.exit(1)
+    if store.knn is not None:
+        print(f"Snapshot {store.version} already has a k-NN graph")
+        sys.exit(0)
+
+    indices, scores = compute_knn_graph(store.embeddings)
+    save_knn_graph(indices, scores, store.path)
+    print(f"✅ k-NN graph of snapshot {store.version}: {indices.shape[0]} songs x {indices.shape[1]} neighbors")
@@ -0,0 +1,263 @@
+"""
+Key-Value Store Module
+
+Minimal Redis-compatible client used by the A/B vote pipeline, with three
+interchangeable backends:
+
+- memory://                 in-process store (tests, local runs)
+- file://path/to/kv.jsonl   in-process store persisted as an append-only log
+                            of write batches, replayed on open
+- https://...               Upstash / Vercel KV REST API (token from
+                            KV_REST_API_TOKEN)
+
+Only the commands used by the vote pipeline are supported (GET, SET, DEL,
+INCRBY, HINCRBY, HGET, HGETALL, SADD, SISMEMBER, LPUSH, LRANGE, LLEN, EVAL), with
+Redis semantics and Redis reply shapes (strings, integers, flat HGETALL lists),
+so code written against one backend runs unchanged against the others.
+
+EVAL runs a Lua script on Redis. The local stores cannot run Lua: they run the
+Python equivalent registered for that script with register_script(), under
+their lock, so the script is just as atomic there.
+
+execute() sends several commands in one round trip. With atomic=True they run
+as one transaction (MULTI/EXEC on Redis, under a lock locally), which is what
+makes batched vote writes all-or-nothing.
+"""
+
+import json
+import os
+import threading
+import urllib.request
+from urllib.parse import urlparse
+
+# Commands that modify the store (logged by FileKV)
+WRITE_COMMANDS = {"SET", "DEL", "INCRBY", "HINCRBY", "SADD", "LPUSH"}
+
+# Python equivalents of the Lua scripts, run by the local stores: {script: function}
+_LOCAL_SCRIPTS = {}
+
+
+class KVError(Exception):
+    """A command was rejected by the store."""
+
+
+def register_script(script, function):
+    """
+    Makes a Lua script runnable with EVAL on the local stores.
+
+    Args:
+        script: Lua source, exactly as passed to EVAL
+        function: function(run, keys, args) doing what the script does, where
+                  run(command) applies one command (a list like ["SADD", key, member])
+                  and returns its reply
+    """
+    _LOCAL_SCRIPTS[script] = function
+
+
+class MemoryKV:
+    """
+    In-process store with Redis command semantics. Thread-safe.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def execute(self, commands, atomic=True):
+        """
+        Runs several commands in one call.
+
+        Args:
+            commands: List of commands, each a list like ["HINCRBY", key, field, 1]
+            atomic: If True, no other caller sees a state between two commands
+
+        Returns:
+            list: One reply per command
+        """
+        with self._lock:
+            return [self._apply([str(part) for part in command]) for command in commands]
+
+    def command(self, *args):
+        """
+        Runs a single command and returns its reply.
+        """
+        return self.execute([list(args)])[0]
+
+    def _typed(self, key, kind):
+        value = self._data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise KVError(f"WRONGTYPE Operation against a key holding the wrong kind of value: {key}")
+        return value
+
+    def _apply(self, command):
+        name, args = command[0].upper(), command[1:]
+        if name == "GET":
+            return self._typed(args[0], str)
+        if name == "SET":
+            self._data[args[0]] = args[1]
+            return "OK"
+        if name == "DEL":
+            return sum(self._data.pop(key, None) is not None for key in args)
+        if name == "INCRBY":
+            value = int(self._typed(args[0], str) or 0) + int(args[1])
+            self._data[args[0]] = str(value)
+            return value
+        if name == "HINCRBY":
+            fields = self._typed(args[0], dict)
+            if fields is None:
+                fields = self._data[args[0]] = {}
+            fields[args[1]] = str(int(fields.get(args[1], 0)) + int(args[2]))
+            return int(fields[args[1]])
+        if name == "HGET":
+            return (self._typed(args[0], dict) or {}).get(args[1])
+        if name == "HGETALL":
+            return [part for item in (self._typed(args[0], dict) or {}).items() for part in item]
+        if name == "SADD":
+            members = self._typed(args[0], set)
+            if members is None:
+                members = self._data[args[0]] = set()
+            added = len(set(args[1:]) - members)
+            members.update(args[1:])
+            return added
+        if name == "SISMEMBER":
+            return int(args[1] in (self._typed(args[0], set) or set()))
+        if name == "LPUSH":
+            items = self._typed(args[0], list)
+            if items is None:
+                items = self._data[args[0]] = []
+            # Redis pushes the values one after the other, so the last one ends up first
+            items[:0] = reversed(args[1:])
+            return len(items)
+        if name == "LRANGE":
+            items = self._typed(args[0], list) or []
+            start, stop = int(args[1]), int(args[2])
+            start = max(len(items) + start, 0) if start < 0 else start
+            stop = len(items) + stop if stop < 0 else stop
+            return items[start:stop + 1]
+        if name == "LLEN":
+            return len(self._typed(args[0], list) or [])
+        if name == "EVAL":
+            function = _LOCAL_SCRIPTS.get(command[1])
+            if function is None:
+                raise KVError("Script not registered for the local store (see register_script)")
+            count = int(args[1])
+            return function(self._apply, args[2:2 + count], args[2 + count:])
+        raise KVError(f"Unsupported command: {name}")
+
+
+class FileKV(MemoryKV):
+    """
+    MemoryKV persisted as an append-only JSONL log of write batches.
+
+    Each execute() containing writes appends one line and fsyncs it, so a
+    micro-batch of votes costs one disk sync. The log is replayed on open; a
+    line cut short by a crash (an unacknowledged batch) is ignored.
+
+    Attributes:
+        path: Log file
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._writes = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        batch = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    for command in batch:
+                        self._apply(command)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def execute(self, commands, atomic=True):
+        commands = [[str(part) for part in command] for command in commands]
+        with self._lock:
+            # Writes are collected as applied, so those made by a script are logged too
+            self._writes = writes = []
+            try:
+                replies = [self._apply(command) for command in commands]
+            finally:
+                self._writes = None
+            if writes:
+                self._file.write(json.dumps(writes, ensure_ascii=False) + "\n")
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            return replies
+
+    def _apply(self, command):
+        reply = super()._apply(command)
+        if self._writes is not None and command[0].upper() in WRITE_COMMANDS:
+            self._writes.append(command)
+        return reply
+
+    def close(self):
+        self._file.close()
+
+
+class RestKV:
+    """
+    Upstash / Vercel KV REST client.
+
+    Attributes:
+        url: REST endpoint (KV_REST_API_URL)
+    """
+
+    def __init__(self, url, token, timeout=10):
+        self.url = url.rstrip("/")
+        self._token = token
+        self.timeout = timeout
+
+    def execute(self, commands, atomic=True):
+        """
+        Sends the commands in one request (/multi-exec if atomic, else /pipeline).
+        """
+        body = json.dumps([[str(part) for part in command] for command in commands]).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.url}/{'multi-exec' if atomic else 'pipeline'}",
+            data=body,
+            headers={"Authorization": f"Bearer {self._token}", "Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            replies = json.loads(response.read().decode("utf-8"))
+        if isinstance(replies, dict):
+            raise KVError(replies.get("error", "Unknown KV error"))
+        errors = [reply["error"] for reply in replies if "error" in reply]
+        if errors:
+            raise KVError("; ".join(errors))
+        return [reply.get("result") for reply in replies]
+
+    def command(self, *args):
+        return self.execute([list(args)], atomic=False)[0]
+
+
+def open_kv(url=None, token=None):
+    """
+    Opens a store from its URL.
+
+    Args:
+        url: "memory://", "file://<path>" or an https REST endpoint
+             (default: KV_REST_API_URL, else memory://)
+        token: REST token (default: KV_REST_API_TOKEN)
+
+    Returns:
+        MemoryKV, FileKV or RestKV
+    """
+    url = url or os.getenv("KV_REST_API_URL") or "memory://"
+    scheme = urlparse(url).scheme
+    if scheme == "memory":
+        return MemoryKV()
+    if scheme == "file":
+        return FileKV(url[len("file://"):])
+    if scheme in ("http", "https"):
+        token = token or os.getenv("KV_REST_API_TOKEN")
+        if not token:
+            raise ValueError("KV_REST_API_TOKEN is required for a REST KV store")
+        return RestKV(url, token)
+    raise ValueError(f"Unsupported KV URL: {url}")
@@ -0,0 +1,68 @@
+"""
+Memory Reporting Module
+
+Reports how much of the process memory is private and how much is shared with
+other processes (e.g. memory-mapped catalog files opened by several app
+workers). Reads /proc on Linux; elsewhere only the peak RSS is available, and
+nothing on platforms without the resource module (Windows).
+"""
+
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def memory_usage():
+    """
+    Returns the memory usage of the current process, in MB.
+
+    Returns:
+        dict: rss (resident), pss (proportional share), shared and private
+              sizes; each is None when not available
+    """
+    path = "/proc/self/smaps_rollup"
+    if os.path.exists(path):
+        values = {}
+        with open(path, "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in _SMAPS_FIELDS:
+                    values[key] = int(rest.split()[0]) / 1024
+        return {
+            "rss": values.get("Rss", 0.0),
+            "pss": values.get("Pss", 0.0),
+            "shared": values.get("Shared_Clean", 0.0) + values.get("Shared_Dirty", 0.0),
+            "private": values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0),
+        }
+
+    if os.path.exists("/proc/self/statm"):
+        page_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        with open("/proc/self/statm", "r") as f:
+            _, resident, shared = (int(v) for v in f.read().split()[:3])
+        return {"rss": resident * page_mb, "pss": None, "shared": shared * page_mb, "private": (resident - shared) * page_mb}
+
+    if resource is None:
+        return {"rss": None, "pss": None, "shared": None, "private": None}
+
+    # macOS reports bytes, Linux kilobytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return {"rss": peak_mb, "pss": None, "shared": None, "private": None}
+
+
+def format_memory_usage(usage=None):
+    """
+    Formats memory_usage() as a one-line summary.
+    """
+    usage = usage or memory_usage()
+    parts = [f"RSS {usage['rss']:.1f} MB"] if usage.get("rss") is not None else []
+    for key in ("shared", "private", "pss"):
+        if usage.get(key) is not None:
+            parts.append(f"{key} {usage[key]:.1f} MB")
+    return " | ".join(parts) or "memory usage not available"
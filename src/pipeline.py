@@ -8,13 +8,37 @@ This module orchestrates the complete music recommendation workflow by integrati
 - OpenAI embeddings for vector representation
 - FAISS for similarity search
 
+Finished results are memoized in the shared result cache (see src/cache.py), and
+concurrent identical runs are coalesced into one (see src/singleflight.py).
+MusicPipeline.arun_batch processes many seeds together, analyzing each song
+shared by several seeds only once.
+
+The pipeline is implemented with asyncio (MusicPipeline.arun), so one process
+can serve many concurrent queries from a single event loop; MusicPipeline.run
+is a blocking wrapper around it.
+
 The MusicPipeline class provides a unified interface for the entire process.
 """
 
+import asyncio
+import contextvars
 import numpy as np
-from src.extraction import get_youtube_recommendations, fetch_lyrics
-from src.analysis import analyze_emotional_profile, generate_vibe_text
-from src.recommendation import generate_embedding, build_faiss_index, search_similar_songs
+from src.aio import run_sync
+from src.cache import result_cache
+from src.catalog import REUSED_FIELDS, get_catalog
+from src.config import PIPELINE_CONCURRENCY
+from src.identity import song_identity
+from src.extraction import aresolve_seed, aget_radio_tracks, afetch_lyrics
+from src.analysis import aanalyze_emotional_profile, generate_vibe_text
+from src.recommendation import agenerate_embedding, build_faiss_index, search_similar_songs
+from src.singleflight import SingleFlight
+
+
+# Coalesces concurrent runs for the same seed and parameters
+_pipeline_flight = SingleFlight()
+
+# Flight key of the run executing in the current task (None outside a run)
+_current_flight = contextvars.ContextVar("current_flight", default=None)
 
 
 class MusicPipeline:
@@ -41,20 +65,32 @@ class MusicPipeline:
         """
         Log a message using the status callback if available.
         
+        While a run is in flight, the message is published to every caller
+        attached to that run (see src/singleflight.py).
+        
         Args:
             message: String message to log
         """
+        flight_key = _current_flight.get()
+        if flight_key is not None:
+            _pipeline_flight.publish(flight_key, message)
+        else:
+            self._emit(message)
+    
+    def _emit(self, message):
         if self.status_callback:
             self.status_callback(message)
         else:
             print(message)
     
-    def run(self, query, limit=10, return_youtube_tracks=False):
+    def run(self, query, limit=10, return_youtube_tracks=False, use_cache=True):
         """
         Execute the complete music recommendation pipeline.
         
         This method performs the following steps:
         1. Search for songs on YouTube Music based on the query
+           (tracks already in the analyzed catalog reuse their stored analysis
+           and embedding and skip steps 2 to 5)
         2. Fetch lyrics for each song from Genius
         3. Analyze lyrics using AI to extract emotional/semantic profiles
         4. Generate vibe text descriptions from the analysis
@@ -62,10 +98,16 @@ class MusicPipeline:
         6. Build a FAISS index for similarity search
         7. Find and return similar songs
         
+        Successful results are kept in the process-wide result cache, keyed by
+        the resolved seed videoId, the limit and the model versions. A normalized
+        form of the query is remembered too, so repeated searches skip even the
+        YouTube Music lookup.
+        
         Args:
             query: Search query string (song title, artist, or combination)
             limit: Maximum number of candidate songs to retrieve (default: 10)
             return_youtube_tracks: If True, returns YouTube tracks as intermediate result
+            use_cache: If False, always recomputes (the fresh result still refreshes the cache)
             
         Returns:
             If return_youtube_tracks is False:
@@ -74,36 +116,224 @@ class MusicPipeline:
                     - distances: Numpy array of similarity scores
                     - indices: Numpy array of song indices in the tracks list
             If return_youtube_tracks is True:
-                dict: Contains 'youtube_tracks', 'final_tracks', 'distances', 'indices'
+                dict: Contains 'youtube_tracks', 'tracks_with_lyrics', 'final_tracks', 'distances', 'indices'
             None values if the pipeline fails at any step
         """
+        return run_sync(self.arun(query, limit, return_youtube_tracks, use_cache))
+    
+    async def arun(self, query, limit=10, return_youtube_tracks=False, use_cache=True):
+        """
+        Async counterpart of run(), with the same arguments and return values.
+        
+        Per-track work (lyrics, analysis, embeddings) runs concurrently. The run
+        can be cancelled cooperatively by cancelling the awaiting task; callers
+        coalesced onto a cancelled run start a fresh one.
+        """
+        # Cheap pre-key: a query we have already resolved gives us the seed directly
+        seed_id = result_cache.lookup_seed(query)
+        if seed_id and use_cache:
+            cached = result_cache.get(seed_id, limit)
+            if cached:
+                self.log("Result served from cache - Résultat servi depuis le cache")
+                return self._format_result(cached, return_youtube_tracks)
         
         # Step 1: Get YouTube Music recommendations
         self.log("Searching for songs on YouTube Music... - Recherche de chansons sur YouTube Music...")
-        tracks = get_youtube_recommendations(query, limit=limit)
+        if not seed_id:
+            seed_id = await aresolve_seed(query, limit=limit)
         
-        if not tracks:
+        if not seed_id:
             self.log("No songs found on YouTube Music. - Aucune chanson trouvée sur YouTube Music.")
-            if return_youtube_tracks:
-                return {"youtube_tracks": None, "final_tracks": None, "distances": None, "indices": None}
-            return None, None, None
+            return self._format_result(self._empty_result(), return_youtube_tracks)
         
-        # Store YouTube tracks for intermediate display
-        youtube_tracks = tracks.copy()
+        result_cache.remember_seed(query, seed_id)
         
-        self.log(f"{len(tracks)} songs found on YouTube Music - {len(tracks)} chansons trouvées sur YouTube Music")
+        if use_cache:
+            cached = result_cache.get(seed_id, limit)
+            if cached:
+                self.log("Result served from cache - Résultat servi depuis le cache")
+                return self._format_result(cached, return_youtube_tracks)
         
-        # Add YouTube rank (original order from YouTube Music)
-        for i, track in enumerate(tracks):
-            track['youtube_rank'] = i + 1
+        # Concurrent callers for the same seed and parameters share one run
+        flight_key = result_cache.result_key(seed_id, limit)
+        if _pipeline_flight.in_flight(flight_key):
+            self.log("Identical search already running, joining it... - Recherche identique déjà en cours, on la rejoint...")
         
-        # Step 2: Fetch lyrics from Genius
-        self.log("Fetching lyrics via Genius API... - Récupération des paroles via Genius API...")
-        tracks = fetch_lyrics(tracks)
+        async def compute():
+            # A run for this key may have completed between our lookup and now
+            cached = result_cache.get(seed_id, limit) if use_cache else None
+            if cached:
+                return cached
+            token = _current_flight.set(flight_key)
+            try:
+                result = await self._arun_from_seed(seed_id, limit)
+            finally:
+                _current_flight.reset(token)
+            if result["final_tracks"]:
+                result_cache.put(seed_id, limit, result)
+            return result
         
-        if not tracks:
-            self.log("Failed to fetch lyrics. - Échec de la récupération des paroles.")
-            return None, None, None
+        result = await _pipeline_flight.ado(flight_key, compute, on_progress=self._emit)
+        
+        return self._format_result(result, return_youtube_tracks)
+    
+    def run_batch(self, queries, limit=10, known=None, on_track_done=None):
+        """
+        Blocking wrapper around arun_batch().
+        """
+        return run_sync(self.arun_batch(queries, limit, known, on_track_done))
+    
+    async def arun_batch(self, queries, limit=10, known=None, on_track_done=None, concurrency=PIPELINE_CONCURRENCY):
+        """
+        Run the pipeline for several queries at once, sharing the per-track work.
+        
+        Seeds are resolved and their radios fetched concurrently. The candidates
+        of all seeds are then deduplicated by canonical song id, so a track that
+        appears in several radios is fetched, analyzed and embedded only once.
+        Each remaining track goes through lyrics, analysis, vibe text and
+        embedding on its own, so one slow track never holds back the others.
+        All API calls share the process-wide rate limits (see src/config.py).
+        
+        Args:
+            queries: List of search query strings
+            limit: Maximum number of candidate songs per seed
+            known: Optional dict {song_id: track fields} of previously processed
+                   tracks (e.g. a resume journal); these skip every stage
+            on_track_done: Optional callback(track) called as soon as a track
+                           has been processed, whatever the outcome
+            concurrency: Maximum number of tracks processed at the same time
+            
+        Returns:
+            list: One result dict per query, in order, shaped like
+                  arun(..., return_youtube_tracks=True). A seed that fails
+                  (search or radio error) gets an empty result; the other
+                  seeds are still processed
+        """
+        known = known or {}
+        
+        async def collect(query):
+            try:
+                seed_id = result_cache.lookup_seed(query) or await aresolve_seed(query, limit=limit)
+                if not seed_id:
+                    self.log(f"No songs found on YouTube Music for '{query}'. - Aucune chanson trouvée sur YouTube Music pour '{query}'.")
+                    return None, None
+                result_cache.remember_seed(query, seed_id)
+                return seed_id, await self._acollect_radio(seed_id, limit)
+            except Exception as e:
+                self.log(f"❌ Seed '{query}' failed: {str(e)} - Échec du seed '{query}' : {str(e)}")
+                return None, None
+        
+        collected = await asyncio.gather(*(collect(query) for query in queries))
+        
+        # One shared copy of each song across all seeds
+        shared = {}
+        for _, radio in collected:
+            for track in (radio[1] if radio else []):
+                shared.setdefault(track["song_id"], dict(track))
+        
+        for song_id, track in shared.items():
+            if song_id in known:
+                track.update(known[song_id])
+        catalog = get_catalog()
+        candidates = [t for song_id, t in shared.items() if song_id not in known]
+        known_count = catalog.apply(candidates) + len(shared) - len(candidates)
+        pending = [t for t in candidates if not t.get("from_catalog")]
+        self.log(f"{len(shared)} unique songs across {len(queries)} seeds, {known_count} already processed - "
+                 f"{len(shared)} chansons uniques pour {len(queries)} seeds, {known_count} déjà traitées")
+        
+        slots = asyncio.Semaphore(concurrency)
+        analysis_slots = asyncio.Semaphore(concurrency)
+        
+        async def process(track):
+            async with slots:
+                await self.aprocess_track(track, analysis_slots)
+            if track.get("embedding"):
+                catalog.remember([track])
+            if on_track_done:
+                on_track_done(track)
+        
+        await asyncio.gather(*(process(track) for track in pending))
+        
+        results = []
+        for seed_id, radio in collected:
+            if not radio:
+                results.append(self._empty_result())
+                continue
+            youtube_tracks, tracks = radio
+            for track in tracks:
+                for field in REUSED_FIELDS:
+                    if field in shared[track["song_id"]]:
+                        track[field] = shared[track["song_id"]][field]
+            try:
+                result = self._rank_tracks(tracks, youtube_tracks, tracks.copy())
+            except Exception as e:
+                self.log(f"❌ Ranking failed for seed {seed_id}: {str(e)} - Échec du classement du seed {seed_id} : {str(e)}")
+                results.append(self._empty_result(youtube_tracks))
+                continue
+            if result["final_tracks"]:
+                result_cache.put(seed_id, limit, result)
+            results.append(result)
+        return results
+    
+    async def aprocess_track(self, track, analysis_slots=None):
+        """
+        Run one track through lyrics, analysis, vibe text and embedding.
+        
+        The track dictionary is updated in place; a failed stage leaves the
+        later fields unset (no analysis means no embedding).
+        
+        Args:
+            track: Dict with title, artist and videoId
+            analysis_slots: Optional semaphore bounding concurrent LLM calls
+        """
+        await afetch_lyrics([track])
+        await self._analyze_track(track, analysis_slots or asyncio.Semaphore(1))
+        if track.get("analysis"):
+            try:
+                generate_vibe_text([track])
+                await agenerate_embedding([track])
+            except Exception as e:
+                self.log(f"  Embedding error for '{track['title']}': {str(e)} - Erreur d'embedding pour '{track['title']}': {str(e)}")
+    
+    @staticmethod
+    def _empty_result(youtube_tracks=None):
+        return {"youtube_tracks": youtube_tracks, "final_tracks": None, "distances": None, "indices": None}
+    
+    @staticmethod
+    def _format_result(result, return_youtube_tracks):
+        """
+        Shape an internal result dict into the form requested by the caller.
+        """
+        if return_youtube_tracks:
+            return result
+        return result["final_tracks"], result["distances"], result["indices"]
+    
+    async def _arun_from_seed(self, seed_id, limit):
+        """
+        Run the pipeline steps for an already resolved seed videoId.
+        
+        Returns:
+            dict: Contains 'youtube_tracks', 'tracks_with_lyrics', 'final_tracks', 'distances', 'indices'
+        """
+        collected = await self._acollect_radio(seed_id, limit)
+        if not collected:
+            return self._empty_result()
+        youtube_tracks, tracks = collected
+        
+        # Catalog fast path: reuse stored analysis and embeddings for known tracks
+        catalog = get_catalog()
+        known_count = catalog.apply(tracks)
+        pending = [t for t in tracks if not t.get("from_catalog")]
+        self.log(f"{known_count}/{len(tracks)} songs already in the catalog - {known_count}/{len(tracks)} chansons déjà dans le catalogue")
+        
+        if pending:
+            # Step 2: Fetch lyrics from Genius
+            self.log("Fetching lyrics via Genius API... - Récupération des paroles via Genius API...")
+            pending = await afetch_lyrics(pending)
+            
+            if not pending:
+                self.log("Failed to fetch lyrics. - Échec de la récupération des paroles.")
+                return self._empty_result(youtube_tracks)
         
         # Store tracks with lyrics status for display
         tracks_with_lyrics = tracks.copy()
@@ -111,53 +341,83 @@ class MusicPipeline:
         lyrics_found = sum(1 for t in tracks if t.get("status") == "found")
         self.log(f"Lyrics found for {lyrics_found}/{len(tracks)} songs - Paroles trouvées pour {lyrics_found}/{len(tracks)} chansons")
         
-        # Step 3: Analyze emotional profiles using LLM
-        self.log("Emotional and semantic analysis via LLM... - Analyse émotionnelle et sémantique via LLM...")
-        for track in tracks:
-            if track.get("lyrics") and track.get("status") == "found":
-                try:
-                    analysis = analyze_emotional_profile(
-                        title=track["title"],
-                        artist=track["artist"],
-                        lyrics=track["lyrics"]
-                    )
-                    track["analysis"] = analysis
-                    self.log(f"  Analysis completed for '{track['title']}' - Analyse complétée pour '{track['title']}'")
-                except Exception as e:
-                    self.log(f"  Analysis error for '{track['title']}': {str(e)} - Erreur d'analyse pour '{track['title']}': {str(e)}")
-                    track["analysis"] = None
-            else:
-                track["analysis"] = None
-                self.log(f"  No lyrics for '{track['title']}' - analysis skipped - Pas de paroles pour '{track['title']}' - analyse ignorée")
+        if pending:
+            # Step 3: Analyze emotional profiles using LLM
+            self.log("Emotional and semantic analysis via LLM... - Analyse émotionnelle et sémantique via LLM...")
+            slots = asyncio.Semaphore(PIPELINE_CONCURRENCY)
+            await asyncio.gather(*(self._analyze_track(track, slots) for track in pending))
         
         analyzed_count = sum(1 for t in tracks if t.get("analysis"))
         self.log(f"{analyzed_count}/{len(tracks)} songs analyzed - {analyzed_count}/{len(tracks)} chansons analysées")
         
-        # Step 4: Generate vibe text descriptions
-        self.log("Generating vibe descriptions... - Génération des descriptions de vibe...")
-        try:
-            generate_vibe_text(tracks)
-            vibe_count = sum(1 for t in tracks if t.get("vibe_text"))
-            self.log(f"{vibe_count} vibe descriptions generated - {vibe_count} descriptions de vibe générées")
-        except Exception as e:
-            self.log(f"Error generating vibes: {str(e)} - Erreur lors de la génération des vibes: {str(e)}")
+        if pending:
+            # Step 4: Generate vibe text descriptions
+            self.log("Generating vibe descriptions... - Génération des descriptions de vibe...")
+            try:
+                generate_vibe_text(pending)
+                vibe_count = sum(1 for t in tracks if t.get("vibe_text"))
+                self.log(f"{vibe_count} vibe descriptions generated - {vibe_count} descriptions de vibe générées")
+            except Exception as e:
+                self.log(f"Error generating vibes: {str(e)} - Erreur lors de la génération des vibes: {str(e)}")
+            
+            # Step 5: Generate embeddings
+            self.log("Generating embeddings via OpenAI... - Génération des embeddings via OpenAI...")
+            try:
+                await agenerate_embedding(pending)
+                embedding_count = sum(1 for t in tracks if t.get("embedding"))
+                self.log(f"{embedding_count} embeddings generated - {embedding_count} embeddings générés")
+            except Exception as e:
+                self.log(f"Error generating embeddings: {str(e)} - Erreur lors de la génération des embeddings: {str(e)}")
+                return self._empty_result(youtube_tracks)
+            
+            # Warm the catalog with what we just computed
+            catalog.remember(pending)
         
-        # Step 5: Generate embeddings
-        self.log("Generating embeddings via OpenAI... - Génération des embeddings via OpenAI...")
-        try:
-            tracks = generate_embedding(tracks)
-            embedding_count = sum(1 for t in tracks if t.get("embedding"))
-            self.log(f"{embedding_count} embeddings generated - {embedding_count} embeddings générés")
-        except Exception as e:
-            self.log(f"Error generating embeddings: {str(e)} - Erreur lors de la génération des embeddings: {str(e)}")
-            return None, None, None
+        return self._rank_tracks(tracks, youtube_tracks, tracks_with_lyrics)
+    
+    async def _acollect_radio(self, seed_id, limit):
+        """
+        Fetch the radio of a seed, rank it and collapse duplicate versions.
+        
+        Returns:
+            tuple: (youtube_tracks, tracks) where tracks are the unique candidates
+            None: If YouTube Music returned nothing
+        """
+        tracks = await aget_radio_tracks(seed_id, limit=limit)
+        
+        if not tracks:
+            self.log("No songs found on YouTube Music. - Aucune chanson trouvée sur YouTube Music.")
+            return None
         
+        # Store YouTube tracks for intermediate display
+        youtube_tracks = tracks.copy()
+        
+        self.log(f"{len(tracks)} songs found on YouTube Music - {len(tracks)} chansons trouvées sur YouTube Music")
+        
+        # Add YouTube rank (original order from YouTube Music)
+        for i, track in enumerate(tracks):
+            track['youtube_rank'] = i + 1
+        
+        # Collapse versions of the same song (clip, audio, remaster, feat.) to one candidate
+        tracks, duplicates = song_identity.dedupe(tracks)
+        if duplicates:
+            self.log(f"{duplicates} duplicate versions removed - {duplicates} versions en double supprimées")
+        
+        return youtube_tracks, tracks
+    
+    def _rank_tracks(self, tracks, youtube_tracks, tracks_with_lyrics):
+        """
+        Rank the embedded tracks by similarity to the seed (first track).
+        
+        Returns:
+            dict: Contains 'youtube_tracks', 'tracks_with_lyrics', 'final_tracks', 'distances', 'indices'
+        """
         # Filter tracks with valid embeddings
         valid_tracks = [t for t in tracks if t.get("embedding")]
         
         if len(valid_tracks) < 2:
             self.log("Not enough songs with embeddings to build index. - Pas assez de chansons avec embeddings pour construire l'index.")
-            return None, None, None
+            return self._empty_result(youtube_tracks)
         
         # Step 6: Build FAISS index
         self.log("Building FAISS index... - Construction de l'index FAISS...")
@@ -167,7 +427,7 @@ class MusicPipeline:
             self.log(f"FAISS index built with {len(valid_tracks)} vectors - Index FAISS construit avec {len(valid_tracks)} vecteurs")
         except Exception as e:
             self.log(f"Error building index: {str(e)} - Erreur lors de la construction de l'index: {str(e)}")
-            return None, None, None
+            return self._empty_result(youtube_tracks)
         
         # Step 7: Search for similar songs
         # Use the first song (seed) as the query
@@ -179,21 +439,39 @@ class MusicPipeline:
             self.log(f"{len(indices[0])} similar songs found - {len(indices[0])} chansons similaires trouvées")
             self.log("Pipeline completed successfully! - Pipeline terminé avec succès!")
             
-            if return_youtube_tracks:
-                return {
-                    "youtube_tracks": youtube_tracks,
-                    "tracks_with_lyrics": tracks_with_lyrics,
-                    "final_tracks": valid_tracks,
-                    "distances": distances,
-                    "indices": indices
-                }
-            return valid_tracks, distances, indices
+            return {
+                "youtube_tracks": youtube_tracks,
+                "tracks_with_lyrics": tracks_with_lyrics,
+                "final_tracks": valid_tracks,
+                "distances": distances,
+                "indices": indices
+            }
             
         except Exception as e:
             self.log(f"Error during similarity search: {str(e)} - Erreur lors de la recherche de similarité: {str(e)}")
-            if return_youtube_tracks:
-                return {"youtube_tracks": youtube_tracks, "final_tracks": None, "distances": None, "indices": None}
-            return None, None, None
+            return self._empty_result(youtube_tracks)
+
+    
+    async def _analyze_track(self, track, slots):
+        """
+        Analyze the emotional profile of one track, storing it under track["analysis"].
+        """
+        if track.get("lyrics") and track.get("status") == "found":
+            try:
+                async with slots:
+                    analysis = await aanalyze_emotional_profile(
+                        title=track["title"],
+                        artist=track["artist"],
+                        lyrics=track["lyrics"]
+                    )
+                track["analysis"] = analysis
+                self.log(f"  Analysis completed for '{track['title']}' - Analyse complétée pour '{track['title']}'")
+            except Exception as e:
+                self.log(f"  Analysis error for '{track['title']}': {str(e)} - Erreur d'analyse pour '{track['title']}': {str(e)}")
+                track["analysis"] = None
+        else:
+            track["analysis"] = None
+            self.log(f"  No lyrics for '{track['title']}' - analysis skipped - Pas de paroles pour '{track['title']}' - analyse ignorée")
 
 
 def run_pipeline_standalone(query, limit=10, save_results=False):
@@ -1,36 +1,99 @@
+import asyncio
+import os
 import faiss
 import numpy as np
-from openai import OpenAI
-from src.config import OPENAI_API_KEY
+from openai import OpenAI, AsyncOpenAI
+from src.aio import LoopLocal, RateLimiter, run_sync
+from src.config import OPENAI_API_KEY, EMBEDDING_MODEL, PIPELINE_CONCURRENCY, OPENAI_RATE
+from src.singleflight import SingleFlight
 
 client = OpenAI(
     api_key=OPENAI_API_KEY,
     base_url="https://api.openai.com/v1"
 )
+
+# One async OpenAI client per event loop
+_async_client = LoopLocal(lambda: AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    base_url="https://api.openai.com/v1"
+))
+
+# Coalesces concurrent embedding requests for the same vibe text across pipeline runs
+_embedding_flight = SingleFlight()
+
+# Request budget shared by every run of the process
+_openai_rate = RateLimiter(OPENAI_RATE)
     
 def generate_embedding(text_list):
     """
     Generates embeddings for a list of songs.
     
+    Thin blocking wrapper around agenerate_embedding.
+    
+    Args:
+        text_list: List of dictionaries containing song information
+        
+    Returns:
+        Updated list with embeddings
+    """
+    return run_sync(agenerate_embedding(text_list))
+
+async def agenerate_embedding(text_list, concurrency=PIPELINE_CONCURRENCY):
+    """
+    Async counterpart of generate_embedding.
+    
     Args:
         text_list: List of dictionaries containing song information
+        concurrency: Maximum number of embedding requests in flight
         
     Returns:
         Updated list with embeddings
     """
-    for song in text_list:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def process(song):
         try:
             if song.get("vibe_text"):
-                completion = client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=song["vibe_text"]
-                )
-                song["embedding"] = completion.data[0].embedding
+                async with slots:
+                    # Concurrent runs embedding the same text share a single API call
+                    song["embedding"] = await _embedding_flight.ado(
+                        song["vibe_text"],
+                        lambda: _arequest_embedding(song["vibe_text"])
+                    )
         except Exception as e:
             print(f"Error generating embedding for {song['title']} by {song['artist']}: {e}")
             song["embedding"] = None
+
+    await asyncio.gather(*(process(song) for song in text_list))
     return text_list
 
+async def _arequest_embedding(text):
+    """
+    Requests the embedding vector of a single text from OpenAI.
+    """
+    return (await aembed_texts([text]))[0]
+
+async def aembed_texts(texts, model=EMBEDDING_MODEL):
+    """
+    Embeds a batch of texts with a single OpenAI request.
+    
+    Used by bulk jobs (catalog re-embedding), where one request per batch
+    makes the most of the OPENAI_RATE budget.
+    
+    Args:
+        texts: List of strings (at most 2048 per request)
+        model: OpenAI embedding model
+        
+    Returns:
+        list: One embedding vector per text, in order
+    """
+    await _openai_rate.acquire()
+    completion = await _async_client.get().embeddings.create(
+        model=model,
+        input=texts
+    )
+    return [item.embedding for item in sorted(completion.data, key=lambda item: item.index)]
+
 def build_faiss_index(vectors):
     """
     Builds a FAISS index from a list of embedding vectors.
@@ -58,6 +121,72 @@ def build_faiss_index(vectors):
     
     return index
 
+def add_faiss_vectors(index, vectors):
+    """
+    Appends embedding vectors to an index built by build_faiss_index.
+    
+    Args:
+        index: FAISS index (in memory, not memory-mapped)
+        vectors: (n x dim) embedding vectors, normalized on a copy like build_faiss_index
+    """
+    vectors = np.array(vectors, dtype="float32")
+    if len(vectors):
+        faiss.normalize_L2(vectors)
+        index.add(vectors)
+
+def index_vectors(index):
+    """
+    Returns the normalized vectors stored in a flat FAISS index, without copying them.
+    
+    The array is a view of the index memory: it is only valid while index is alive.
+    
+    Args:
+        index: Flat FAISS index (e.g. built by build_faiss_index)
+        
+    Returns:
+        (ntotal x dim) float32 numpy array
+    """
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype="float32")
+    return faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d).reshape(index.ntotal, index.d)
+
+def save_faiss_index(index, path):
+    """
+    Writes a FAISS index to disk atomically (temporary file then rename).
+    
+    Args:
+        index: FAISS index to save
+        path: Target file path
+    """
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_faiss_index(path, mmap=True):
+    """
+    Loads a FAISS index from disk, memory-mapped and read-only when possible.
+    
+    With mmap, the index data stays in the OS page cache and is shared by all
+    processes opening the same file instead of being copied into each heap.
+    Index types that cannot be memory-mapped are read normally.
+    
+    Args:
+        path: Path of the .faiss file
+        mmap: If False, always read the index into private memory
+        
+    Returns:
+        Loaded FAISS index
+    """
+    if mmap:
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        # Newer FAISS versions can also map flat codes without copying them
+        flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError as e:
+            print(f"FAISS index cannot be memory-mapped, reading it into memory: {e}")
+    return faiss.read_index(path)
+
 def search_similar_songs(index, query_vector, k=5):
     """
     Searches for the k most similar songs from a query vector.
@@ -0,0 +1,175 @@
+"""
+Search Index Module
+
+Title/artist search over the catalog, for search-as-you-type in catalog mode
+and the /search endpoint.
+
+Labels ("title - artist") are normalized like song ids (lowercase, accents and
+punctuation stripped, see src/identity.py) and cut into word trigrams. Each
+word is padded with two leading spaces, so the first trigrams of a word are
+its 1- and 2-letter prefixes ("  b", " be", "bea", ...). A query is cut the
+same way, except that its last word is treated as an unfinished prefix.
+
+Rows are ranked by the number of query trigrams they contain, which tolerates
+typos and word order ("beatels yesterday" still finds "Yesterday - The
+Beatles"). The index is an inverted list stored as flat numpy arrays, so a
+query is a few searchsorted/bincount calls and returns catalog row ids
+directly:
+
+    search_keys.npy       int64  sorted trigram keys
+    search_offsets.npy    int64  start of each key's rows in search_postings
+    search_postings.npy   int32  catalog rows, grouped by trigram
+    search_lengths.npy    int32  length of each normalized label (tie-break)
+"""
+
+import os
+from itertools import chain
+
+import numpy as np
+
+from src.identity import normalize_text
+
+SEARCH_FILES = ("search_keys.npy", "search_offsets.npy", "search_postings.npy", "search_lengths.npy")
+
+# Minimum share of the query trigrams a row must contain to be returned
+MIN_TRIGRAM_SHARE = 0.5
+
+
+def _trigram_keys(text, partial=False):
+    """
+    Returns the trigram keys of a normalized text.
+
+    Args:
+        text: Normalized text
+        partial: If True, the last word is a prefix still being typed (no end padding)
+    """
+    words = text.split()
+    keys = []
+    for position, word in enumerate(words):
+        padded = "  " + word + ("" if partial and position == len(words) - 1 else " ")
+        for i in range(len(padded) - 2):
+            keys.append((ord(padded[i]) << 42) | (ord(padded[i + 1]) << 21) | ord(padded[i + 2]))
+    return keys
+
+
+class SearchIndex:
+    """
+    Trigram index over catalog labels.
+
+    Attributes:
+        size: Number of indexed rows
+    """
+
+    def __init__(self, keys, offsets, postings, lengths):
+        self._keys = keys
+        self._offsets = offsets
+        self._postings = postings
+        self._lengths = lengths
+        self.size = len(lengths)
+
+    @classmethod
+    def build(cls, labels):
+        """
+        Builds the index of a list of labels; row i is labels[i].
+        """
+        rows_by_key = {}
+        for row, label in enumerate(labels):
+            for key in set(_trigram_keys(normalize_text(label))):
+                rows_by_key.setdefault(key, []).append(row)
+
+        keys = np.array(sorted(rows_by_key), dtype="int64")
+        offsets = np.zeros(len(keys) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(rows_by_key[key]) for key in keys.tolist()])
+        postings = np.fromiter(chain.from_iterable(rows_by_key[key] for key in keys.tolist()), dtype="int32", count=int(offsets[-1]))
+        lengths = np.array([len(normalize_text(label)) for label in labels], dtype="int32")
+        return cls(keys, offsets, postings, lengths)
+
+    def extend(self, labels):
+        """
+        Returns the index of the same rows followed by labels (rows size, size + 1, ...).
+
+        Only the new labels are normalized; the existing postings are copied
+        array to array, the new rows going after them in each key's list.
+        """
+        added = SearchIndex.build(labels)
+        keys = np.union1d(self._keys, added._keys)
+        old_positions = np.searchsorted(keys, self._keys)
+        new_positions = np.searchsorted(keys, added._keys)
+        old_counts = np.diff(self._offsets)
+        new_counts = np.diff(added._offsets)
+
+        counts = np.zeros(len(keys), dtype="int64")
+        counts[old_positions] += old_counts
+        counts[new_positions] += new_counts
+        offsets = np.zeros(len(keys) + 1, dtype="int64")
+        offsets[1:] = np.cumsum(counts)
+
+        postings = np.empty(int(offsets[-1]), dtype="int32")
+        old_shift = np.repeat(offsets[old_positions] - self._offsets[:-1], old_counts)
+        postings[np.arange(len(self._postings)) + old_shift] = self._postings
+        new_shift = np.repeat(offsets[new_positions + 1] - new_counts - added._offsets[:-1], new_counts)
+        postings[np.arange(len(added._postings)) + new_shift] = added._postings + self.size
+        return SearchIndex(keys, offsets, postings, np.concatenate([self._lengths, added._lengths]).astype("int32"))
+
+    def save(self, directory):
+        """
+        Writes the index arrays into a directory (temporary files then rename).
+        """
+        for name, array in zip(SEARCH_FILES, (self._keys, self._offsets, self._postings, self._lengths)):
+            tmp_path = os.path.join(directory, name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(directory, name))
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Memory-maps an index written by save().
+
+        Returns:
+            SearchIndex: The index, or None if the directory has none
+        """
+        paths = [os.path.join(directory, name) for name in SEARCH_FILES]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        return cls(*(np.load(path, mmap_mode="r") for path in paths))
+
+    def search(self, text, limit=10):
+        """
+        Finds the rows whose label best matches text.
+
+        Args:
+            text: Raw query, possibly partial ("beat", "stromae formidabl")
+            limit: Maximum number of rows to return
+
+        Returns:
+            list: Catalog row ids, best match first
+        """
+        query = normalize_text(text)
+        if not query or self.size == 0:
+            return []
+        partial = not text[-1:].isspace()
+        query_keys = np.unique(np.array(_trigram_keys(query, partial=partial), dtype="int64"))
+
+        positions = np.searchsorted(self._keys, query_keys)
+        found = positions < len(self._keys)
+        found[found] = self._keys[positions[found]] == query_keys[found]
+        positions = positions[found]
+        if not len(positions):
+            return []
+
+        postings = np.concatenate([self._postings[self._offsets[p]:self._offsets[p + 1]] for p in positions])
+        counts = np.bincount(postings, minlength=self.size)
+
+        needed = max(1, int(np.ceil(len(query_keys) * MIN_TRIGRAM_SHARE)))
+        candidates = np.flatnonzero(counts >= needed)
+        if not len(candidates):
+            return []
+        if len(candidates) > limit:
+            # Only rows sharing at least as many trigrams as the limit-th best can make it
+            best = np.partition(counts[candidates], -limit)[-limit]
+            candidates = candidates[counts[candidates] >= best]
+
+        # Most shared trigrams first, then shortest label (closest to the query), then row order
+        order = np.lexsort((candidates, self._lengths[candidates], -counts[candidates]))
+        return candidates[order[:limit]].tolist()
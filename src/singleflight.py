@@ -0,0 +1,223 @@
+"""
+Single-Flight Module
+
+This module coalesces concurrent identical calls: while a call for a given key
+is in flight, later callers with the same key do not start their own work but
+wait for the first one (the leader) and receive the same result.
+
+It is used at two levels:
+- whole pipeline runs, keyed by resolved seed and parameters (src/pipeline.py)
+- individual lyrics, analysis and embedding requests (src/extraction.py,
+  src/analysis.py, src/recommendation.py)
+
+Callers can also subscribe to the progress messages published by the leader.
+Messages sent before a caller attached are replayed to it, so every caller
+sees the full progress log.
+
+Both blocking (`do`) and asyncio (`ado`) callers are supported and coalesce
+with each other, even when they run in different threads or event loops. If
+the leader is cancelled, its followers start over instead of failing.
+"""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class _Call:
+    """
+    State of one in-flight call: its future result and progress subscribers.
+    """
+
+    def __init__(self):
+        self.future = Future()
+        self.messages = []
+        self.leader_callback = None
+        self.queues = []
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Group of coalesced calls, keyed by any hashable value.
+
+    Progress messages are delivered to each caller on its own thread: the
+    leader's callback is called directly, followers drain a queue while they
+    wait. This matters for Streamlit, whose UI elements can only be written
+    from the session that created them.
+
+    Example:
+        flight = SingleFlight()
+        lyrics = flight.do(video_id, lambda: fetch_from_api(video_id))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _join(self, key, on_progress):
+        """
+        Attaches to the in-flight call of key, creating it if needed.
+
+        Returns:
+            tuple: (call, leader, inbox) - inbox is None for the leader
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                call.leader_callback = on_progress
+                self._calls[key] = call
+                return call, True, None
+            call.waiters += 1
+            inbox = queue.Queue()
+            # Replay what the leader already published before we attached
+            for message in call.messages:
+                inbox.put(message)
+            call.queues.append(inbox)
+            return call, False, inbox
+
+    def _finish(self, key, call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def do(self, key, fn, on_progress=None):
+        """
+        Runs fn() once for all concurrent callers sharing the same key.
+
+        Args:
+            key: Hashable identifier of the work
+            fn: Zero-argument callable doing the work
+            on_progress: Optional callback receiving the messages published for key
+
+        Returns:
+            The result of fn(), shared by every caller of the flight
+
+        Raises:
+            Whatever fn() raised, re-raised in every caller of the flight
+        """
+        while True:
+            call, leader, inbox = self._join(key, on_progress)
+
+            if not leader:
+                self._follow(call, inbox, on_progress)
+                if call.future.cancelled():
+                    continue
+                return call.future.result()
+
+            try:
+                result = fn()
+            except BaseException as e:
+                call.future.set_exception(e)
+                raise
+            else:
+                call.future.set_result(result)
+                return result
+            finally:
+                self._finish(key, call)
+
+    async def ado(self, key, coro_fn, on_progress=None):
+        """
+        Asyncio counterpart of do(): awaits coro_fn() once for all concurrent callers.
+
+        Args:
+            key: Hashable identifier of the work
+            coro_fn: Zero-argument callable returning an awaitable doing the work
+            on_progress: Optional callback receiving the messages published for key
+
+        Returns:
+            The result of coro_fn(), shared by every caller of the flight
+        """
+        while True:
+            call, leader, inbox = self._join(key, on_progress)
+
+            if not leader:
+                await self._afollow(call, inbox, on_progress)
+                if call.future.cancelled():
+                    continue
+                return call.future.result()
+
+            try:
+                result = await coro_fn()
+            except asyncio.CancelledError:
+                # Let the followers retry rather than inherit our cancellation
+                call.future.cancel()
+                raise
+            except BaseException as e:
+                call.future.set_exception(e)
+                raise
+            else:
+                call.future.set_result(result)
+                return result
+            finally:
+                self._finish(key, call)
+
+    @staticmethod
+    def _deliver(inbox, on_progress):
+        while True:
+            try:
+                message = inbox.get_nowait()
+            except queue.Empty:
+                return
+            if on_progress:
+                try:
+                    on_progress(message)
+                except Exception as e:
+                    print(f"Progress callback error: {e}")
+
+    @classmethod
+    def _follow(cls, call, inbox, on_progress):
+        """
+        Waits for the leader, forwarding its progress messages on this thread.
+        """
+        while not call.future.done():
+            try:
+                call.future.exception(timeout=0.1)
+            except Exception:
+                pass
+            cls._deliver(inbox, on_progress)
+        cls._deliver(inbox, on_progress)
+
+    @classmethod
+    async def _afollow(cls, call, inbox, on_progress):
+        """
+        Awaits the leader, forwarding its progress messages in this event loop.
+        """
+        # Shield so that cancelling this follower never cancels the shared call
+        waiter = asyncio.shield(asyncio.wrap_future(call.future))
+        while not waiter.done():
+            await asyncio.wait([waiter], timeout=0.1)
+            cls._deliver(inbox, on_progress)
+        cls._deliver(inbox, on_progress)
+        if not waiter.cancelled():
+            # Mark the outcome as retrieved, call.future carries it to the caller
+            waiter.exception()
+
+    def publish(self, key, message):
+        """
+        Sends a progress message to every caller attached to the flight of key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                return
+            call.messages.append(message)
+            inboxes = list(call.queues)
+        for inbox in inboxes:
+            inbox.put(message)
+        if call.leader_callback:
+            call.leader_callback(message)
+
+    def waiters(self, key):
+        """
+        Returns the number of callers attached to the in-flight call of key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call else 0
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
@@ -0,0 +1,330 @@
+"""
+Vote Archive Module
+
+One columnar archive for every A/B test vote, whichever place it was recorded in:
+- the vote list of the KV store (vibereco:votes, see ab_test/vote_service.py),
+  pulled incrementally through the src/vote_sync.py cache
+- the Streamlit app's vote store (src/ab_testing.py): its SQLite database, or
+  the legacy data/ab_test_results.json array
+- exports of the web frontend's localStorage (the vibereco_votes array that
+  app.js keeps when /api/track is unreachable)
+
+Votes are partitioned by the UTC day of their timestamp:
+
+    data/vote_archive/
+    ├── date=2026-10-18/
+    │   ├── part.parquet          votes of the day, compacted, sorted by timestamp
+    │   └── delta-<ns>.parquet    votes imported since the last compaction
+    └── date=undated/             votes without a readable timestamp
+
+Files are Parquet when pyarrow is installed, else .npz with one array per
+column. The reader accepts both, so an archive can mix them. Imports are
+idempotent: votes are keyed by testId, and a vote already in its day
+partition is skipped. compact() merges the files of each day into one.
+
+read() only opens the partitions of the requested date range, and only loads
+the requested columns plus those its filters need. Parquet files also get the
+filters pushed down to the row groups, and an .npz member is only read when
+its column is accessed.
+
+Columns: those of src/vote_sync.py (testId, timestamp, seedId, seedTitle,
+vibe, vote, winnerSource, mappingA, emotional, narrative, keepability), plus
+origin ("kv", "streamlit" or "local").
+
+Usage:
+    python -m src.vote_archive import [--kv URL] [--streamlit data/ab_test_votes.sqlite]
+                                      [--local votes.json] [--compact]
+    python -m src.vote_archive compact [--since 2026-10-01] [--until 2026-10-31]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.config import DATA_DIR
+from src.vote_sync import CACHE_DIR, COLUMNS, SCORE_CRITERIA, TEXT_COLUMNS, VoteSync, empty_votes, normalize_votes
+
+try:
+    import pyarrow  # noqa: F401 - Parquet engine of pandas
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+ARCHIVE_DIR = os.path.join(DATA_DIR, "vote_archive")
+
+# Partition of the votes without a readable timestamp
+UNDATED = "undated"
+
+ARCHIVE_TEXT_COLUMNS = TEXT_COLUMNS + ("origin",)
+ARCHIVE_COLUMNS = COLUMNS + ("origin",)
+FILE_EXTENSIONS = (".parquet", ".npz")
+
+
+def _day(value):
+    """'YYYY-MM-DD' of a date, Timestamp or date string (None stays None)."""
+    return None if value is None else pd.Timestamp(value).strftime("%Y-%m-%d")
+
+
+def _empty(columns):
+    return empty_votes().assign(origin=pd.Series(dtype=str))[list(columns)]
+
+
+def _write_file(path, frame):
+    tmp_path = path + ".tmp"
+    if path.endswith(".parquet"):
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        arrays = {column: frame[column].to_numpy(dtype=str) for column in ARCHIVE_TEXT_COLUMNS}
+        arrays["timestamp"] = frame["timestamp"].dt.tz_convert(None).to_numpy(dtype="datetime64[ns]").view("int64")
+        arrays.update({criterion: frame[criterion].to_numpy(dtype="float32") for criterion in SCORE_CRITERIA})
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _read_file(path, columns, filters):
+    if path.endswith(".parquet"):
+        predicates = [(column, "in", values) for column, values in filters.items()]
+        return pd.read_parquet(path, columns=list(columns), filters=predicates or None)
+    with np.load(path, allow_pickle=False) as arrays:
+        data = {}
+        for column in columns:
+            values = arrays[column]
+            if column == "timestamp":
+                data[column] = pd.to_datetime(values.view("datetime64[ns]"), utc=True)
+            elif column in ARCHIVE_TEXT_COLUMNS:
+                data[column] = pd.Series(values).astype(str)
+            else:
+                data[column] = values
+    return pd.DataFrame(data, columns=list(columns))
+
+
+class VoteArchive:
+    """
+    Day-partitioned columnar archive of the A/B test votes.
+
+    Attributes:
+        root: Archive directory
+        extension: Format of the files written (".parquet" or ".npz")
+    """
+
+    def __init__(self, root=ARCHIVE_DIR, file_format=None):
+        """
+        Args:
+            root: Archive directory
+            file_format: "parquet" or "npz" (default: Parquet if pyarrow is installed)
+        """
+        self.root = root
+        file_format = file_format or ("parquet" if HAS_PARQUET else "npz")
+        if file_format == "parquet" and not HAS_PARQUET:
+            raise ValueError("Parquet files need pyarrow: pip install pyarrow")
+        self.extension = "." + file_format
+        os.makedirs(root, exist_ok=True)
+
+    def partitions(self, start=None, end=None):
+        """
+        Days with votes in [start, end] (inclusive), oldest first.
+
+        The undated partition is only included when no range is given.
+        """
+        start, end = _day(start), _day(end)
+        days = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.startswith("date="):
+                continue
+            day = name[len("date="):]
+            if day == UNDATED:
+                if start is None and end is None:
+                    days.append(day)
+            elif (start is None or day >= start) and (end is None or day <= end):
+                days.append(day)
+        return days
+
+    def _files(self, day):
+        """Files of a day partition: the compacted part first, then the deltas in import order."""
+        directory = os.path.join(self.root, f"date={day}")
+        names = [name for name in os.listdir(directory) if name.endswith(FILE_EXTENSIONS)]
+        return [os.path.join(directory, name) for name in sorted(names, key=lambda name: (not name.startswith("part"), name))]
+
+    def _read_day(self, day, columns, filters=None):
+        frames = []
+        for path in self._files(day):
+            try:
+                frames.append(_read_file(path, columns, filters or {}))
+            except FileNotFoundError:
+                continue  # Delta merged and removed by a concurrent compaction
+        return pd.concat(frames, ignore_index=True) if frames else _empty(columns)
+
+    def append(self, votes, origin):
+        """
+        Adds votes to the archive, one delta file per day.
+
+        Args:
+            votes: DataFrame with the src/vote_sync.py columns (see normalize_votes)
+            origin: Where the votes come from ("kv", "streamlit" or "local")
+
+        Returns:
+            int: Number of votes added (votes without testId, or already archived, are skipped)
+        """
+        frame = votes[votes["testId"] != ""].drop_duplicates("testId").assign(origin=origin)[list(ARCHIVE_COLUMNS)]
+        days = frame["timestamp"].dt.strftime("%Y-%m-%d").fillna(UNDATED)
+        added = 0
+        for day, rows in frame.groupby(days, sort=True):
+            directory = os.path.join(self.root, f"date={day}")
+            os.makedirs(directory, exist_ok=True)
+            known = self._read_day(day, ["testId"])["testId"]
+            rows = rows[~rows["testId"].isin(known)]
+            if len(rows):
+                _write_file(os.path.join(directory, f"delta-{time.time_ns():020d}{self.extension}"), rows)
+                added += len(rows)
+        return added
+
+    def compact(self, start=None, end=None):
+        """
+        Merges the files of each day partition into one part file, sorted by
+        timestamp, one row per testId (the first imported copy).
+
+        Returns:
+            int: Number of partitions compacted
+        """
+        compacted = 0
+        for day in self.partitions(start, end):
+            files = self._files(day)
+            part = os.path.join(self.root, f"date={day}", "part" + self.extension)
+            if not files or files == [part]:
+                continue
+            frame = self._read_day(day, ARCHIVE_COLUMNS)
+            frame = frame.drop_duplicates("testId").sort_values("timestamp", kind="stable", ignore_index=True)
+            _write_file(part, frame)
+            for path in files:
+                if path != part:
+                    os.remove(path)
+            compacted += 1
+        return compacted
+
+    def read(self, columns=None, start=None, end=None, filters=None):
+        """
+        Loads votes from the archive.
+
+        Args:
+            columns: Columns to load (default: all)
+            start: First day (date, Timestamp or "YYYY-MM-DD")
+            end: Last day, inclusive
+            filters: {column: value or list of values} the rows must match
+
+        Returns:
+            pandas.DataFrame: The requested columns, one row per testId, oldest first
+        """
+        columns = list(columns or ARCHIVE_COLUMNS)
+        filters = {
+            column: [str(v) if column in ARCHIVE_TEXT_COLUMNS else v
+                     for v in (values if isinstance(values, (list, tuple, set)) else [values])]
+            for column, values in (filters or {}).items()
+        }
+        # testId and timestamp are always needed, to drop duplicates and sort
+        needed = list(dict.fromkeys(columns + list(filters) + ["testId", "timestamp"]))
+
+        frames = []
+        for day in self.partitions(start, end):
+            frame = self._read_day(day, needed, filters)
+            for column, values in filters.items():
+                frame = frame[frame[column].isin(values)]
+            frames.append(frame)
+        if not frames:
+            return _empty(columns)
+        frame = pd.concat(frames, ignore_index=True).drop_duplicates("testId")
+        return frame.sort_values("timestamp", kind="stable", ignore_index=True)[columns]
+
+
+def streamlit_votes(records):
+    """
+    Normalizes votes of the Streamlit app (src/ab_testing.py records) to the
+    archive columns. Their naive local timestamps are read as UTC.
+    """
+    return normalize_votes([{
+        "testId": record.get("test_id"),
+        "timestamp": record.get("timestamp"),
+        "seedTitle": record.get("seed_song"),
+        "vote": record.get("vote_for_playlist"),
+        "winnerSource": record.get("winner_source"),
+        "scores": record.get("scores") or {},
+        "mapping": record.get("mapping") or {},
+    } for record in records])
+
+
+def import_streamlit(archive, path):
+    """
+    Imports the Streamlit app's votes, from its SQLite store or a legacy JSON array.
+
+    Returns:
+        int: Number of votes added
+    """
+    if not os.path.exists(path):
+        return 0
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+    else:
+        from src.ab_testing import VoteStore
+        records = VoteStore(path).votes()
+    return archive.append(streamlit_votes(records), "streamlit")
+
+
+def import_local(archive, path):
+    """
+    Imports a localStorage export of the web frontend (JSON array of votes, as sent to /api/track).
+
+    Returns:
+        int: Number of votes added
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return archive.append(normalize_votes(json.load(f)), "local")
+
+
+def import_kv(archive, kv, cache_dir=CACHE_DIR):
+    """
+    Imports the votes of the KV vote list; only the votes recorded since the
+    last sync are fetched (see src/vote_sync.py).
+
+    Returns:
+        int: Number of votes added
+    """
+    sync = VoteSync(kv, cache_dir)
+    sync.sync()
+    return archive.append(sync.votes(), "kv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import A/B test votes into the columnar vote archive, or compact it")
+    parser.add_argument("command", choices=("import", "compact"))
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    parser.add_argument("--format", choices=("parquet", "npz"), default=None,
+                        help="Format of the files written (default: Parquet if pyarrow is installed)")
+    parser.add_argument("--kv", default=None, help="KV store URL (memory://, file://<path> or the REST URL)")
+    parser.add_argument("--cache", default=CACHE_DIR, help="Vote sync cache of the KV import")
+    parser.add_argument("--streamlit", action="append", default=[], help="Streamlit vote store (.sqlite) or legacy JSON array")
+    parser.add_argument("--local", action="append", default=[], help="localStorage export (JSON array of votes)")
+    parser.add_argument("--compact", action="store_true", help="Compact the archive after the import")
+    parser.add_argument("--since", default=None, help="First day to compact (YYYY-MM-DD)")
+    parser.add_argument("--until", default=None, help="Last day to compact (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    archive = VoteArchive(args.archive, args.format)
+    if args.command == "import":
+        if args.kv:
+            from src.kv import open_kv
+            print(f"📥 KV: {import_kv(archive, open_kv(args.kv), args.cache)} new votes archived - nouveaux votes archivés")
+        for path in args.streamlit:
+            print(f"📥 {path}: {import_streamlit(archive, path)} new votes archived - nouveaux votes archivés")
+        for path in args.local:
+            print(f"📥 {path}: {import_local(archive, path)} new votes archived - nouveaux votes archivés")
+    if args.command == "compact" or args.compact:
+        print(f"🗜️ {archive.compact(args.since, args.until)} day partitions compacted - partitions compactées")
+
+
+if __name__ == "__main__":
+    main()
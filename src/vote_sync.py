@@ -0,0 +1,244 @@
+"""
+Vote Sync Module
+
+Incremental copy of the A/B test vote list (vibereco:votes, see
+ab_test/vote_service.py and ab_test/api/track.js) into a local columnar cache,
+for the analysis scripts.
+
+Votes are pushed at the head of the list, so a vote keeps the same position
+counted from the tail forever: the N-th vote ever recorded is at index -N.
+The sync keeps a cursor (the number of votes already cached) and pulls only
+the votes after it, in pages of PAGE_SIZE, with LRANGE on negative indexes
+(stable while new votes keep arriving). Each page is decoded and normalized
+into typed columns in one vectorized pass, then written as one segment:
+
+    data/vote_cache/
+    ├── cursor.json            votes cached, raw item of the last one, segment list
+    └── part-<first>-<end>.npz one array per column
+
+Segments are merged once there are more than MAX_SEGMENTS of them. If the
+remote list was reset or rewritten (fewer votes than the cursor, or another
+vote where the last cached one should be), the cache is rebuilt from scratch.
+
+Columns: testId, timestamp (UTC), seedId, seedTitle, vibe, vote, winnerSource,
+mappingA (source shown as playlist A), and one float column per score
+criterion (emotional, narrative, keepability; NaN when missing).
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.config import DATA_DIR
+
+VOTES_KEY = "vibereco:votes"
+CACHE_DIR = os.path.join(DATA_DIR, "vote_cache")
+CURSOR_FILE = "cursor.json"
+
+# Votes per LRANGE request
+PAGE_SIZE = 1000
+
+# Segments kept before they are merged into one
+MAX_SEGMENTS = 32
+
+TEXT_COLUMNS = ("testId", "seedId", "seedTitle", "vibe", "vote", "winnerSource", "mappingA")
+SCORE_CRITERIA = ("emotional", "narrative", "keepability")
+COLUMNS = ("testId", "timestamp", "seedId", "seedTitle", "vibe", "vote", "winnerSource", "mappingA") + SCORE_CRITERIA
+
+
+def decode_vote(item):
+    """
+    Decodes one raw list item into a vote dict.
+
+    Items are JSON strings, sometimes JSON-encoded twice (older clients
+    serialized the vote before the KV client serialized it again).
+
+    Returns:
+        dict: The vote, or None if the item is not a vote
+    """
+    for _ in range(2):
+        if not isinstance(item, (str, bytes)):
+            break
+        try:
+            item = json.loads(item)
+        except json.JSONDecodeError:
+            return None
+    return item if isinstance(item, dict) else None
+
+
+def normalize_votes(items):
+    """
+    Decodes raw list items into a typed vote DataFrame (COLUMNS).
+
+    Items that are not votes are dropped.
+    """
+    frame = pd.json_normalize([vote for vote in map(decode_vote, items) if vote is not None], max_level=1)
+    columns = {}
+    for column in TEXT_COLUMNS:
+        source = "mapping.A" if column == "mappingA" else column
+        values = frame[source] if source in frame else pd.Series(None, index=frame.index, dtype=object)
+        columns[column] = values.where(values.notna(), "").astype(str)
+    timestamps = frame["timestamp"] if "timestamp" in frame else pd.Series(None, index=frame.index, dtype=object)
+    columns["timestamp"] = pd.to_datetime(timestamps, utc=True, errors="coerce", format="ISO8601").astype("datetime64[ns, UTC]")
+    for criterion in SCORE_CRITERIA:
+        source = f"scores.{criterion}"
+        values = frame[source] if source in frame else pd.Series(np.nan, index=frame.index)
+        columns[criterion] = pd.to_numeric(values, errors="coerce").astype("float32")
+    return pd.DataFrame(columns, columns=list(COLUMNS))
+
+
+def empty_votes():
+    """
+    Empty vote DataFrame with the cache columns and dtypes.
+    """
+    return normalize_votes([])
+
+
+def _write_segment(path, frame):
+    arrays = {column: frame[column].to_numpy(dtype=str) for column in TEXT_COLUMNS}
+    arrays["timestamp"] = frame["timestamp"].dt.tz_convert(None).to_numpy(dtype="datetime64[ns]").view("int64")
+    arrays.update({criterion: frame[criterion].to_numpy(dtype="float32") for criterion in SCORE_CRITERIA})
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _read_segment(path):
+    with np.load(path, allow_pickle=False) as arrays:
+        columns = {column: pd.Series(arrays[column]).astype(str) for column in TEXT_COLUMNS}
+        columns["timestamp"] = pd.to_datetime(arrays["timestamp"].view("datetime64[ns]"), utc=True)
+        columns.update({criterion: arrays[criterion] for criterion in SCORE_CRITERIA})
+    return pd.DataFrame(columns, columns=list(COLUMNS))
+
+
+class VoteSync:
+    """
+    Local columnar cache of the vote list, kept up to date incrementally.
+
+    Attributes:
+        kv: Store holding the vote list (see src/kv.py)
+        cache_dir: Cache directory
+        page_size: Votes per LRANGE request
+    """
+
+    def __init__(self, kv, cache_dir=CACHE_DIR, page_size=PAGE_SIZE, key=VOTES_KEY):
+        self.kv = kv
+        self.cache_dir = cache_dir
+        self.page_size = page_size
+        self.key = key
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cursor = self._load_cursor()
+
+    def _load_cursor(self):
+        path = os.path.join(self.cache_dir, CURSOR_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"count": 0, "last_item": None, "segments": []}
+
+    def _save_cursor(self):
+        path = os.path.join(self.cache_dir, CURSOR_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.cursor, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def reset(self):
+        """
+        Empties the cache; the next sync pulls every vote again.
+        """
+        for name in self.cursor["segments"]:
+            path = os.path.join(self.cache_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        self.cursor = {"count": 0, "last_item": None, "segments": []}
+        self._save_cursor()
+
+    def _is_stale(self, total, anchor):
+        count = self.cursor["count"]
+        if count > total:
+            return True
+        if count == 0:
+            return False
+        return not anchor or anchor[0] != self.cursor["last_item"]
+
+    def sync(self):
+        """
+        Pulls the votes recorded since the last sync into the cache.
+
+        Returns:
+            int: Number of new votes
+        """
+        count = self.cursor["count"]
+        # One round trip: list length, and the vote where the last cached one should be
+        total, anchor = self.kv.execute([["LLEN", self.key], ["LRANGE", self.key, -max(count, 1), -max(count, 1)]], atomic=False)
+        if self._is_stale(int(total), anchor):
+            print("Vote list changed remotely, rebuilding the cache - Liste des votes modifiée, reconstruction du cache")
+            self.reset()
+            count = 0
+
+        start = count
+        total = int(total)
+        while start < total:
+            end = min(start + self.page_size, total)
+            # Indexes from the tail, so votes pushed meanwhile do not shift the page
+            page = self.kv.command("LRANGE", self.key, -end, -(start + 1)) or []
+            page.reverse()
+            frame = normalize_votes(page)
+            name = f"part-{start:09d}-{end:09d}.npz"
+            _write_segment(os.path.join(self.cache_dir, name), frame)
+            self.cursor["segments"].append(name)
+            self.cursor["count"] = end
+            if page:
+                self.cursor["last_item"] = page[-1]
+            self._save_cursor()
+            start = end
+
+        if len(self.cursor["segments"]) > MAX_SEGMENTS:
+            self.compact()
+        return total - count
+
+    def compact(self):
+        """
+        Merges every segment into one.
+        """
+        segments = self.cursor["segments"]
+        if len(segments) <= 1:
+            return
+        frame = self._read_all(drop_duplicates=False)
+        name = f"part-000000000-{self.cursor['count']:09d}.npz"
+        _write_segment(os.path.join(self.cache_dir, name), frame)
+        self.cursor["segments"] = [name]
+        self._save_cursor()
+        for old in segments:
+            if old != name:
+                os.remove(os.path.join(self.cache_dir, old))
+
+    def _read_all(self, drop_duplicates=True):
+        frames = [_read_segment(os.path.join(self.cache_dir, name)) for name in self.cursor["segments"]]
+        frame = pd.concat(frames, ignore_index=True) if frames else empty_votes()
+        if drop_duplicates:
+            # A vote stored twice (client retry before idempotent ingestion) counts once
+            frame = frame[~(frame["testId"].duplicated() & (frame["testId"] != ""))].reset_index(drop=True)
+        return frame
+
+    def votes(self):
+        """
+        Returns every cached vote, oldest first, one row per testId.
+        """
+        return self._read_all()
+
+
+def sync_votes(kv, cache_dir=CACHE_DIR, page_size=PAGE_SIZE):
+    """
+    Syncs the cache with the store and returns every vote.
+
+    Returns:
+        pandas.DataFrame: Votes (COLUMNS), oldest first
+    """
+    sync = VoteSync(kv, cache_dir, page_size)
+    new = sync.sync()
+    print(f"📥 {new} new votes synced, {sync.cursor['count']} cached - {new} nouveaux votes, {sync.cursor['count']} en cache")
+    return sync.votes()